@@ -0,0 +1,160 @@
+"""
+In-process cache for reference data (categories, tags, users and shares) which rarely changes but is looked up on
+almost every request. Each cache is bounded (least recently used entries are evicted first) and every entry expires
+after a fixed time to live. Request server handlers which modify reference data invalidate the respective cache.
+Hot reads which are expensive to prepare are coalesced with SingleFlight, so concurrent identical reads share one
+computation.
+"""
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+
+# default maximum number of entries of each cache
+DEFAULT_MAX_SIZE = 1024
+# default time in seconds after which cached entry expires
+DEFAULT_TTL = 300
+# default time in seconds for which result of a coalesced read is shared
+DEFAULT_FLIGHT_TTL = 1
+
+
+class RefDataCache:
+    """
+    Bounded LRU cache whose entries expire after 'ttl' seconds.
+    Copies of values are stored and returned so that callers can freely modify them.
+    """
+    def __init__(self, name, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+
+    def get(self, key):
+        """
+        Returns cached value of key or None if key is not cached or is expired
+        """
+        entry = self.__entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.__entries[key]
+            self.misses += 1
+            return None
+        self.__entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def set(self, key, value):
+        self.__entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """
+        Removes given key from cache. Clears complete cache if key is not provided.
+        """
+        if key is None:
+            self.__entries.clear()
+        else:
+            self.__entries.pop(key, None)
+
+    async def get_or_load(self, key, loader):
+        """
+        Returns cached value of key. On cache miss value is loaded by awaiting 'loader()' and cached if not None.
+        """
+        value = self.get(key)
+        if value is None:
+            value = await loader()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def stats(self):
+        return {"name": self.name, "size": len(self.__entries), "max_size": self.max_size, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses}
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls of same key into one in-flight computation and shares its result with later calls
+    for 'ttl' seconds. Results are shared between callers as is hence they must not be modified.
+    Computation continues even if the caller which started it is cancelled, so that other callers still get result.
+    """
+    def __init__(self, name, ttl=DEFAULT_FLIGHT_TTL):
+        self.name = name
+        self.ttl = ttl
+        self.calls = 0
+        self.shared = 0
+        self.__flights = {}
+        self.__results = OrderedDict()
+
+    async def do(self, key, loader):
+        """
+        Returns result of 'loader()' for key. Loader is awaited only if no call of key is in flight and no recent
+        result of key is available.
+        """
+        result = self.__results.get(key)
+        if result is not None and result[0] >= time.monotonic():
+            self.shared += 1
+            return result[1]
+
+        flight = self.__flights.get(key)
+        if flight is None:
+            self.calls += 1
+            flight = asyncio.ensure_future(loader())
+            flight.add_done_callback(lambda done: self.__complete(key, done))
+            self.__flights[key] = flight
+        else:
+            self.shared += 1
+        return await asyncio.shield(flight)
+
+    def __complete(self, key, flight):
+        failed = flight.cancelled() or flight.exception() is not None
+        # result of invalidated flight is not shared with later calls
+        if self.__flights.get(key) is not flight:
+            return
+        del self.__flights[key]
+        if failed:
+            return
+
+        now = time.monotonic()
+        self.__results.pop(key, None)
+        self.__results[key] = (now + self.ttl, flight.result())
+        # all results live equally long hence expired results are always at the beginning
+        while self.__results and next(iter(self.__results.values()))[0] < now:
+            self.__results.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """
+        Discards result and in-flight computation of given key, so that next call of key computes again.
+        Discards all keys if key is not provided.
+        """
+        if key is None:
+            self.__flights.clear()
+            self.__results.clear()
+        else:
+            self.__flights.pop(key, None)
+            self.__results.pop(key, None)
+
+    def stats(self):
+        return {"name": self.name, "in_flight": len(self.__flights), "size": len(self.__results), "ttl": self.ttl,
+                "calls": self.calls, "shared": self.shared}
+
+
+# reference data caches
+categories = RefDataCache("categories")
+tags = RefDataCache("tags")
+users = RefDataCache("users")
+shares = RefDataCache("shares")
+
+# reference data caches mapped by name of collection they cache
+REF_DATA_CACHES = {ref_cache.name: ref_cache for ref_cache in [categories, tags, users, shares]}
+
+# coalesced hot reads
+story_details = SingleFlight("story_details")
+
+
+def get_all_stats():
+    return [cache.stats() for cache in list(REF_DATA_CACHES.values()) + [story_details]]
@@ -0,0 +1,82 @@
+#!/usr/bin/python3.6
+import sys
+import time
+import asyncio
+if "../../.." not in sys.path:
+    sys.path.append("../../..")
+
+from server.commons.cache import RefDataCache, SingleFlight
+
+
+def test_lru_eviction():
+    cache = RefDataCache("test", max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_ttl_expiry():
+    cache = RefDataCache("test", ttl=0.1)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.15)
+    assert cache.get("a") is None
+
+
+def test_copies_and_invalidation():
+    cache = RefDataCache("test")
+    cache.set("a", {"name": "sports"})
+    value = cache.get("a")
+    value["name"] = "politics"
+    assert cache.get("a") == {"name": "sports"}
+    cache.invalidate()
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_get_or_load():
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return {"_id": "a"}
+
+    cache = RefDataCache("test")
+    loop = asyncio.get_event_loop()
+    assert loop.run_until_complete(cache.get_or_load("a", load)) == {"_id": "a"}
+    assert loop.run_until_complete(cache.get_or_load("a", load)) == {"_id": "a"}
+    assert len(calls) == 1
+
+
+def test_single_flight():
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def read_concurrently(flight):
+        return await asyncio.gather(*[flight.do("a", load) for _ in range(10)])
+
+    flight = SingleFlight("test", ttl=0.1)
+    loop = asyncio.get_event_loop()
+    assert loop.run_until_complete(read_concurrently(flight)) == [1] * 10
+    assert loop.run_until_complete(flight.do("a", load)) == 1
+    flight.invalidate("a")
+    assert loop.run_until_complete(flight.do("a", load)) == 2
+    time.sleep(0.15)
+    assert loop.run_until_complete(flight.do("a", load)) == 3
+    assert flight.stats()["calls"] == 3 and flight.stats()["shared"] == 10
+
+
+if __name__ == "__main__":
+    test_lru_eviction()
+    test_ttl_expiry()
+    test_copies_and_invalidation()
+    test_get_or_load()
+    test_single_flight()
+    print("test_cache PASSED.")
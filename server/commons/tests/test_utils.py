@@ -0,0 +1,95 @@
+#!/usr/bin/python3.6
+import sys
+import asyncio
+from unittest import mock
+if "../../.." not in sys.path:
+    sys.path.append("../../..")
+
+from aiohttp.test_utils import make_mocked_request
+
+import server.commons.utils as utils
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+async def failing_cursor(count):
+    """
+    Yields given number of documents and fails like a cursor whose connection is lost
+    """
+    for index in range(count):
+        yield {"_id": index, "name": "x" * 100}
+    raise ConnectionError("connection lost")
+
+
+async def empty_cursor():
+    return
+    yield
+
+
+def test_page_cursor_round_trip():
+    cursor = utils.encode_page_cursor("2019-01-02 10:00:00", "5c2c9c7e9d1e2a3b4c5d6e7f")
+    assert utils.decode_page_cursor(cursor) == ["2019-01-02 10:00:00", "5c2c9c7e9d1e2a3b4c5d6e7f"]
+    assert utils.decode_page_cursor(utils.encode_page_cursor(3, None)) == [3, None]
+    # cursors are passed in urls as they are
+    assert all(char.isalnum() or char in "-_=" for char in cursor)
+
+
+def test_invalid_page_cursor():
+    assert utils.decode_page_cursor("not a cursor") is None
+    assert utils.decode_page_cursor("") is None
+    assert utils.decode_page_cursor(None) is None
+    # valid base64 of json which is not a list of sort key values
+    assert utils.decode_page_cursor("eyJhIjogMX0=") is None
+
+
+def test_story_id_of_asset():
+    assert utils.get_story_id_of_asset("story_1__clip.mp4") == "story_1"
+    assert utils.get_story_id_of_asset("clip.mp4") is None
+    assert utils.get_story_id_of_asset(None) is None
+
+
+def test_stream_failure_before_response():
+    request = make_mocked_request("GET", "/users", transport=mock.Mock())
+    try:
+        run(utils.stream_json_response(request, "users", failing_cursor(1)))
+        assert False, "failure must be raised"
+    except ConnectionError:
+        pass
+    # nothing is sent, hence failure is answered with an error status
+    assert not request._payload_writer.write.called
+    assert not request.transport.close.called
+
+
+def test_stream_failure_aborts_response():
+    request = make_mocked_request("GET", "/users", transport=mock.Mock())
+    chunk_size, utils.STREAM_CHUNK_SIZE = utils.STREAM_CHUNK_SIZE, 256
+    try:
+        run(utils.stream_ndjson_response(request, failing_cursor(10)))
+        assert False, "failure must be raised"
+    except ConnectionError:
+        pass
+    finally:
+        utils.STREAM_CHUNK_SIZE = chunk_size
+    # response is never terminated so that clients do not take it as complete
+    assert request._payload_writer.write.called
+    assert not request._payload_writer.write_eof.called
+    assert request.transport.close.called
+
+
+def test_stream_empty_cursor():
+    request = make_mocked_request("GET", "/users", transport=mock.Mock())
+    response = run(utils.stream_ndjson_response(request, empty_cursor()))
+    assert response.status == 200
+    assert request._payload_writer.write_eof.called
+
+
+if __name__ == "__main__":
+    test_page_cursor_round_trip()
+    test_invalid_page_cursor()
+    test_story_id_of_asset()
+    test_stream_failure_before_response()
+    test_stream_failure_aborts_response()
+    test_stream_empty_cursor()
+    print("test_utils PASSED.")
@@ -1,4 +1,5 @@
 
+import base64
 import crossplane
 import datetime
 import hashlib
@@ -7,6 +8,7 @@ import os
 import re
 import uuid
 
+import pymongo
 from aiohttp import web as aioweb
 
 # importing logger
@@ -15,6 +17,9 @@ import server.commons.constants as consts
 import server.config as conf
 from server.commons import session
 
+# size in bytes of serialized json buffered before it is written to a streamed response
+STREAM_CHUNK_SIZE = 64 * 1024
+
 # ------------- Common Api's ---------------
 
 
@@ -26,6 +31,91 @@ def get_http_error(message="", httperror=aioweb.HTTPUnprocessableEntity, code=No
     return httperror(text=json.dumps(error))
 
 
+async def get_stream_chunks(parts):
+    """
+    Encodes serialized parts buffering them into chunks of STREAM_CHUNK_SIZE bytes
+    """
+    chunk = []
+    chunk_size = 0
+    async for part in parts:
+        chunk.append(part)
+        chunk_size += len(part)
+        if chunk_size >= STREAM_CHUNK_SIZE:
+            yield "".join(chunk).encode(consts.APP_ENCODING)
+            chunk = []
+            chunk_size = 0
+    if chunk:
+        yield "".join(chunk).encode(consts.APP_ENCODING)
+
+
+async def prepare_stream_response(request, content_type, headers=None):
+    response = aioweb.StreamResponse(headers=headers)
+    response.content_type = content_type
+    response.charset = consts.APP_ENCODING
+    response.enable_compression()
+    await response.prepare(request)
+    return response
+
+
+async def write_stream_response(request, content_type, parts, headers=None):
+    """
+    Streams serialized parts as response. First chunk is serialized before response is prepared so that a failure
+    before anything is sent is answered with an error status. A failure after response is prepared aborts the
+    connection without terminating the response, so that clients never take a truncated response for a complete one.
+    """
+    chunks = get_stream_chunks(parts)
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    response = await prepare_stream_response(request, content_type, headers)
+    try:
+        if first is not None:
+            await response.write(first)
+            async for chunk in chunks:
+                await response.write(chunk)
+    except Exception as e:
+        logger.error("[{}] [{}]: Aborting streamed response. {}".format(request.path, request.method, e))
+        if request.transport is not None:
+            request.transport.close()
+        raise
+    await response.write_eof()
+    return response
+
+
+async def stream_json_response(request, key, cursor):
+    """
+    Streams documents of a motor cursor as '{"<key>": [doc, ...]}' json response. Documents are serialized as they
+    are fetched so that memory usage does not grow with number of documents. Response is compressed with gzip or
+    deflate as negotiated using 'Accept-Encoding' request header.
+    """
+    async def parts():
+        yield "{{{}: [".format(json.dumps(key))
+        separator = ""
+        async for doc in cursor:
+            yield separator + json.dumps(doc)
+            separator = ", "
+        yield "]}"
+
+    return await write_stream_response(request, "application/json", parts())
+
+
+async def stream_ndjson_response(request, cursor, filename=None):
+    """
+    Streams documents of a motor cursor as newline delimited json, one document per line.
+    Values which are not json serializable (like ObjectId) are written as strings.
+    """
+    async def parts():
+        async for doc in cursor:
+            yield json.dumps(doc, default=str) + "\n"
+
+    headers = None
+    if filename:
+        headers = {"Content-Disposition": 'attachment; filename="{}"'.format(filename)}
+    return await write_stream_response(request, "application/x-ndjson", parts(), headers)
+
+
 def generate_md5_for_string(s):
     return hashlib.md5(s.encode(consts.APP_ENCODING)).hexdigest()
 
@@ -41,6 +131,64 @@ def generate_random_id():
     return "{}".format(uuid.uuid4()).replace("-", "")
 
 
+def get_agency_key(agency_id):
+    """
+    Agency ids are matched case insensitively. Agency key is the normalized agency id used for exact match lookups.
+    """
+    return "{}".format(agency_id).lower()
+
+
+async def backfill_agency_keys(collection, agency_field, batch_size=500):
+    """
+    Sets 'agency_key' on documents of collection saved before agency key was maintained
+    :param collection: motor collection
+    :param agency_field: field of document which holds agency id
+    """
+    count = 0
+    while True:
+        docs = await collection.find({"agency_key": {"$exists": False}}, {agency_field: 1}) \
+            .limit(batch_size).to_list(None)
+        if not docs:
+            break
+        requests = [pymongo.UpdateOne({"_id": doc["_id"]},
+                                      {"$set": {"agency_key": get_agency_key(doc.get(agency_field))}})
+                    for doc in docs]
+        await collection.bulk_write(requests, ordered=False)
+        count += len(requests)
+    if count:
+        logger.info("[backfill_agency_keys] [{}]: Agency key set on '{}' documents."
+                    .format(collection.name, count))
+    return True
+
+
+def get_story_id_of_asset(asset_id):
+    """
+    :return: story id of asset or None if asset id is not prepared using 'consts.ASSET_ID_FORMAT'
+    """
+    if not isinstance(asset_id, str) or "__" not in asset_id:
+        return None
+    return asset_id.split("__", 1)[0] or None
+
+
+def encode_page_cursor(*values):
+    """
+    Encodes given sort key values into an opaque url safe cursor string
+    """
+    return base64.urlsafe_b64encode(json.dumps(values).encode(consts.APP_ENCODING)).decode(consts.APP_ENCODING)
+
+
+def decode_page_cursor(cursor):
+    """
+    Decodes cursor prepared using 'encode_page_cursor'
+    :return: list of sort key values or None if cursor is invalid
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode(consts.APP_ENCODING)).decode(consts.APP_ENCODING))
+    except (ValueError, TypeError, AttributeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
 def get_request_server_url(path):
     return "http://{}:{}/{}".format(conf.REQUEST_SERVER_IP, conf.REQUEST_SERVER_PORT, path)
 
@@ -0,0 +1,27 @@
+"""
+This module provides administrative routes to inspect runtime state of request server.
+"""
+from aiohttp import web as aioweb
+
+import server.commons.cache as cache
+import server.request.dispatch as dispatch
+
+routes = aioweb.RouteTableDef()
+
+
+# ------------------ Web Routes ------------------
+
+@routes.get("/admin/caches")
+async def get_cache_stats(request):
+    """
+    Reports size and hit/miss counts of reference data caches and coalesced reads of this request server process
+    """
+    return aioweb.json_response({"caches": cache.get_all_stats()})
+
+
+@routes.get("/admin/dispatch")
+async def get_dispatch_stats(request):
+    """
+    Reports number of calls this request server process made to itself in process and over HTTP
+    """
+    return aioweb.json_response(dispatch.client.stats())
@@ -2,11 +2,17 @@
 This module is responsible for dealing with 3rd part news agencies.
 """
 from aiohttp import web as aioweb
+import pymongo
 
 from server.request import logger
 import server.commons.utils as utils
 import server.commons.constants as consts
 
+indexes = {
+    "agencies": [pymongo.IndexModel([("name", pymongo.ASCENDING)], name="name"),
+                 pymongo.IndexModel([("agency_key", pymongo.ASCENDING)], name="agency_key")]
+}
+
 routes = aioweb.RouteTableDef()
 
 
@@ -15,6 +21,7 @@ async def initial_setup(app):
     # initializing default agency
     default_agency = {
         "_id": consts.JOURNO_AGENCY_ID,
+        "agency_key": utils.get_agency_key(consts.JOURNO_AGENCY_ID),
         "name": "Inbox",
         "description": "Journo News Feed",
         "config": {
@@ -32,6 +39,9 @@ async def initial_setup(app):
         if not res.upserted_id:
             logger.error("[agencies.initial_setup]: Failed to create default agency to db.")
             return False
+
+    # normalizing ids of agencies saved before agency key was maintained
+    await utils.backfill_agency_keys(db.agencies, "_id")
     return True
 
 
@@ -53,11 +63,13 @@ async def create_agency_info(request):
         return utils.get_http_error("Agency id '{}' reserved for journo application. Please use different id."
                                     .format(agency_id))
 
-    # checking if agency id already configured
-    if await db.agencies.find_one({"_id": agency_id}):
+    # checking if agency id already configured. Agency ids are matched case insensitively.
+    agency_key = utils.get_agency_key(agency_id)
+    if agency_key == consts.JOURNO_AGENCY_ID or await db.agencies.find_one({"agency_key": agency_key}):
         logger.error("[/agencies] [ POST]: Agency id '{}' already in use. Please choose different id.".format(agency_id))
         return utils.get_http_error("Agency '{}' already in use. Please choose different id.".format(agency_id))
     agencyinfo["_id"] = agency_id
+    agencyinfo["agency_key"] = agency_key
 
     # agency name
     if not data.get("name"):
@@ -216,10 +228,7 @@ async def get_all_agencies(request):
         query["_id"] = search_filter["id"]
 
     # retrieving information from db
-    agencies = []
-    async for agency in db.agencies.find(query):
-        agencies.append(agency)
-    return aioweb.json_response({"agencies": agencies})
+    return await utils.stream_json_response(request, "agencies", db.agencies.find(query))
 
 
 @routes.get("/agencies/{agency_id}")
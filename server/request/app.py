@@ -27,13 +27,19 @@ import server.request.users as usersrv
 import server.request.journoweb as websrv
 import server.request.nrcs as nrcssrv
 import server.request.streams as streamsrv
+import server.request.indexes as indexsrv
+import server.request.exports as exportsrv
+import server.request.admin as adminsrv
+import server.request.httpcache as httpcache
+import server.request.dispatch as dispatch
 # NEWS FEEDS TODO
 import server.request.feeds as feedsrv
 
 # ------------ Service setup --------------
 
 # adding routes from all plugins to app
-PLUGINS_TO_INSTALL = [mdatasrv, sharesrv, tasksrv, storysrv, agencysrv, usersrv, feedsrv, nrcssrv, websrv, streamsrv]
+PLUGINS_TO_INSTALL = [mdatasrv, sharesrv, tasksrv, storysrv, agencysrv, usersrv, feedsrv, nrcssrv, websrv, streamsrv,
+                      indexsrv, exportsrv, adminsrv]
 
 
 async def setup_plugins(webapp):
@@ -46,6 +52,12 @@ async def setup_plugins(webapp):
     return True
 
 
+async def setup_plugin_indexes(webapp):
+    # collecting indexes declared by plugins and creating missing ones
+    webapp["indexes"] = indexsrv.collect_plugin_indexes(PLUGINS_TO_INSTALL)
+    return await indexsrv.reconcile_indexes(webapp["db"], webapp["indexes"])
+
+
 def add_plugin_routes(webapp):
     for plugin in PLUGINS_TO_INSTALL:
         # validating plugin
@@ -122,11 +134,18 @@ if __name__ == "__main__":
     loop = asyncio.get_event_loop()
 
     # web app
-    app = aioweb.Application()
+    app = aioweb.Application(middlewares=[httpcache.conditional_get_middleware])
 
     # adding shutdown handler
     app.on_shutdown.append(shutdown_app)
 
+    # adding cache validators to responses of cached endpoints
+    app.on_response_prepare.append(httpcache.add_cache_headers)
+
+    # polling change counters shared by request server processes
+    app.on_startup.append(httpcache.changes.start)
+    app.on_cleanup.append(httpcache.changes.stop)
+
     # setting up db and adding to app
     status = loop.run_until_complete(setup_app(app))
     if not status:
@@ -134,6 +153,12 @@ if __name__ == "__main__":
         loop.run_until_complete(shutdown_app(app, loop))
         sys.exit(1)
 
+    # setting up indexes declared by plugins
+    if not loop.run_until_complete(setup_plugin_indexes(app)):
+        logger.error("[Main]: Failed to setup database indexes. Hence terminating")
+        loop.run_until_complete(shutdown_app(app, loop))
+        sys.exit(1)
+
     # setting up plugins
     if not loop.run_until_complete(setup_plugins(app)):
         logger.error("[Main]: Failed to setup plugins. Hence terminating")
@@ -143,6 +168,9 @@ if __name__ == "__main__":
     # adding routes
     add_plugin_routes(app)
 
+    # dispatching calls of request server to itself in process
+    dispatch.client.attach(app, PLUGINS_TO_INSTALL)
+
     # adding static routes to host Journo Web
     if not add_web_static_routes(app):
         logger.error("[Main]: Failed to add Journo Web static paths.")
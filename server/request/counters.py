@@ -0,0 +1,178 @@
+"""
+This module maintains story counters so that story listings do not have to count 'stories' collection on every
+request. One counter is kept for every agency and one for every (agency, filter field, value) combination of the
+filters listed in COUNTED_FILTERS. Counters are updated incrementally whenever a story is created or updated.
+"""
+from collections import defaultdict
+
+import pymongo
+
+# importing logger
+from server.request import logger
+import server.commons.utils as utils
+
+# story fields for which per value counters are maintained
+COUNTED_FILTERS = ["category_id", "created_date", "tags", "review_status.reviewed", "archived"]
+
+
+def get_counter_id(agency, field=None, value=None):
+    if field is None:
+        return agency
+    return "{}|{}|{}".format(agency, field, value)
+
+
+def get_field_values(story, field):
+    """
+    Resolves values of a dotted field from story. List fields like 'tags' provide one value per element.
+    """
+    value = story
+    for key in field.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return []
+        value = value[key]
+    if isinstance(value, list):
+        return list(set(value))
+    return [] if value is None else [value]
+
+
+def get_story_counter_entries(story):
+    """
+    Prepares list of (agency, field, value) entries which given story contributes to.
+    """
+    if not story:
+        return []
+    agency = story.get("agency_key") or utils.get_agency_key(story.get("agency_id"))
+    entries = [(agency, None, None)]
+    for field in COUNTED_FILTERS:
+        for value in get_field_values(story, field):
+            entries.append((agency, field, value))
+    return entries
+
+
+async def update_story_counters(db, old_story=None, new_story=None):
+    """
+    Updates counters for a story change. Pass only 'new_story' on create, only 'old_story' on delete and both
+    on update.
+    """
+    await write_counter_steps(db, get_counter_steps(old_story, new_story))
+
+
+def get_counter_steps(old_story=None, new_story=None):
+    """
+    Prepares steps by which counters change for a story change
+    :return: dict of steps mapped by (agency, field, value) counter entry
+    """
+    old_entries = set(get_story_counter_entries(old_story))
+    new_entries = set(get_story_counter_entries(new_story))
+
+    steps = {}
+    for entries, step in [(old_entries - new_entries, -1), (new_entries - old_entries, 1)]:
+        for entry in entries:
+            steps[entry] = step
+    return steps
+
+
+async def add_stories_to_counters(db, stories):
+    """
+    Updates counters for newly created stories with a single bulk write
+    """
+    steps = defaultdict(int)
+    for story in stories:
+        for entry in set(get_story_counter_entries(story)):
+            steps[entry] += 1
+    await write_counter_steps(db, steps)
+
+
+async def write_counter_steps(db, steps):
+    """
+    Increments counters by given steps
+    :param steps: dict of steps mapped by (agency, field, value) counter entry
+    """
+    requests = []
+    for (agency, field, value), step in steps.items():
+        requests.append(pymongo.UpdateOne(
+            {"_id": get_counter_id(agency, field, value)},
+            {"$inc": {"count": step}, "$setOnInsert": {"agency": agency, "field": field, "value": value}},
+            upsert=True))
+
+    if requests:
+        await db.story_counters.bulk_write(requests, ordered=False)
+
+
+async def get_story_count(db, agency_id, query):
+    """
+    Returns number of stories matching given story query. Counter is used if query filters on agency and at most one
+    counted field, otherwise stories are counted.
+    :param db: database instance
+    :param agency_id: agency to which the query is restricted
+    :param query: stories query
+    """
+    filters = {key: value for key, value in query.items() if key not in ["agency_id", "agency_key"]}
+    counter_id = None
+    if not filters:
+        counter_id = get_counter_id(utils.get_agency_key(agency_id))
+
+    elif len(filters) == 1:
+        field, value = list(filters.items())[0]
+        if field == "tags" and isinstance(value, dict) and len(value.get("$in", [])) == 1:
+            value = value["$in"][0]
+        if field in COUNTED_FILTERS and not isinstance(value, (dict, list)):
+            counter_id = get_counter_id(utils.get_agency_key(agency_id), field, value)
+
+    if counter_id is None:
+        return await db.stories.count_documents(query)
+
+    counter = await db.story_counters.find_one({"_id": counter_id})
+    return max(counter["count"], 0) if counter else 0
+
+
+async def get_story_facets(db, agency_id=None):
+    """
+    Returns story counts per value of every counted field of an agency along with story count of every agency.
+    Counters which dropped to zero are skipped.
+    :return: dict with 'agencies' list of (agency, count) and 'fields' dict of (value, count) lists mapped by field
+    """
+    facets = {"agencies": [], "fields": {field: [] for field in COUNTED_FILTERS}}
+    async for counter in db.story_counters.find({"field": None, "count": {"$gt": 0}}):
+        facets["agencies"].append((counter["agency"], counter["count"]))
+
+    if agency_id is not None:
+        query = {"agency": utils.get_agency_key(agency_id), "field": {"$in": COUNTED_FILTERS}, "count": {"$gt": 0}}
+        async for counter in db.story_counters.find(query):
+            facets["fields"][counter["field"]].append((counter["value"], counter["count"]))
+    return facets
+
+
+async def rebuild_story_counters(db):
+    """
+    Recalculates all story counters from 'stories' collection. Counters are replaced one by one and never deleted,
+    so request server processes which rebuild at the same time write same counts and do not fail each other.
+    """
+    agency = {"$ifNull": ["$agency_key", {"$toLower": "$agency_id"}]}
+    counters = []
+    async for doc in db.stories.aggregate([{"$group": {"_id": agency, "count": {"$sum": 1}}}]):
+        counters.append({"_id": get_counter_id(doc["_id"]), "agency": doc["_id"], "field": None, "value": None,
+                         "count": doc["count"]})
+
+    for field in COUNTED_FILTERS:
+        pipeline = []
+        if field == "tags":
+            pipeline.append({"$unwind": "$tags"})
+        pipeline.append({"$match": {field: {"$exists": True, "$ne": None}}})
+        pipeline.append({"$group": {"_id": {"agency": agency, "value": "$" + field}, "count": {"$sum": 1}}})
+        async for doc in db.stories.aggregate(pipeline):
+            counters.append({"_id": get_counter_id(doc["_id"]["agency"], field, doc["_id"]["value"]),
+                             "agency": doc["_id"]["agency"], "field": field, "value": doc["_id"]["value"],
+                             "count": doc["count"]})
+
+    requests = [pymongo.ReplaceOne({"_id": counter["_id"]}, counter, upsert=True) for counter in counters]
+    if requests:
+        try:
+            await db.story_counters.bulk_write(requests, ordered=False)
+        except pymongo.errors.BulkWriteError as ex:
+            if any(error.get("code") != 11000 for error in ex.details.get("writeErrors", [])):
+                raise
+            # counters inserted by another process meanwhile are replaced now
+            await db.story_counters.bulk_write(requests, ordered=False)
+    logger.info("[rebuild_story_counters]: '{}' story counters rebuilt.".format(len(counters)))
+    return True
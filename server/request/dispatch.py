@@ -0,0 +1,166 @@
+"""
+This module dispatches calls which request server makes to itself in process.
+Urls of this request server are resolved against routes of the installed plugins and the route handler is invoked
+directly with the running application and its shared motor db, so no socket, http parsing or extra event loop
+round trip is involved. Only handlers marked with 'local' are dispatched in process, as streamed responses need a
+real connection. All other calls, and all calls made before the client is attached (e.g. from task server or other
+nodes), go over HTTP.
+"""
+import json
+import re
+
+from aiohttp import web as aioweb
+from yarl import URL
+
+# importing logger
+from server.request import logger
+from server.commons import session
+import server.commons.constants as consts
+import server.commons.utils as utils
+import server.request.httpcache as httpcache
+
+# handlers which can be invoked in process
+LOCAL_HANDLERS = set()
+
+
+def local(handler):
+    """
+    Marks a route handler which can be invoked in process. Handler may only use 'app', 'match_info', 'rel_url' and
+    'json()' of request and must not prepare its response itself.
+    """
+    LOCAL_HANDLERS.add(handler)
+    return handler
+
+
+def compile_route_path(path):
+    # '/stories/{story_id}' -> '/stories/(?P<story_id>[^/]+)'
+    return re.compile(re.sub(r"\\{(\w+)\\}", r"(?P<\1>[^/]+)", re.escape(path)))
+
+
+class LocalRequest(dict):
+    """
+    Request passed to handlers invoked in process
+    """
+    def __init__(self, app, method, rel_url, match_info, data=None):
+        super().__init__()
+        self.app = app
+        self.method = method
+        self.rel_url = rel_url
+        self.match_info = match_info
+        self.__data = data
+
+    @property
+    def path(self):
+        return self.rel_url.path
+
+    @property
+    def query(self):
+        return self.rel_url.query
+
+    async def read(self):
+        if isinstance(self.__data, str):
+            return self.__data.encode(consts.APP_ENCODING)
+        return self.__data or b""
+
+    async def text(self):
+        return (await self.read()).decode(consts.APP_ENCODING)
+
+    async def json(self, loads=json.loads):
+        return loads(await self.text())
+
+
+class LocalResponse:
+    """
+    Response of handler invoked in process. Provides the part of client response interface used by callers.
+    """
+    def __init__(self, status, text):
+        self.status = status
+        self.__text = text
+
+    async def text(self):
+        return self.__text
+
+    async def json(self):
+        return json.loads(self.__text) if self.__text else None
+
+
+class DispatchClient:
+    """
+    HTTP client for request server urls which invokes local handlers in process once attached to application
+    """
+    def __init__(self):
+        self.app = None
+        self.local_calls = 0
+        self.http_calls = 0
+        self.__origin = None
+        self.__routes = []
+
+    def attach(self, app, plugins):
+        """
+        Collects routes of plugins in order of registration, so they are matched the same way as by app router
+        """
+        self.app = app
+        self.__origin = URL(utils.get_request_server_url("")).origin()
+        self.__routes = []
+        for plugin in plugins:
+            for route in getattr(plugin, "routes", []):
+                if isinstance(route, aioweb.RouteDef):
+                    self.__routes.append((route.method, compile_route_path(route.path), route.handler, route.path))
+
+    def resolve(self, method, url):
+        """
+        :return: tuple of handler, match info and route path if url can be dispatched in process else None
+        """
+        if self.app is None or url.origin() != self.__origin:
+            return None
+        for route_method, path_regex, handler, route_path in self.__routes:
+            if route_method != method:
+                continue
+            match = path_regex.fullmatch(url.path)
+            if match:
+                return (handler, match.groupdict(), route_path) if handler in LOCAL_HANDLERS else None
+        return None
+
+    async def request(self, method, url, data=None, params=None):
+        url = URL(url)
+        if params:
+            url = url.update_query(params)
+
+        resolved = self.resolve(method, url)
+        if resolved is None:
+            self.http_calls += 1
+            return await session.request(method, str(url), data=data)
+
+        self.local_calls += 1
+        handler, match_info, route_path = resolved
+        try:
+            response = await handler(LocalRequest(self.app, method, url.relative(), match_info, data))
+        except aioweb.HTTPException as ex:
+            response = ex
+        except Exception as ex:
+            # same as response of an unhandled error of request served over HTTP
+            logger.exception("[dispatch] [{}] [{}]: Error handling request. Error: '{}'".format(method, url.path, ex))
+            response = aioweb.HTTPInternalServerError()
+        finally:
+            # requests dispatched in process do not pass through middlewares
+            if method not in ["GET", "HEAD"]:
+                await httpcache.track_modification(self.app, route_path)
+        return LocalResponse(response.status, response.text)
+
+    async def get(self, url, params=None):
+        return await self.request("GET", url, params=params)
+
+    async def post(self, url, data=None):
+        return await self.request("POST", url, data=data)
+
+    async def put(self, url, data=None):
+        return await self.request("PUT", url, data=data)
+
+    async def delete(self, url):
+        return await self.request("DELETE", url)
+
+    def stats(self):
+        return {"local_calls": self.local_calls, "http_calls": self.http_calls}
+
+
+client = DispatchClient()
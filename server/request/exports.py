@@ -0,0 +1,151 @@
+"""
+This module exports complete collections for reporting and archiving.
+Documents are read with a single server side cursor and streamed as newline delimited json (NDJSON) so memory usage
+of request server stays constant irrespective of the size of export.
+"""
+import datetime
+
+import pymongo
+from aiohttp import web as aioweb
+
+# importing logger
+from server.request import logger
+import server.commons.constants as consts
+import server.commons.utils as utils
+import server.request.versions as versions
+
+# number of documents fetched from database in each batch
+EXPORT_BATCH_SIZE = 1000
+
+# exportable resources. Every resource is filtered on its date field and on agency of story it belongs to.
+# Documents without story id field (like proxy and lowres tasks) belong to story of their asset.
+# Versions are exported reconstructed, as 'story_versions' stores deltas and compressed snapshots.
+EXPORTS = {
+    "stories": {"collection": "stories", "date_field": "created_datetime", "story_id_field": "_id"},
+    "assets": {"collection": "assets", "date_field": "created_datetime", "story_id_field": "story_id"},
+    "versions": {"collection": "story_versions", "date_field": "version_time", "story_id_field": "story_id"},
+    "tasks": {"collection": "tasks", "date_field": "created_datetime", "story_id_field": "data.story_id",
+              "asset_id_field": "data.asset_id"},
+}
+
+routes = aioweb.RouteTableDef()
+
+
+def get_date_range_query(date_field, from_date, to_date):
+    """
+    Prepares query for documents whose date field lies between from_date and to_date (both inclusive).
+    Date fields are stored as strings starting with date in 'consts.DATE_FORMAT' hence they are compared as strings.
+    :return: query or None if any of the dates is invalid
+    """
+    date_range = {}
+    try:
+        if from_date:
+            datetime.datetime.strptime(from_date, consts.DATE_FORMAT)
+            date_range["$gte"] = from_date
+        if to_date:
+            next_date = datetime.datetime.strptime(to_date, consts.DATE_FORMAT) + datetime.timedelta(days=1)
+            date_range["$lt"] = next_date.strftime(consts.DATE_FORMAT)
+    except ValueError:
+        return None
+    return {date_field: date_range} if date_range else {}
+
+
+def get_export_projection(fields):
+    if not fields:
+        return None
+    return {field.strip(): 1 for field in fields.split(",") if field.strip()}
+
+
+def get_story_lookup(export):
+    """
+    Prepares pipeline stages which join documents with their story as 'export_story'. Story id of documents which
+    do not carry one is taken from their asset id as 'utils.get_story_id_of_asset' does.
+    """
+    story_id_field = export["story_id_field"]
+    stages = []
+    if export.get("asset_id_field"):
+        asset_story_id = {"$arrayElemAt": [{"$split": [{"$ifNull": ["$" + export["asset_id_field"], ""]}, "__"]}, 0]}
+        stages.append({"$addFields": {"export_story_id": {"$ifNull": ["$" + story_id_field, asset_story_id]}}})
+        story_id_field = "export_story_id"
+    stages.append({"$lookup": {"from": "stories", "localField": story_id_field, "foreignField": "_id",
+                               "as": "export_story"}})
+    return stages
+
+
+async def project_documents(cursor, projection):
+    """
+    Keeps only top level fields of projection in documents read from cursor
+    """
+    fields = {field.split(".")[0] for field in projection}
+    async for doc in cursor:
+        yield {key: value for key, value in doc.items() if key in fields}
+
+
+# ------------------ Web Routes ------------------
+
+@routes.get("/exports/{resource}")
+async def export_resource(request):
+    """
+    Streams all documents of a resource as NDJSON.
+    Query parameters:
+        from_date   - documents created on or after this date (YYYY-MM-DD)
+        to_date     - documents created on or before this date (YYYY-MM-DD)
+        agency_id   - only documents of stories of this agency
+        fields      - comma separated fields to be exported. All fields if not provided. Versions are exported
+                      with top level fields 'story_id', 'version_time' and 'version_data' only.
+    """
+    db = request.app["db"]
+    search_filter = request.rel_url.query
+
+    resource = request.match_info["resource"]
+    export = EXPORTS.get(resource)
+    if not export:
+        logger.error("[/exports] [GET]: invalid resource '{}' requested.".format(resource))
+        return utils.get_http_error("Only '{}' can be exported".format("', '".join(sorted(EXPORTS.keys()))))
+
+    export_format = search_filter.get("format", "ndjson")
+    if export_format != "ndjson":
+        logger.error("[/exports] [GET] [{}]: invalid format '{}' requested.".format(resource, export_format))
+        return utils.get_http_error("Only 'ndjson' export format is supported")
+
+    query = get_date_range_query(export["date_field"], search_filter.get("from_date"), search_filter.get("to_date"))
+    if query is None:
+        logger.error("[/exports] [GET] [{}]: invalid date range '{}' - '{}' provided."
+                     .format(resource, search_filter.get("from_date"), search_filter.get("to_date")))
+        return utils.get_http_error("Please provide valid date format.")
+
+    projection = get_export_projection(search_filter.get("fields"))
+    collection = db[export["collection"]]
+    agency_id = search_filter.get("agency_id")
+
+    # versions are reconstructed story by story from complete documents and projected afterwards
+    version_projection = None
+    sort = None
+    if resource == "versions":
+        version_projection, projection = projection, None
+        sort = [("story_id", pymongo.DESCENDING), ("version_count", pymongo.ASCENDING)]
+
+    if agency_id and resource == "stories":
+        query["agency_key"] = utils.get_agency_key(agency_id)
+
+    if agency_id and resource != "stories":
+        # documents are joined with their story to filter on agency
+        pipeline = [{"$match": query}] + get_story_lookup(export) + [
+            {"$match": {"export_story.agency_key": utils.get_agency_key(agency_id)}},
+            {"$project": projection or {"export_story": 0, "export_story_id": 0}}
+        ]
+        if sort:
+            pipeline.append({"$sort": dict(sort)})
+        cursor = collection.aggregate(pipeline, allowDiskUse=True, batchSize=EXPORT_BATCH_SIZE)
+    else:
+        cursor = collection.find(query, projection, sort=sort, batch_size=EXPORT_BATCH_SIZE)
+
+    if resource == "versions":
+        cursor = versions.iterate_versions(db, cursor)
+        if version_projection:
+            cursor = project_documents(cursor, version_projection)
+
+    logger.info("[/exports] [GET] [{}]: exporting with query '{}' and projection '{}'."
+                .format(resource, query, projection))
+    filename = "{}_{}.ndjson".format(resource, datetime.datetime.now().strftime(consts.DATE_FORMAT))
+    return await utils.stream_ndjson_response(request, cursor, filename=filename)
@@ -1,16 +1,42 @@
 """
  This module is responsble for registering of websockets
- and sending feeds to the registered clients
+ and sending feeds to the registered clients.
+ Every feed is published on topics (agency, story, stream or user) and is sent only to websockets subscribed to
+ any of its topics. Websockets subscribe with 'topics' query parameter of '/ws' and later with
+ '{"subscribe": [topic, ...]}' and '{"unsubscribe": [topic, ...]}' messages. Websockets which do not specify topics
+ are subscribed to ALL_TOPICS and receive every feed except OPT_IN_FEEDS, which are sent only to websockets
+ subscribed to one of their topics.
+ Every feed is stamped with a unique sequence number 'seq' and recent feeds are kept in a replay buffer.
+ Clients reconnecting with '/ws?since=<last seq received>' are sent the feeds of their topics delivered after that
+ feed, or a 'replay-unavailable' feed if that feed is no longer buffered, in which case they must reload.
+ Feeds published by any request server process are written to the capped FEED_EVENTS_COLLECTION and every process
+ tails it to deliver them to its own websockets, so clients receive all feeds irrespective of the process they are
+ connected to.
+ NOTE: Sequence numbers are taken from a shared counter before writing, so feeds published by different processes
+     at the same moment may be written and delivered out of sequence order. Feeds are delivered in the order they
+     were written, which is same for all processes, and replay resumes from the position of feed 'since' in that
+     order, hence sequence numbers identify feeds but must not be compared by clients.
+ Feeds of an entity (like 'story:<id>') can be coalesced: feeds of same message and entity published within
+ FEED_COALESCE_WINDOW are sent once with latest data. Feeds of an entity carry its 'key'. Websockets connected with
+ '/ws?patches=true' receive feeds of an entity as JSON patch of its previous feed instead of full data:
+     {"message": ..., "key": <entity>, "base_seq": <seq of previous feed of entity>, "data": {"patch": [op, ...]},
+      "seq": ...}
+ Patches are prepared while delivering, against the previous feed of entity in delivery order, and are sent only to
+ websockets which were sent feed 'base_seq'. Other websockets receive the full feed.
 """
 
 import asyncio
 import json
+import time
+
+import pymongo
 
 from aiohttp import web as aioweb
 
 # importing logger
 from server.request import logger
-from collections import defaultdict
+from collections import defaultdict, deque, OrderedDict
+import server.commons.utils as utils
 
 # shares all rest api routes are added to this table
 routes = aioweb.RouteTableDef()
@@ -21,12 +47,212 @@ async def initial_setup(app):
      Initial setup of the feed server
     """
     app['feed_server'] = FeedServer(app)
+    if not await app['feed_server'].setup(app['db']):
+        return False
     logger.info("Feeds [Setup] Setup completed")
     return True
 
 
+################ Topics ####################
+
+# topic to which every feed except OPT_IN_FEEDS is sent
+ALL_TOPICS = "*"
+
+# frequent feeds which websockets subscribed to ALL_TOPICS do not receive, as clients which do not subscribe to
+# topics do not handle them
+OPT_IN_FEEDS = ["stories-created", "task-progress", "asset-ready"]
+
+# kinds of topics clients can subscribe to. Topic is '<kind>:<id>'.
+TOPIC_AGENCY = "agency"
+TOPIC_STORY = "story"
+TOPIC_STREAM = "stream"
+TOPIC_USER = "user"
+TOPIC_KINDS = [TOPIC_AGENCY, TOPIC_STORY, TOPIC_STREAM, TOPIC_USER]
+
+
+def get_topic(kind, topic_id):
+    if kind == TOPIC_AGENCY:
+        topic_id = utils.get_agency_key(topic_id)
+    return "{}:{}".format(kind, topic_id)
+
+
+def get_story_topics(story):
+    """
+     Topics on which feeds of a story are published
+    """
+    return [get_topic(TOPIC_AGENCY, story.get("agency_id")), get_topic(TOPIC_STORY, story["_id"])]
+
+
+def get_feed_topics(feed, topics):
+    """
+     Topics on which feed is delivered. Feeds other than OPT_IN_FEEDS are delivered to ALL_TOPICS too.
+    """
+    topics = list(topics)
+    if feed.get("message") not in OPT_IN_FEEDS:
+        topics.append(ALL_TOPICS)
+    return topics
+
+
+def parse_topic(topic, user_id):
+    """
+     Validates and normalizes topic requested by client. Clients may subscribe only to their own user topic.
+     :return: normalized topic or None if topic is invalid
+    """
+    if topic == ALL_TOPICS:
+        return topic
+    kind, _, topic_id = "{}".format(topic).partition(":")
+    if kind not in TOPIC_KINDS or not topic_id:
+        return None
+    if kind == TOPIC_USER and topic_id != user_id:
+        return None
+    return get_topic(kind, topic_id)
+
+
 ################ Process Feeds ####################
 
+# maximum number of feeds waiting to be sent to a websocket
+FEED_CLIENT_QUEUE_SIZE = 256
+
+# number of consecutive feeds dropped for a slow websocket after which it is disconnected
+FEED_CLIENT_MAX_DROPS = 32
+
+# number of recent feeds kept for replay to reconnecting websockets
+FEED_REPLAY_SIZE = 1024
+
+# capped collection through which feeds are shared between request server processes
+FEED_EVENTS_COLLECTION = "feed_events"
+FEED_EVENTS_SIZE = 64 * 1024 * 1024
+
+# id of shared feed sequence counter in 'sequences' collection
+FEED_SEQUENCE_ID = "feeds"
+
+# seconds to wait before tailing feed events again when tailable cursor dies
+FEED_TAIL_RETRY_INTERVAL = 1
+
+# seconds between pings sent to websockets. Websockets which do not answer a ping with pong within half of this
+# interval are considered dead and closed.
+FEED_HEARTBEAT_INTERVAL = 30
+
+# seconds between sweeps which remove closed websockets left registered
+FEED_REAP_INTERVAL = 60
+
+# seconds for which coalesced feeds of an entity are held to be merged with later feeds of that entity
+FEED_COALESCE_WINDOW = 0.5
+
+# number of entities whose last published data is kept to prepare patches
+FEED_ENTITY_CACHE_SIZE = 1024
+
+
+def escape_json_pointer(key):
+    return "{}".format(key).replace("~", "~0").replace("/", "~1")
+
+
+def get_json_patch(old, new, path=""):
+    """
+     Prepares JSON patch (RFC 6902) operations which convert old to new.
+     Objects are compared key by key, any other changed value is replaced as a whole.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        operations = []
+        for key in old:
+            if key not in new:
+                operations.append({"op": "remove", "path": "{}/{}".format(path, escape_json_pointer(key))})
+        for key, value in new.items():
+            key_path = "{}/{}".format(path, escape_json_pointer(key))
+            if key not in old:
+                operations.append({"op": "add", "path": key_path, "value": value})
+            else:
+                operations.extend(get_json_patch(old[key], value, key_path))
+        return operations
+    if old == new and type(old) == type(new):
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+class FeedClient(object):
+    """
+     A registered websocket with its own bounded send queue and writer task.
+     Feeds are queued without waiting, so a slow client never delays others. When the queue of a client is full
+     new feeds are dropped for it and after FEED_CLIENT_MAX_DROPS consecutive drops the client is disconnected.
+    """
+    def __init__(self, user_id, ws, patches=False):
+        self.user_id = user_id
+        self.ws = ws
+        self.patches = patches
+        self.topics = set()
+        self.entities = OrderedDict()  # key -> seq of last feed of entity sent, kept only if patches are requested
+        self.dropped = 0
+        self.missed = []
+        self.connected_at = time.time()
+        self.feeds = asyncio.Queue(maxsize=FEED_CLIENT_QUEUE_SIZE)
+        self.task = asyncio.ensure_future(self.write_feeds())
+
+
+    def replay(self, feeds):
+        """
+         Sets missed feeds which are sent before any queued feed.
+         Must be called right after the client is created, before its writer task starts.
+        """
+        self.missed = feeds
+
+
+    def get_entity_feed(self, seq, feed, patch):
+        """
+         Chooses patch of feed if the client was sent the feed the patch is based on, and records the feed as sent
+         :param patch: (key, base_seq, patch_feed) of feed of an entity
+        """
+        key, base_seq, patch_feed = patch
+        sent_seq = self.entities.pop(key, None)
+        self.entities[key] = seq
+        while len(self.entities) > FEED_ENTITY_CACHE_SIZE:
+            self.entities.popitem(last=False)
+        return patch_feed if patch_feed is not None and sent_seq == base_seq else feed
+
+
+    def send(self, feed):
+        """
+         Queues the feed for the websocket. Never waits.
+         :return: False if feed is dropped
+        """
+        if self.task.done():
+            return False
+        try:
+            self.feeds.put_nowait(feed)
+            self.dropped = 0
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped >= FEED_CLIENT_MAX_DROPS:
+                logger.info("[FeedClient] [{}]: Disconnecting slow client after dropping '{}' feeds."
+                            .format(self.user_id, self.dropped))
+                self.stop()
+                asyncio.ensure_future(self.ws.close())
+            return False
+
+
+    async def write_feeds(self):
+        """
+         Writer task of the websocket. Sends missed feeds and then queued feeds one after another.
+        """
+        try:
+            for feed in self.missed:
+                await self.ws.send_str(feed)
+            self.missed = []
+            while True:
+                feed = await self.feeds.get()
+                await self.ws.send_str(feed)
+        except Exception as ex:
+            logger.info("[FeedClient] [{}]: Stopped sending feeds: {}".format(self.user_id, ex))
+
+
+    def stop(self):
+        self.task.cancel()
+
+
+    def is_alive(self):
+        return not self.ws.closed and not self.task.done()
+
+
 class FeedServer(object):
     """
      Feed Server Responsible for Publishing feeds
@@ -35,21 +261,61 @@ class FeedServer(object):
         """
          Setting up of the feed server
         """
+        self.db = None
         self.task = None
-        self.lock = asyncio.Lock()
+        self.tail_task = None
+        self.reap_task = None
         self.feeds = asyncio.Queue()
-        self.websockets = defaultdict(set)  # by default all keys will have a value of a set
+        self.websockets = defaultdict(dict)  # user_id -> {ws: FeedClient}
+        self.subscribers = defaultdict(set)  # topic -> {FeedClient}
+        self.sequence = 0  # sequence of last delivered feed
+        self.history = deque(maxlen=FEED_REPLAY_SIZE)  # (seq, topics, feed, patch) in order of delivery
+        self.delivered = set()  # sequences of feeds in history
+        self.evicted = None  # sequence of last feed dropped from history
+        self.pending = {}  # (message, key) -> coalesced feed waiting to be published
+        self.entities = OrderedDict()  # key -> (seq, data) of last feed of entity delivered
+        # connection accounting
+        self.opened = 0
+        self.closed = 0
+        self.reaped = 0
         app.on_startup.append(self.start_feed_task)
         app.on_cleanup.append(self.stop_feed_task)
         pass
 
 
+    async def setup(self, db):
+        """
+         Creates the shared feed events collection and loads recent feeds into replay buffer
+        """
+        self.db = db
+        try:
+            if FEED_EVENTS_COLLECTION not in await db.list_collection_names():
+                await db.create_collection(FEED_EVENTS_COLLECTION, capped=True, size=FEED_EVENTS_SIZE)
+        except pymongo.errors.CollectionInvalid:
+            # created by another request server process meanwhile
+            pass
+
+        # sequence starts from boot time in milliseconds so that sequences follow earlier ones even if counter is lost
+        await db.sequences.update_one({"_id": FEED_SEQUENCE_ID}, {"$max": {"seq": int(time.time() * 1000)}},
+                                      upsert=True)
+        counter = await db.sequences.find_one({"_id": FEED_SEQUENCE_ID})
+        self.sequence = counter["seq"]
+
+        recent = await db[FEED_EVENTS_COLLECTION].find().sort("$natural", pymongo.DESCENDING)\
+            .limit(FEED_REPLAY_SIZE).to_list(length=FEED_REPLAY_SIZE)
+        for event in reversed(recent):
+            self.deliver(event["seq"], event["topics"], event["feed"], event.get("key"))
+        return True
+
+
     async def start_feed_task(self, app):
         """
          Background feed management task.
          Started upon the start of the app
         """
         self.task = app.loop.create_task(self.process_feeds())
+        self.tail_task = app.loop.create_task(self.tail_feeds())
+        self.reap_task = app.loop.create_task(self.reap_clients())
 
 
     async def stop_feed_task(self, app):
@@ -57,60 +323,280 @@ class FeedServer(object):
          Stop the task.
         """
         logger.info("stop_feed_task: Stopping feed task server")
-        if self.task:
-            await self.feeds.put(None)
-            self.task.cancel()
-            await self.task
+        for clients in self.websockets.values():
+            for client in clients.values():
+                client.stop()
+        tasks = [task for task in [self.task, self.tail_task, self.reap_task] if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
-    async def push(self, feed):
+    async def push(self, feed, topics=None):
         """
          Inserts the feed into the feed queue
         """
-        await self.feeds.put(feed)
+        await self.feeds.put((feed, topics or [], None))
+
+
+    def publish(self, message, data, topics=None, key=None, coalesce=False):
+        """
+         Publishes a feed from within the request server.
+         Data is the already prepared document which is sent to clients as is.
+         :param topics: topics of the feed. Feed is sent only to clients subscribed to all topics if not provided.
+         :param key: entity of the feed. Later feeds of entity are also sent as patch of this feed.
+         :param coalesce: merges feeds of same message and entity published within FEED_COALESCE_WINDOW
+        """
+        if not message or not data:
+            logger.info('[publish] Invalid message/data received : msg:{} , data:{}'.format(message, data))
+            return
+        item = ({"message": message, "data": data}, topics or [], key)
+        if not coalesce or key is None:
+            self.feeds.put_nowait(item)
+            return
+
+        pending_key = (message, key)
+        if pending_key not in self.pending:
+            asyncio.get_event_loop().call_later(FEED_COALESCE_WINDOW, self.publish_pending, pending_key)
+        self.pending[pending_key] = item
+
+
+    def publish_pending(self, pending_key):
+        item = self.pending.pop(pending_key, None)
+        if item:
+            self.feeds.put_nowait(item)
+
+
+    def get_patch(self, seq, feed, key):
+        """
+         Prepares patch of feed against previous feed of same entity delivered. All processes deliver feeds in same
+         order hence they prepare same patches.
+         :param feed: serialized feed
+         :return: (key, base_seq, patch_feed) where base_seq and patch_feed are None if previous data of entity is
+             not known
+        """
+        data = json.loads(feed)
+        previous = self.entities.pop(key, None)
+        self.entities[key] = (seq, data["data"])
+        while len(self.entities) > FEED_ENTITY_CACHE_SIZE:
+            self.entities.popitem(last=False)
+        if previous is None:
+            return key, None, None
+        base_seq, base_data = previous
+        return key, base_seq, json.dumps({"message": data["message"], "key": key, "base_seq": base_seq,
+                                          "data": {"patch": get_json_patch(base_data, data["data"])}, "seq": seq})
 
 
-    def register(self, user_id, ws):
+    def register(self, user_id, ws, topics=None, since=None, patches=False):
         """
          Register the user_id and the websocket.
+         :param since: sequence of last feed received by the websocket before reconnecting
+         :param patches: sends feeds of entities as patches of their previous feed
         """
-        self.websockets[user_id].add(ws)
+        client = FeedClient(user_id, ws, patches)
+        self.websockets[user_id][ws] = client
+        self.opened += 1
+        self.subscribe(client, topics if topics is not None else [ALL_TOPICS])
+        if since is not None:
+            missed = self.get_missed_feeds(client, since)
+            if missed is None:
+                missed = [json.dumps({"message": "replay-unavailable", "data": {"seq": self.sequence}})]
+            client.replay(missed)
+        return client
 
 
-    async def unregister(self, user_id, ws):
+    def get_missed_feeds(self, client, since):
+        """
+         Feeds of topics of client delivered after the feed of sequence 'since'
+         :return: list of feeds or None if missed feeds are not available in replay buffer
+        """
+        if since == self.sequence:
+            return []
+        missed = []
+        for seq, topics, feed, patch in reversed(self.history):
+            if seq == since:
+                break
+            if topics & client.topics:
+                missed.append((seq, feed, patch))
+        else:
+            if since != self.evicted:
+                return None
+        missed.reverse()
+        # first missed feed of an entity is replayed in full as feeds sent before reconnecting are not known
+        return [client.get_entity_feed(seq, feed, patch) if client.patches and patch else feed
+                for seq, feed, patch in missed]
+
+
+    def subscribe(self, client, topics):
+        """
+         Subscribes client to valid topics among given topics
+         :return: list of topics subscribed
+        """
+        subscribed = []
+        for topic in topics:
+            topic = parse_topic(topic, client.user_id)
+            if topic is None:
+                continue
+            client.topics.add(topic)
+            self.subscribers[topic].add(client)
+            subscribed.append(topic)
+        return subscribed
+
+
+    def unsubscribe(self, client, topics):
+        for topic in topics:
+            topic = parse_topic(topic, client.user_id)
+            if topic is None or topic not in client.topics:
+                continue
+            client.topics.discard(topic)
+            self.subscribers[topic].discard(client)
+            if not self.subscribers[topic]:
+                del self.subscribers[topic]
+
+
+    def unregister(self, user_id, ws):
         """
          Unregister the user_id related websocket
         """
-        async with self.lock:
-            if user_id in self.websockets:
-                if ws in self.websockets[user_id]:
-                    self.websockets[user_id].remove(ws)
-                if not self.websockets[user_id]:
-                    del self.websockets[user_id]
+        clients = self.websockets.get(user_id)
+        if clients is None:
+            return
+        client = clients.pop(ws, None)
+        if client:
+            self.unsubscribe(client, list(client.topics))
+            client.stop()
+            self.closed += 1
+        if not clients:
+            del self.websockets[user_id]
+
+
+    async def reap_clients(self):
+        """
+         Removes websockets which are closed or can not be written anymore but are still registered, and closes them
+        """
+        while True:
+            await asyncio.sleep(FEED_REAP_INTERVAL)
+            dead = [client for clients in list(self.websockets.values()) for client in list(clients.values())
+                    if not client.is_alive()]
+            for client in dead:
+                self.unregister(client.user_id, client.ws)
+                self.reaped += 1
+                if not client.ws.closed:
+                    await client.ws.close()
+            if dead:
+                logger.info("[reap_clients] Removed '{}' dead websockets".format(len(dead)))
+
+
+    def get_socket_counts(self):
+        """
+         Number of open websockets of every user
+        """
+        return {user_id: len(clients) for user_id, clients in self.websockets.items()}
+
+
+    def stats(self):
+        return {"open_sockets": sum(len(clients) for clients in self.websockets.values()),
+                "users": len(self.websockets), "topics": len(self.subscribers), "opened": self.opened,
+                "closed": self.closed, "reaped": self.reaped, "sequence": self.sequence}
 
 
     async def process_feeds(self):
         """
          Function to process the feeds
-         Fetch them and send the feed to the clients
+         Fetch them, stamp them with next shared sequence and write them to feed events collection.
+         Feeds are delivered to clients of all processes by 'tail_feeds'.
         """
         logger.info("[process_feeds] Processing Incoming feeds")
         while True:
-            feed = await self.feeds.get()
-            if feed is None:
+            item = await self.feeds.get()
+            if item is None:
                 # To stop processing of the feeds.
                 logger.info("[process_feeds] Recieved None, stopping feeds processing")
                 break
-            async with self.lock:
-                for user in self.websockets.keys():
-                    for ws in self.websockets.get(user, []):
-                        try:
-                            await ws.send_str(feed)
-                        except Exception as ex:
-                            logger.info("process feeds Exception client :{}".format(ex))
+            feed, topics, key = item
+            topics = get_feed_topics(feed, topics)
+            try:
+                counter = await self.db.sequences.find_one_and_update(
+                    {"_id": FEED_SEQUENCE_ID}, {"$inc": {"seq": 1}}, return_document=pymongo.ReturnDocument.AFTER)
+                seq = counter["seq"]
+                event = {"seq": seq, "topics": topics}
+                if key is not None:
+                    # full feeds of an entity carry its key so that clients can match its later patches
+                    event["key"] = key
+                    feed = dict(feed, key=key)
+                event["feed"] = json.dumps(dict(feed, seq=seq))
+                await self.db[FEED_EVENTS_COLLECTION].insert_one(event)
+            except Exception as ex:
+                logger.exception("[process_feeds] Failed to publish feed '{}': {}".format(feed.get("message"), ex))
         return
 
 
+    async def tail_feeds(self):
+        """
+         Tails feed events collection and delivers feeds published by any process to clients of this process
+        """
+        logger.info("[tail_feeds] Tailing feed events")
+        events = self.db[FEED_EVENTS_COLLECTION]
+        while True:
+            cursor = events.find(self.get_tail_query(), cursor_type=pymongo.CursorType.TAILABLE_AWAIT)
+            try:
+                while cursor.alive:
+                    async for event in cursor:
+                        self.deliver(event["seq"], event["topics"], event["feed"], event.get("key"))
+                        # letting writers of clients run before the next feed, so that bursts do not overflow
+                        # healthy clients
+                        await asyncio.sleep(0)
+            except pymongo.errors.PyMongoError as ex:
+                logger.error("[tail_feeds] Tailing feed events failed: {}".format(ex))
+            # cursor dies when collection is empty or when capped collection overwrote its position
+            await asyncio.sleep(FEED_TAIL_RETRY_INTERVAL)
+
+
+    def get_tail_query(self):
+        """
+         Query of feed events to be delivered when tailing starts again. Feeds written after a feed of higher sequence
+         are not missed as tailing resumes from the lowest sequence in history, delivered feeds are skipped.
+        """
+        return {"seq": {"$gt": min(self.delivered) if self.delivered else self.sequence}}
+
+
+    def remember(self, seq, topics, feed, patch):
+        """
+         Keeps the feed in replay buffer
+        """
+        if len(self.history) == self.history.maxlen:
+            self.evicted = self.history[0][0]
+            self.delivered.discard(self.evicted)
+        self.history.append((seq, topics, feed, patch))
+        self.delivered.add(seq)
+        self.sequence = seq
+
+
+    def deliver(self, seq, topics, feed, key=None):
+        """
+         Keeps the feed for replay and queues it to clients subscribed to any of its topics.
+         Feeds already delivered are ignored.
+         :param key: entity of the feed. Clients which requested patches are sent patch of its previous feed.
+        """
+        if seq in self.delivered:
+            return
+        topics = set(topics)
+        patch = self.get_patch(seq, feed, key) if key is not None else None
+        self.remember(seq, topics, feed, patch)
+
+        # every interested client receives feed once even if subscribed to many of its topics
+        clients = set()
+        for topic in topics:
+            clients.update(self.subscribers.get(topic, []))
+        for client in clients:
+            if client.patches and patch:
+                if not client.send(client.get_entity_feed(seq, feed, patch)):
+                    # next feed of entity is sent in full as this one did not reach the client
+                    client.entities.pop(key, None)
+            else:
+                client.send(feed)
+
+
 ################# Routes ################
 @routes.get('/ws')
 async def get_websocket(request):
@@ -121,27 +607,64 @@ async def get_websocket(request):
 
     params = request.rel_url.query
     user_id = params['user_id']
+    topics = params["topics"].split(",") if params.get("topics") else None
+    try:
+        since = int(params["since"]) if params.get("since") else None
+    except ValueError:
+        since = None
+    patches = params.get("patches") == "true"
 
-    ws = aioweb.WebSocketResponse()
+    # heartbeat closes half open connections which stop answering pings
+    ws = aioweb.WebSocketResponse(heartbeat=FEED_HEARTBEAT_INTERVAL)
     await ws.prepare(request)
-    request.app['feed_server'].register(user_id, ws)
+    feed_server = request.app['feed_server']
+    client = feed_server.register(user_id, ws, topics, since, patches)
     try:
         async for msg in ws:
-            pass
+            if msg.type != aioweb.WSMsgType.TEXT:
+                continue
+            try:
+                command = json.loads(msg.data)
+            except ValueError:
+                logger.info("[/ws] [{}]: Ignoring invalid message '{}'".format(user_id, msg.data))
+                continue
+            if not isinstance(command, dict):
+                continue
+            if isinstance(command.get("unsubscribe"), list):
+                feed_server.unsubscribe(client, command["unsubscribe"])
+            if isinstance(command.get("subscribe"), list):
+                feed_server.subscribe(client, command["subscribe"])
+            client.send(json.dumps({"message": "subscriptions", "data": {"topics": sorted(client.topics)}}))
     except Exception as ex:
-        print(ex)
+        logger.info("[/ws] [{}]: Websocket failed: {}".format(user_id, ex))
     finally:
-        request.app['feed_server'].unregister(user_id, ws)
+        feed_server.unregister(user_id, ws)
+        if not ws.closed:
+            await ws.close()
     return ws
 
 
+@routes.get('/feeds/stats')
+async def get_feed_stats(request):
+    """
+     Websocket accounting of this request server process. Open websockets are counted per user.
+    """
+    feed_server = request.app['feed_server']
+    socket_counts = feed_server.get_socket_counts()
+    if request.rel_url.query.get("user_id"):
+        user_id = request.rel_url.query["user_id"]
+        socket_counts = {user_id: socket_counts.get(user_id, 0)}
+    return aioweb.json_response(dict(feed_server.stats(), sockets_per_user=socket_counts))
+
+
 @routes.post('/feeds')
 async def add_feed(request):
     """
      Add the feed to the feed queue
     """
     feed = await request.json()
-    if feed:
-        await request.app['feed_server'].push(json.dumps(feed))
+    if feed and isinstance(feed, dict):
+        topics = feed.pop("topics", None)
+        await request.app['feed_server'].push(feed, topics)
     return aioweb.Response(text="Feed Added!")
 
@@ -0,0 +1,246 @@
+"""
+This module answers conditional GET requests of frequently polled read endpoints.
+A change counter is kept for every collection which is incremented whenever a modifying request (POST, PUT or DELETE)
+touching that collection completes. Validators of a cached endpoint are derived from counters of all collections its
+response depends on, so 'If-None-Match' and 'If-Modified-Since' requests are answered with '304 Not Modified' before
+the handler queries or enriches anything.
+Counters are kept in CHANGES_COLLECTION so that they are shared by all request server processes. Every process polls
+them every CHANGES_REFRESH_INTERVAL seconds, outside of request handling, and clears its own caches of collections changed
+by other processes. Changes made through a process are applied to its counters immediately.
+NOTE: All Journo database writes go through request server routes. Changes made directly to database are not
+    tracked hence clients may be served stale responses until next change of that collection.
+"""
+import asyncio
+import time
+
+import pymongo
+from aiohttp import web as aioweb
+
+# importing logger
+from server.request import logger
+import server.commons.cache as cache
+import server.commons.utils as utils
+
+# Cache-Control of cached endpoints. Clients may store responses but must revalidate them on every use.
+CACHE_CONTROL = "private, no-cache"
+
+# collections from which story responses are prepared
+STORY_COLLECTIONS = ["stories", "assets", "categories", "tags", "users"]
+
+# cached routes mapped to collections their responses depend on
+CACHED_ROUTES = {
+    "/stories": STORY_COLLECTIONS,
+    "/stories/{story_id}": STORY_COLLECTIONS,
+    "/stories/facets": ["stories", "categories", "tags"],
+    "/agencies": ["agencies"],
+    "/categories": ["categories"],
+    "/tags": ["tags"],
+    "/shares": ["shares"],
+    "/nrcs": ["nrcs"],
+}
+
+# first path segment of modifying routes mapped to collections they change
+MODIFYING_ROUTES = {
+    "stories": ["stories", "assets"],
+    "stories-assets": ["stories", "assets"],
+    "stories-proxy": ["stories", "assets"],
+    "version": ["stories"],
+    "story": ["stories"],
+    "categories": ["categories"],
+    "tags": ["tags", "stories"],
+    "users": ["users"],
+    "shares": ["shares"],
+    "agencies": ["agencies"],
+    "nrcs": ["nrcs"],
+}
+
+
+# collection of change counters shared by request server processes and id of its document
+CHANGES_COLLECTION = "collection_changes"
+CHANGES_ID = "collections"
+
+# seconds between reads of counters changed by other request server processes
+CHANGES_REFRESH_INTERVAL = 1
+
+
+class ChangeTracker:
+    """
+    Maintains change counter and last modified time of collections in CHANGES_COLLECTION.
+    Epoch of counters is part of every validator so that validators issued before counters were lost are never
+    matched. Version of counters is incremented by every change so that counters read before a change never replace
+    counters read after it.
+    """
+    def __init__(self):
+        self.counters = None
+        self.task = None
+
+    async def touch(self, db, collections):
+        now = int(time.time())
+        update = {"$setOnInsert": {"epoch": utils.generate_random_id()[:8], "created": now},
+                  "$inc": {"version": 1}}
+        if collections:
+            update["$inc"].update({"counters.{}".format(name): 1 for name in collections})
+            update["$max"] = {"modified.{}".format(name): now for name in collections}
+        try:
+            counters = await db[CHANGES_COLLECTION].find_one_and_update(
+                {"_id": CHANGES_ID}, update, upsert=True, return_document=pymongo.ReturnDocument.AFTER)
+        except pymongo.errors.DuplicateKeyError:
+            # inserted by another request server process meanwhile
+            counters = await db[CHANGES_COLLECTION].find_one_and_update(
+                {"_id": CHANGES_ID}, update, return_document=pymongo.ReturnDocument.AFTER)
+        invalidate_caches(collections)
+        return self.update(counters)
+
+    async def refresh(self, db):
+        """
+        Reads shared counters and clears caches of collections changed since counters were read last time
+        :return: counters document
+        """
+        counters = await db[CHANGES_COLLECTION].find_one({"_id": CHANGES_ID})
+        if counters is None:
+            return await self.touch(db, [])
+        return self.update(counters)
+
+    def update(self, counters):
+        """
+        Replaces counters of this process unless given counters are older, and clears caches of changed collections
+        :return: current counters document
+        """
+        counters.setdefault("counters", {})
+        counters.setdefault("modified", {})
+        counters.setdefault("version", 0)
+        previous = self.counters
+        if previous is None:
+            self.counters = counters
+        elif previous["epoch"] != counters["epoch"]:
+            self.counters = counters
+            invalidate_caches(list(cache.REF_DATA_CACHES.keys()) + STORY_COLLECTIONS)
+        elif counters["version"] > previous["version"]:
+            self.counters = counters
+            invalidate_caches([name for name, count in counters["counters"].items()
+                               if previous["counters"].get(name) != count])
+        return self.counters
+
+    async def poll(self, db):
+        while True:
+            await asyncio.sleep(CHANGES_REFRESH_INTERVAL)
+            try:
+                await self.refresh(db)
+            except pymongo.errors.PyMongoError as e:
+                logger.error("[ChangeTracker] Failed to read change counters: {}".format(e))
+
+    async def start(self, app):
+        """
+        'on_startup' signal handler which reads counters and starts polling them
+        """
+        await self.refresh(app["db"])
+        self.task = app.loop.create_task(self.poll(app["db"]))
+
+    async def stop(self, app):
+        """
+        'on_cleanup' signal handler which stops polling counters
+        """
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    @staticmethod
+    def get_etag(counters, collections, path):
+        values = ",".join("{}:{}".format(name, counters["counters"].get(name, 0)) for name in sorted(collections))
+        return 'W/"{}"'.format(utils.generate_md5_for_string("{}|{}|{}".format(counters["epoch"], values, path)))
+
+    @staticmethod
+    def get_last_modified(counters, collections):
+        return max([counters["modified"].get(name, counters["created"]) for name in collections])
+
+
+changes = ChangeTracker()
+
+
+def get_route_pattern(request):
+    route = request.match_info.route
+    if route is None or route.resource is None:
+        return None
+    return route.resource.canonical
+
+
+def invalidate_caches(collections):
+    """
+    Clears caches of this process prepared from given collections
+    """
+    for name in collections:
+        if name in cache.REF_DATA_CACHES:
+            cache.REF_DATA_CACHES[name].invalidate()
+    # coalesced story details prepared before the change must not be shared any more
+    if set(collections) & set(STORY_COLLECTIONS):
+        cache.story_details.invalidate()
+
+
+async def track_modification(app, path):
+    """
+    Records change of collections modified by a request of given route pattern or path
+    """
+    modified = MODIFYING_ROUTES.get(path.strip("/").split("/")[0], [])
+    if modified:
+        await changes.touch(app["db"], modified)
+
+
+def is_not_modified(request, etag, last_modified):
+    """
+    Evaluates conditional request headers. 'If-None-Match' takes precedence over 'If-Modified-Since'.
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # weak comparison
+        return "*" in tags or etag.replace("W/", "") in [tag.replace("W/", "") for tag in tags]
+
+    if_modified_since = request.if_modified_since
+    if if_modified_since is not None:
+        # Last-Modified has one second resolution hence changes of the current second are never considered seen
+        return last_modified <= int(if_modified_since.timestamp()) and last_modified < int(time.time())
+    return False
+
+
+@aioweb.middleware
+async def conditional_get_middleware(request, handler):
+    pattern = get_route_pattern(request)
+
+    # tracking changes made by modifying requests
+    if request.method not in ["GET", "HEAD"]:
+        try:
+            return await handler(request)
+        finally:
+            await track_modification(request.app, pattern or request.path)
+
+    # counters are refreshed by polling, hence validators are not computed until counters are read first time
+    collections = CACHED_ROUTES.get(pattern)
+    counters = changes.counters
+    if not collections or counters is None:
+        return await handler(request)
+
+    # validators are computed before handler runs so that a change during handling invalidates the response
+    etag = changes.get_etag(counters, collections, request.path_qs)
+    last_modified = changes.get_last_modified(counters, collections)
+    if is_not_modified(request, etag, last_modified):
+        response = aioweb.Response(status=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+        response.last_modified = last_modified
+        return response
+
+    # validators are added when response is prepared, as streamed responses are prepared by the handler itself
+    request["cache_validators"] = (etag, last_modified)
+    return await handler(request)
+
+
+async def add_cache_headers(request, response):
+    """
+    'on_response_prepare' signal handler which adds validators to successful responses of cached endpoints
+    """
+    validators = request.get("cache_validators")
+    if validators is None or response.status != 200:
+        return
+    etag, last_modified = validators
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.last_modified = last_modified
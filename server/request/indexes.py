@@ -0,0 +1,147 @@
+"""
+This module manages database indexes of all Journo collections.
+Plugins declare the indexes they need in a module level 'indexes' dict which maps collection name to a list of
+'pymongo.IndexModel'. All declared indexes are reconciled with the database on startup and their usage can be
+inspected using '/admin/indexes'.
+"""
+from collections import defaultdict
+
+import pymongo
+from aiohttp import web as aioweb
+
+# importing logger
+from server.request import logger
+import server.commons.constants as consts
+import server.commons.utils as utils
+
+routes = aioweb.RouteTableDef()
+
+
+def collect_plugin_indexes(plugins):
+    """
+    Prepares index registry from indexes declared by plugins
+    :return: dict of index models mapped by collection name
+    """
+    registry = defaultdict(list)
+    for plugin in plugins:
+        if not hasattr(plugin, "indexes"):
+            continue
+
+        if not isinstance(plugin.indexes, dict):
+            raise TypeError("plugin '{}' indexes must be of type 'dict'".format(plugin.__name__))
+
+        for collection_name, models in plugin.indexes.items():
+            for model in models:
+                if not isinstance(model, pymongo.IndexModel):
+                    raise TypeError("plugin '{}' indexes must be of type 'pymongo.IndexModel'".format(plugin.__name__))
+                registry[collection_name].append(model)
+    return registry
+
+
+def is_text_index(index_doc):
+    return "text" in dict(index_doc["key"]).values()
+
+
+def is_same_index(index_doc, index_info):
+    """
+    Checks whether declared index document matches existing index information
+    """
+    if is_text_index(index_doc):
+        # text indexes are stored with internal keys hence prefix keys and weighted fields are compared
+        text_fields = [key for key, value in index_doc["key"].items() if value == "text"]
+        prefix_keys = [(key, value) for key, value in index_doc["key"].items() if value != "text"]
+        existing_prefix_keys = [(key, value) for key, value in index_info["key"] if key not in ["_fts", "_ftsx"]]
+        return index_info.get("weights") == index_doc.get("weights", dict.fromkeys(text_fields, 1)) and \
+            existing_prefix_keys == prefix_keys
+    return list(index_info["key"]) == list(index_doc["key"].items()) and \
+        bool(index_info.get("unique")) == bool(index_doc.get("unique"))
+
+
+async def reconcile_indexes(db, registry):
+    """
+    Creates declared indexes which are missing in database and recreates declared indexes whose definition changed.
+    Indexes not declared by any plugin are left untouched.
+    :return: False if any declared index could not be created, e.g. unique index over existing duplicates
+    """
+    created = 0
+    failed = 0
+    for collection_name, models in registry.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+
+        for model in models:
+            index_doc = model.document
+            index_info = existing.get(index_doc["name"])
+            if index_info is not None and is_same_index(index_doc, index_info):
+                continue
+
+            try:
+                if index_info is not None:
+                    logger.info("[reconcile_indexes] [{}]: Definition of index '{}' changed. Recreating it."
+                                .format(collection_name, index_doc["name"]))
+                    await collection.drop_index(index_doc["name"])
+                await collection.create_indexes([model])
+                created += 1
+                logger.info("[reconcile_indexes] [{}]: Index '{}' created.".format(collection_name, index_doc["name"]))
+            except pymongo.errors.PyMongoError as ex:
+                failed += 1
+                logger.error("[reconcile_indexes] [{}]: Failed to create index '{}'. Error: '{}'"
+                             .format(collection_name, index_doc["name"], ex))
+
+    logger.info("[reconcile_indexes]: '{}' indexes created, '{}' failed.".format(created, failed))
+    return failed == 0
+
+
+# ------------------ Web Routes ------------------
+
+@routes.get("/admin/indexes")
+async def get_index_report(request):
+    """
+    Reports usage of all indexes of managed collections using '$indexStats'.
+    Each index is reported with one of the following status:
+        'used'      - declared, exists and has been used since 'since'
+        'unused'    - exists but has not been used since 'since'
+        'missing'   - declared but not present in database
+        'unmanaged' - exists but not declared by any plugin
+    """
+    db = request.app["db"]
+    registry = request.app["indexes"]
+
+    collection_name = request.rel_url.query.get("collection")
+    if collection_name and collection_name not in registry:
+        logger.error("[/admin/indexes] [GET]: collection '{}' is not managed.".format(collection_name))
+        return utils.get_http_error("Collection '{}' is not managed".format(collection_name))
+
+    report = []
+    for name in [collection_name] if collection_name else sorted(registry.keys()):
+        declared = [model.document["name"] for model in registry[name]]
+
+        stats = {}
+        async for index_stats in db[name].aggregate([{"$indexStats": {}}]):
+            stats[index_stats["name"]] = index_stats
+
+        for index_name in declared + sorted(set(stats.keys()) - set(declared)):
+            if index_name == "_id_":
+                continue
+
+            index_stats = stats.get(index_name)
+            entry = {"collection": name, "name": index_name, "declared": index_name in declared,
+                     "accesses": None, "since": None}
+            if index_stats is None:
+                entry["status"] = "missing"
+            else:
+                entry["accesses"] = index_stats["accesses"]["ops"]
+                entry["since"] = index_stats["accesses"]["since"].strftime(consts.DATETIME_FORMAT)
+                if not entry["declared"]:
+                    entry["status"] = "unmanaged"
+                else:
+                    entry["status"] = "used" if entry["accesses"] else "unused"
+            report.append(entry)
+
+    return aioweb.json_response({
+        "indexes": report,
+        "missing": ["{}.{}".format(entry["collection"], entry["name"]) for entry in report
+                    if entry["status"] == "missing"],
+        "unused": ["{}.{}".format(entry["collection"], entry["name"]) for entry in report
+                   if entry["status"] == "unused"]
+    })
@@ -4,13 +4,19 @@
 #       Tags        (View, Create, Update, Delete)
 #       Shares      (View, Create, Update, Delete)
 #       agencies    (View, Create, Update, Delete)
+#       Exports     (stories, assets, versions, tasks as NDJSON or Parquet)
 #
 import argparse
 import asyncio
 import aiohttp
 import json
+import os
 import sys
-# import commons.utils as utils
+import tempfile
+import server.commons.utils as utils
+
+# number of exported records written to Parquet file as one row group
+PARQUET_ROW_GROUP_SIZE = 10000
 
 
 def print_tabular(data_list, fields):
@@ -47,6 +53,15 @@ def setup_parser():
     parser.add_argument("-a", "--agencies",
                         help="Agencies listing, creating, update & removal.",
                         nargs="+")
+    parser.add_argument("-e", "--export",
+                        help="Export complete collection to a file.",
+                        choices=["stories", "assets", "versions", "tasks"])
+    parser.add_argument("--from-date", help="Export records created on or after this date (YYYY-MM-DD).")
+    parser.add_argument("--to-date", help="Export records created on or before this date (YYYY-MM-DD).")
+    parser.add_argument("--agency", help="Export records of this agency only.")
+    parser.add_argument("--fields", help="Comma separated fields to be exported.")
+    parser.add_argument("--format", help="Export file format.", choices=["ndjson", "parquet"], default="ndjson")
+    parser.add_argument("-o", "--output", help="Export file path.")
     return parser
 
 
@@ -149,6 +164,143 @@ async def delete_data(client, choice, parameters):
         return json.loads(await response.read())
 
 
+def to_parquet_record(record, as_strings=False):
+    """
+    Nested values are stored as json strings so that all records share a flat columnar schema. All values other than
+    null are stored as strings if 'as_strings' is set.
+    """
+    if as_strings:
+        return {key: value if value is None or isinstance(value, str) else json.dumps(value)
+                for key, value in record.items()}
+    return {key: json.dumps(value) if isinstance(value, (dict, list)) else value for key, value in record.items()}
+
+
+async def write_ndjson_export(response, output):
+    count = 0
+    with open(output, "wb") as export_file:
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            export_file.write(chunk)
+            count += chunk.count(b"\n")
+    return count
+
+
+def read_parquet_row_groups(export_file, as_strings=False):
+    """
+    Reads spooled NDJSON export in row groups of parquet records
+    """
+    export_file.seek(0)
+    records = []
+    for line in export_file:
+        if line.strip():
+            records.append(to_parquet_record(json.loads(line), as_strings))
+        if len(records) >= PARQUET_ROW_GROUP_SIZE:
+            yield records
+            records = []
+    if records:
+        yield records
+
+
+def get_parquet_columns(records):
+    fields = {}
+    for record in records:
+        fields.update(dict.fromkeys(record))
+    return {field: [record.get(field) for record in records] for field in fields}
+
+
+def write_parquet_file(pyarrow, export_file, output, as_strings=False):
+    """
+    Writes spooled export to parquet file using schema unified over all row groups, or string columns
+    if 'as_strings' is set.
+    :return: number of records written
+    """
+    if as_strings:
+        schemas = [pyarrow.schema([(field, pyarrow.string()) for field in get_parquet_columns(records)])
+                   for records in read_parquet_row_groups(export_file, as_strings)]
+    else:
+        # columns are taken from all records, as 'from_pylist' infers them from first record only
+        schemas = [pyarrow.Table.from_pydict(get_parquet_columns(records)).schema
+                   for records in read_parquet_row_groups(export_file)]
+    if not schemas:
+        return 0
+    schema = pyarrow.unify_schemas(schemas)
+
+    count = 0
+    with pyarrow.parquet.ParquetWriter(output, schema) as writer:
+        for records in read_parquet_row_groups(export_file, as_strings):
+            writer.write_table(pyarrow.Table.from_pylist(records, schema=schema))
+            count += len(records)
+    return count
+
+
+async def write_parquet_export(response, output):
+    """
+    Export is spooled to a temporary file first, as fields may first appear or first be non null in any row group
+    while parquet file needs one schema for all row groups. Schema unified over all row groups is used for the file.
+    If a field holds values of conflicting types, all fields are written as strings.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        print("\nParquet export requires 'pyarrow'. Please install it using 'pip3 install pyarrow'.")
+        return None
+
+    arrow_errors = (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError)
+    with tempfile.TemporaryFile() as export_file:
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            export_file.write(chunk)
+
+        try:
+            return write_parquet_file(pyarrow, export_file, output)
+        except arrow_errors as e:
+            remove_file(output)
+            print("\nFields of export have conflicting types ({}). Writing all fields as strings.".format(e))
+
+        try:
+            return write_parquet_file(pyarrow, export_file, output, as_strings=True)
+        except arrow_errors as e:
+            remove_file(output)
+            print("\nExport could not be written as parquet: {}".format(e))
+            return None
+
+
+def remove_file(path):
+    """
+    Removes partially written export file
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def export_data(client, args):
+    """
+    Streams requested collection from request server and writes it to export file record by record.
+    :param client: the async client connection
+    :param args: parsed export arguments
+    :return: number of exported records
+    """
+    params = {"from_date": args.from_date, "to_date": args.to_date, "agency_id": args.agency, "fields": args.fields}
+    params = {key: value for key, value in params.items() if value}
+    output = args.output or "{}.{}".format(args.export, args.format)
+
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with client.get(utils.get_request_server_url('exports/{}'.format(args.export)), params=params,
+                          timeout=timeout) as response:
+        if response.status != 200:
+            print('\nExport failed: {}'.format(await response.text()))
+            return None
+        if args.format == "parquet":
+            count = await write_parquet_export(response, output)
+        else:
+            count = await write_ndjson_export(response, output)
+
+    if count is not None:
+        print('\nExported {} {} to {}'.format(count, args.export, output))
+    return count
+
+
 async def request_loop(parser, args, loop):
     """
     :param parser: Parser object to parse input
@@ -158,6 +310,11 @@ async def request_loop(parser, args, loop):
     """
     # TODO : To add while True
 
+    if args.export:
+        async with aiohttp.ClientSession(loop=loop) as client:
+            await export_data(client, args)
+        return
+
     parameters, choice = parse_arguments(args)
     if not parameters and not choice:
         print('\nPlease use help to see valid cli options. \n python {} --help'.format(sys.argv[0]))
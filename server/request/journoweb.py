@@ -7,7 +7,8 @@ from configparser import ConfigParser
 # importing logger
 from server.request import logger
 import server.commons.utils as utils
-from server.commons import session
+import server.commons.cache as cache
+import server.request.dispatch as dispatch
 from server.request.models import Agency,Category,Share,Story,Editor,Stream
 
 routes = aioweb.RouteTableDef()
@@ -152,6 +153,9 @@ async def handler(request, view, context):
         new_context = dict()
         new_context["agencies"] = await prepare_agencies_edit_context(context["agencies"])
         new_context["storyfeed"] = await prepare_story_feed_context(context['stories'])
+        new_context["facets"] = context.get("facets") or {}
+        new_context["agency_counts"] = {entry["agency_key"]: entry["count"]
+                                        for entry in new_context["facets"].get("agencies", [])}
 
     elif view == "settings":
         template_name = template_mapping.get("settings")
@@ -187,9 +191,11 @@ async def fetch_shares():
     """
      Function to fetch the shares and return data
     """
-    url = utils.get_request_server_url("shares")
-    shares_resp = await session.get(url)
-    return await shares_resp.json() if shares_resp.status is 200 else None
+    async def load():
+        url = utils.get_request_server_url("shares")
+        shares_resp = await dispatch.client.get(url)
+        return await shares_resp.json() if shares_resp.status is 200 else None
+    return await cache.shares.get_or_load("search:all", load)
 
 
 async def fetch_agencies():
@@ -197,7 +203,7 @@ async def fetch_agencies():
      Function to fetch the agencies and return data
     """
     url = utils.get_request_server_url("agencies")
-    agency_resp = await session.get(url)
+    agency_resp = await dispatch.client.get(url)
     return await agency_resp.json() if agency_resp.status is 200 else None
 
 
@@ -205,9 +211,11 @@ async def fetch_categories():
     """
      Function to fetch the categories and return data
     """
-    url = utils.get_request_server_url("categories")
-    category_resp = await session.get(url)
-    return {"categories" : await category_resp.json()} if category_resp.status == 200 else None
+    async def load():
+        url = utils.get_request_server_url("categories")
+        category_resp = await dispatch.client.get(url)
+        return {"categories" : await category_resp.json()} if category_resp.status == 200 else None
+    return await cache.categories.get_or_load("search:all", load)
 
 
 async def fetch_stories(story_id=None, agency_id=None):
@@ -217,26 +225,35 @@ async def fetch_stories(story_id=None, agency_id=None):
     """
     if story_id:
         url = utils.get_request_server_url("stories/{}".format(story_id))
-        story_resp = await session.get(url)
+        story_resp = await dispatch.client.get(url)
 
     elif agency_id:
         url = utils.get_request_server_url("stories?agency_id={}".format(agency_id))
-        story_resp = await session.get(url)
+        story_resp = await dispatch.client.get(url)
 
     else:
         url = utils.get_request_server_url("stories")
-        story_resp = await session.get(url)
+        story_resp = await dispatch.client.get(url)
 
     return await story_resp.json() if story_resp.status == 200 else None
 
 
+async def fetch_story_facets(agency_id=None):
+    """
+    Fetch story counts per agency, category, tag and status
+    """
+    url = utils.get_request_server_url("stories/facets")
+    facets_resp = await dispatch.client.get(url, params={"agency_id": agency_id} if agency_id else None)
+    return await facets_resp.json() if facets_resp.status == 200 else None
+
+
 async def fetch_editors():
     """
      Function to fetch the editors and return data
     """
     url = utils.get_request_server_url("nrcs")
 
-    editor_resp = await session.get(url)
+    editor_resp = await dispatch.client.get(url)
     return await editor_resp.json() if editor_resp.status == 200 else None
 
 
@@ -245,7 +262,7 @@ async def fetch_stream(stream_name=None):
      Function to fetch the stream 
     """
     url = utils.get_request_server_url("streams")
-    streams_resp = await session.get(url)
+    streams_resp = await dispatch.client.get(url)
     res = await streams_resp.json() if streams_resp.status == 200 else  []
     res.sort(key=lambda k: k["name"])
     if stream_name:
@@ -264,7 +281,7 @@ async def fetch_all_streams():
      Function to fetch all the streams 
     """
     url = utils.get_request_server_url("streams")
-    streams_resp = await session.get(url)
+    streams_resp = await dispatch.client.get(url)
     res = await streams_resp.json() if streams_resp.status == 200 else  []
     res.sort(key=lambda k: k["name"])
     all_streams = [stream for stream in res]
@@ -341,7 +358,9 @@ async def render_index(request):
     else:
         stories = await fetch_stories()
 
-    context = {"agencies": agencies, "stories": stories}
+    facets = await fetch_story_facets(agency_id)
+
+    context = {"agencies": agencies, "stories": stories, "facets": facets}
     return await handler(request, "index", context)
 
 
@@ -1,10 +1,13 @@
 from aiohttp import web as aioweb
 import datetime
+import pymongo
 # importing logger
 from server.request import logger
 
 import server.commons.utils as utils
+import server.commons.cache as cache
 import server.commons.constants as consts
+import server.request.dispatch as dispatch
 
 def generate_category_uid(name):
     return name.replace(" ", "").lower()
@@ -13,6 +16,13 @@ def generate_category_uid(name):
 def generate_tag_uid(name):
     return name.replace(" ", "").lower()
 
+# ------------ Metadata Indexes ------------
+
+indexes = {
+    "categories": [pymongo.IndexModel([("uid", pymongo.ASCENDING)], unique=True, name="uid")],
+    "tags": [pymongo.IndexModel([("uid", pymongo.ASCENDING)], unique=True, name="uid")]
+}
+
 # ------------ Metadata Routes ------------
 
 
@@ -55,12 +65,14 @@ async def create_new_category(request):
         logger.error("[/categories] [POST]: Failed to save to db.")
         return utils.get_http_error("Server ran into database error", httperror=aioweb.HTTPInternalServerError)
 
+    cache.categories.invalidate()
     logger.info("[/categories] [POST] [{}]: New category '{}' created."
         .format(category_uid, category_name))
     return aioweb.json_response({"ok": True, "_id": category_id, "uid": category_uid, "name": category_name})
 
 
 @routes.get("/categories")
+@dispatch.local
 async def get_categories(request):
     db = request.app["db"]
     query = {}
@@ -77,6 +89,7 @@ async def get_categories(request):
 
 
 @routes.get("/categories/{category_id}")
+@dispatch.local
 async def get_category_info(request):
     db = request.app["db"]
 
@@ -99,6 +112,7 @@ async def delete_category(request):
     
         # parsing motor response
         if res.deleted_count > 0:
+            cache.categories.invalidate()
             logger.info("[/categories] [DELETE]: Category '{}' deleted.".format(category_id))
             return aioweb.json_response({"ok": True})
 
@@ -143,11 +157,13 @@ async def update_category(request):
         logger.error("[/categories] [PUT] [{}]: Failed to save to db.".format(category_uid))
         return utils.get_http_error("Server ran into database error", httperror=aioweb.HTTPInternalServerError)
 
+    cache.categories.invalidate()
     logger.info("[/categories] [PUT]: Category '{}' updated.".format(category_id))
     return aioweb.json_response({"ok": True})
 
 
 @routes.post("/tags")
+@dispatch.local
 async def create_tag(request):
     db = request.app["db"]
 
@@ -181,6 +197,7 @@ async def create_tag(request):
         logger.error("[/tags] [POST] [{}]: Failed to save to db.".format(tag_uid))
         return utils.get_http_error("Server ran into database error", httperror=aioweb.HTTPInternalServerError)
 
+    cache.tags.invalidate()
     logger.info("[/tags] [POST] [{}: New tag '{}' created.".format(tag_uid, tag_name))
     return aioweb.json_response({"ok": True, "_id": tag_id, "uid": tag_uid, "name": tag_name})
 
@@ -202,6 +219,7 @@ async def get_all_tags(request):
 
 
 @routes.get("/tags/{tag_id}")
+@dispatch.local
 async def get_tag_info(request):
     db = request.app["db"]
 
@@ -220,10 +238,13 @@ async def delete_tag(request):
     tag_id = request.match_info["tag_id"]
     if tag_id:
         # deleting from db
-        res = await db.tags.delete_one({"_id": tag_id})
+        taginfo = await db.tags.find_one_and_delete({"_id": tag_id})
 
-        # parsing motor response
-        if res.deleted_count > 0:
+        if taginfo:
+            # removing tag name from tag names stored in stories for text search
+            await db.stories.update_many({"tags": tag_id}, {"$pull": {"tag_names": taginfo["name"]}})
+
+            cache.tags.invalidate()
             logger.info("[/tags] [DELETE]: Tag '{}' deleted.".format(tag_id))
             return aioweb.json_response({"ok": True})
 
@@ -253,6 +274,7 @@ async def update_tag(request):
         return utils.get_http_error("Tag already exists.")
 
     # saving to db
+    old_info = await db.tags.find_one({"_id": tag_id})
     res = await db.tags.update_one({"_id": tag_id},
         {"$set": {"name": tag_name, "uid": tag_uid}})
 
@@ -265,5 +287,11 @@ async def update_tag(request):
         logger.error("[/tags] [PUT] [{}]: Failed to save to db.".format(tag_uid))
         return utils.get_http_error("Server ran into database error", httperror=aioweb.HTTPInternalServerError)
 
+    # renaming tag in tag names stored in stories for text search
+    if old_info and old_info["name"] != tag_name:
+        await db.stories.update_many({"tags": tag_id}, {"$set": {"tag_names.$[name]": tag_name}},
+                                     array_filters=[{"name": old_info["name"]}])
+
+    cache.tags.invalidate()
     logger.info("[/tags] [PUT]: Tag '{}' updated successfully.".format(tag_id))
     return aioweb.json_response({"ok": True})
\ No newline at end of file
@@ -30,10 +30,7 @@ async def get_nrcs_list(request):
     """
     db = request.app["db"]
     # retrieving information from db
-    nrcs_list = []
-    async for nrcs in db.nrcs.find():
-        nrcs_list.append(nrcs)
-    return aioweb.json_response({"nrcs": nrcs_list})
+    return await utils.stream_json_response(request, "nrcs", db.nrcs.find())
 
 
 @routes.get("/nrcs/{nrcs_id}")
@@ -11,6 +11,8 @@ from server.request import logger
 
 import server.commons.constants as consts
 import server.commons.utils as utils
+import server.commons.cache as cache
+import server.request.dispatch as dispatch
 
 # shares all rest api routes are added to this table
 routes = aioweb.RouteTableDef()
@@ -112,6 +114,7 @@ async def create_share_entry(request):
         logger.error("[/shares] [POST [{}]: Failed to save to db.".format(share_id))
         return utils.get_http_error("Server ran into database error", httperror=aioweb.HTTPInternalServerError)
 
+    cache.shares.invalidate()
     logger.info("[/shares] [POST] [{}]: New share '{}' added to database.".format(share_id, shareinfo))
     shareinfo["_id"] = share_id
     shareinfo["ok"] = True
@@ -119,6 +122,7 @@ async def create_share_entry(request):
 
 
 @routes.get("/shares/{share_id}")
+@dispatch.local
 async def get_share_details(request):
     db = request.app["db"]
 
@@ -154,10 +158,7 @@ async def get_all_share_details(request):
     if search_filter.get("state") and search_filter["state"] in [consts.STATE_ACTIVE, consts.STATE_DISABLED]:
         query["state"] = search_filter["state"]
 
-    shares = []
-    async for share in db.shares.find(query):
-        shares.append(share)
-    return aioweb.json_response({"shares": shares})
+    return await utils.stream_json_response(request, "shares", db.shares.find(query))
 
 
 @routes.delete("/shares/{share_id}")
@@ -170,6 +171,7 @@ async def delete_share_entry(request):
 
     res = await db.shares.delete_one({'_id': share_id})
     if res.deleted_count > 0:
+        cache.shares.invalidate()
         logger.info("[/shares] [DELETE]: share '{}' deleted.".format(share_id))
         return aioweb.json_response({"ok": True})
 
@@ -261,6 +263,7 @@ async def update_share_details(request):
         logger.error("[/shares] [PUT [{}]: Failed to save to db.".format(share_id))
         return utils.get_http_error("Server ran into database error", aioweb.HTTPInternalServerError)
 
+    cache.shares.invalidate()
     logger.info("[/shares] [PUT] [{}]: Share details '{}' updated to database.".format(share_id, shareinfo.keys()))
     return aioweb.json_response({"ok": True})
 
@@ -3,6 +3,7 @@ This module is responsible for handling all story related tasks
 """
 
 import os
+import re
 import math
 import json
 import datetime
@@ -11,13 +12,16 @@ from aiohttp import web as aioweb
 
 # importing logger
 from server.request import logger
-from server.commons import session
+import server.commons.cache as cache
 import server.commons.constants as consts
 import server.commons.utils as utils
+import server.request.dispatch as dispatch
+import server.request.counters as counters
+import server.request.feeds as feeds
+import server.request.versions as versions
 
 # set this to true to automatically create tags
 AUTOMATICALLY_CREATE_TAGS = False
-TEXT_INDEX_ENABLED = False
 
 # default directory in which all story files should be uploaded. NOTE: It should be created before upload starts.
 DEFAULT_UPLOAD_DIRECTORY = "storyclips"
@@ -25,6 +29,15 @@ DEFAULT_UPLOAD_DIRECTORY = "storyclips"
 # Maximum number of stories to send on each get request
 STORIES_PAGE_SIZE = 10
 
+# Maximum number of stories accepted by one batch create request
+MAX_BATCH_STORIES = 500
+
+# Maximum number of recent created dates reported in story facets
+FACET_CREATED_DATES = 30
+
+# Fields of attached assets shown in story detail view
+DETAIL_ASSET_FIELDS = ["file_name", "file_size", "type", "path", "created_date", "thumbnail_path", "lowres_path"]
+
 
 def generate_story_id(title, user_id, date_str):
     return utils.generate_hex_id(title, user_id, date_str)
@@ -33,46 +46,60 @@ def generate_story_id(title, user_id, date_str):
 # retrieving information using rest api
 async def create_tag_with_name(tagname):
     url = utils.get_request_server_url("tags")
-    resp = await session.post(url, data=json.dumps({"name": tagname}))
+    resp = await dispatch.client.post(url, data=json.dumps({"name": tagname}))
     return await resp.json() if resp.status is 200 else None
 
 
 async def get_category_info(category_id):
-    url = utils.get_request_server_url("categories/{}".format(category_id))
-    resp = await session.get(url)
-    return await resp.json() if resp.status is 200 else None
+    async def load():
+        url = utils.get_request_server_url("categories/{}".format(category_id))
+        resp = await dispatch.client.get(url)
+        return await resp.json() if resp.status is 200 else None
+    return await cache.categories.get_or_load(category_id, load)
 
 
 async def get_tag_info(tag_id):
-    url = utils.get_request_server_url("tags/{}".format(tag_id))
-    resp = await session.get(url)
-    return await resp.json() if resp.status is 200 else None
+    async def load():
+        url = utils.get_request_server_url("tags/{}".format(tag_id))
+        resp = await dispatch.client.get(url)
+        return await resp.json() if resp.status is 200 else None
+    return await cache.tags.get_or_load(tag_id, load)
 
 
 async def get_user_info(user_id):
-    url = utils.get_request_server_url("users/{}".format(user_id))
-    resp = await session.get(url)
-    return await resp.json() if resp.status is 200 else None
+    async def load():
+        url = utils.get_request_server_url("users/{}".format(user_id))
+        resp = await dispatch.client.get(url)
+        return await resp.json() if resp.status is 200 else None
+    return await cache.users.get_or_load(user_id, load)
 
 
 async def get_share_info(share_id):
-    url = utils.get_request_server_url("shares/{}".format(share_id))
-    resp = await session.get(url)
-    return await resp.json() if resp.status is 200 else None
+    async def load():
+        url = utils.get_request_server_url("shares/{}".format(share_id))
+        resp = await dispatch.client.get(url)
+        return await resp.json() if resp.status is 200 else None
+    return await cache.shares.get_or_load(share_id, load)
+
+
+async def search_shares(share_filter):
+    search = json.dumps(share_filter, sort_keys=True)
+
+    async def load():
+        url = utils.get_request_server_url("shares?search={}".format(search))
+        resp = await dispatch.client.get(url)
+        return await resp.json() if resp.status is 200 else None
+    return await cache.shares.get_or_load("search:" + search, load)
 
 
 async def get_story_proxy_shares(share_filter):
     share_filter["type"] = consts.SHARE_TYPE_PROXY
-    url = utils.get_request_server_url("shares?search={}".format(json.dumps(share_filter)))
-    resp = await session.get(url)
-    return await resp.json() if resp.status is 200 else None
+    return await search_shares(share_filter)
 
 
 async def get_story_shares(share_filter):
     share_filter["type"] = consts.SHARE_TYPE_FILE
-    url = utils.get_request_server_url("shares?search={}".format(json.dumps(share_filter)))
-    resp = await session.get(url)
-    return await resp.json() if resp.status is 200 else None
+    return await search_shares(share_filter)
 
 
 async def get_recent_version(story_id):
@@ -82,7 +109,7 @@ async def get_recent_version(story_id):
     :return: Recent version of the story or None
     """
     url = utils.get_request_server_url('version/recent/{}'.format(story_id))
-    resp = await session.get(url)
+    resp = await dispatch.client.get(url)
     if resp.status == 200:
         resp_data = await resp.json()
         return resp_data.get('recent_version', {})
@@ -97,7 +124,7 @@ async def get_version_history(story_id, skip=0):
     :return: the next list of version histimport server.commons.utils as utilsory to be served
     """
     url = utils.get_request_server_url('version/history/{}/{}'.format(story_id, skip))
-    resp = await session.get(url)
+    resp = await dispatch.client.get(url)
     return await resp.json() if resp.status == 200 else None
 
 
@@ -106,28 +133,88 @@ async def create_version(story_id, version_data):
     Create  a version using the version_data and the story id
     :param story_id: Story id for the version
     :param version_info: Version Data, Data to be versioned (story_title, userid, description)
-    :return: True if successful version creation else False
+    :return: created version information on success else None
     """
-    status = False
     url = utils.get_request_server_url('version')
     version_info = {}
     version_info['story_id'] = story_id
     version_info['version_data'] = version_data
-    version_resp = await session.post(url, data=json.dumps(version_info))
-    if version_resp.status == 200:
-        status = True
-    return status
+    version_resp = await dispatch.client.post(url, data=json.dumps(version_info))
+    return await version_resp.json() if version_resp.status == 200 else None
 
 
-async def get_specific_story(story_id):
+def prepare_new_story(data, story_id, today_date_time):
     """
-    Gets the story given a story id
-    :param story_id: Story_id
-    :return: Story data containing the versioned details.
+    Prepares story document and its initial version data from new story request data.
+    Story title, user, category and tags must be validated by caller.
+    :return: tuple of story, version data and attachments details for response
+    :raises ValueError: if any of the story fields is invalid
     """
-    url = utils.get_request_server_url('stories/{}'.format(story_id))
-    story_resp = await session.get(url)
-    return await story_resp.json() if story_resp.status == 200 else None
+    story = {}
+    version_data = {"story_title": data["story_title"], "user_id": data["user_id"]}
+
+    # category_id
+    if data.get("category_id"):
+        story["category_id"] = data["category_id"]
+
+    # agency_id
+    story["agency_id"] = data.get("agency_id", consts.JOURNO_AGENCY_ID)
+    story["agency_key"] = utils.get_agency_key(story["agency_id"])
+
+    # story timestamp
+    story["created_datetime"] = data.get("created_datetime", today_date_time.strftime(consts.DATETIME_FORMAT))
+    try:
+        created_datetime_obj = datetime.datetime.strptime(story["created_datetime"], consts.DATETIME_FORMAT)
+    except ValueError:
+        raise ValueError("Invalid created datetime format found")
+    story["created_date"] = created_datetime_obj.strftime(consts.DATE_FORMAT)
+    story["updated_datetime"] = today_date_time.strftime(consts.DATETIME_FORMAT)
+
+    if data.get("incident_date", None):
+        try:
+            datetime.datetime.strptime(data["incident_date"], consts.DATE_FORMAT)
+            story["incident_date"] = data["incident_date"]
+        except ValueError:
+            raise ValueError("Invalid incident date format found")
+
+    if data.get("incident_time", None):
+        try:
+            datetime.datetime.strptime(data["incident_time"], consts.TIME_FORMAT)
+            story["incident_time"] = data["incident_time"]
+        except ValueError:
+            raise ValueError("Invalid incident time format found")
+
+    # description
+    version_data["description"] = data.get("description", "")
+
+    # tags
+    story["tags"] = list(data.get("tags") or [])
+
+    # link
+    story["link"] = data.get("link", None)
+
+    # new tags are created by caller if tags are created automatically
+    if not AUTOMATICALLY_CREATE_TAGS:
+        story["new_tags"] = data.get("new_tags")
+
+    # attached assets
+    attachments = []
+    story["attachments"] = []
+    for file_name in data.get("attachments", []):
+        asset_id = consts.ASSET_ID_FORMAT.format(story_id=story_id, filename=file_name)
+        story["attachments"].append(asset_id)
+        # preparing asset details for response
+        attachments.append({
+            "asset_id": asset_id,
+            "file_name": file_name,
+            "state": consts.FILE_STATE_PENDING
+        })
+
+    # story status
+    story["review_status"] = dict(reviewed=False, reviewed_by=None)
+    story["sent_to_editors"] = False
+    story["archived"] = False
+    return story, version_data, attachments
 
 
 async def get_story_thumbnail_path(media_path, proxy_share_id=None):
@@ -182,7 +269,7 @@ async def submit_story_thumbnail_task(assetinfo, story_id):
 
         # posting thumbnail task
         url = utils.get_request_server_url("tasks")
-        resp = await session.post(url, data=json.dumps(task))
+        resp = await dispatch.client.post(url, data=json.dumps(task))
         if resp.status is not 200:
             logger.error("[submit_story_thumbnail_task]: Failed to post Generate Thumbnail Task for story '{}'."
                          .format(story_id))
@@ -200,6 +287,70 @@ async def submit_story_thumbnail_task(assetinfo, story_id):
     return False
 
 
+def prepare_assetinfo(data, story_id, today_date_timestamp):
+    """
+    Validates uploaded file information and prepares asset of story
+    :return: tuple of asset information and error message. Asset information is None if data is invalid.
+    """
+    assetinfo = {}
+    assetinfo["story_id"] = story_id
+
+    if not data.get("asset_id"):
+        return None, "File information not provided."
+    assetinfo["asset_id"] = data["asset_id"]
+
+    if not data.get("share_id"):
+        return None, "Share information not provided."
+    assetinfo["share_id"] = data["share_id"]
+
+    if not data.get("path"):
+        return None, "Uploaded path information not provided."
+    assetinfo["path"] = data["path"]
+
+    if not data.get("file_name"):
+        return None, "File name not provided."
+    assetinfo["file_name"] = data["file_name"]
+
+    if not data.get("file_size"):
+        return None, "File size not provided."
+    # TODO: get file size from file system
+    assetinfo["file_size"] = data["file_size"]
+
+    # updating type
+    assetinfo["type"] = data.get("type")
+    assetinfo["created_date"] = today_date_timestamp.strftime(consts.DATE_FORMAT)
+    assetinfo["created_datetime"] = today_date_timestamp.strftime(consts.DATETIME_FORMAT)
+    assetinfo["special_flags"] = {}
+    return assetinfo, None
+
+
+async def submit_story_thumbnail_tasks(assetinfos, story_id):
+    """
+    Submits thumbnail tasks of many assets with one batch request
+    :return: list of task results in order of assets
+    """
+    try:
+        tasks = []
+        for assetinfo in assetinfos:
+            task = dict(asset_id=assetinfo["asset_id"], share_id=assetinfo["share_id"], path=assetinfo["path"])
+            task["task_name"] = consts.TASK_GENERATE_THUMBNAIL
+            task["thumbnail_path"], task["proxy_share_id"] = await get_story_thumbnail_path(task["path"])
+            tasks.append(task)
+
+        # posting thumbnail tasks
+        url = utils.get_request_server_url("tasks/batch")
+        resp = await dispatch.client.post(url, data=json.dumps({"tasks": tasks}))
+        if resp.status is not 200:
+            logger.error("[submit_story_thumbnail_tasks]: Failed to post Generate Thumbnail Tasks for story '{}'."
+                         .format(story_id))
+            return None
+        return (await resp.json())["results"]
+    except Exception as ex:
+        logger.error("[submit_story_thumbnail_tasks]: Failed to send GenerateThumbnail Tasks to TaskServer. Error: '{}'"
+                     .format(ex))
+    return None
+
+
 async def submit_story_proxy_tasks(assetinfo, story_id):
     task = dict(asset_id=assetinfo["asset_id"], share_id=assetinfo["share_id"], path=assetinfo["path"])
 
@@ -209,7 +360,7 @@ async def submit_story_proxy_tasks(assetinfo, story_id):
 
     # posting thumbnail task
     url = utils.get_request_server_url("tasks")
-    resp = await session.post(url, data=json.dumps(task))
+    resp = await dispatch.client.post(url, data=json.dumps(task))
     if resp.status is not 200:
         logger.error("[submit_story_proxy_tasks]: Failed to post Generate Thumbnail Task for story '{}'."
                      .format(story_id))
@@ -230,7 +381,7 @@ async def submit_story_proxy_tasks(assetinfo, story_id):
 
     # posting task
     url = utils.get_request_server_url("tasks")
-    resp = await session.post(url, data=json.dumps(task))
+    resp = await dispatch.client.post(url, data=json.dumps(task))
     if resp.status is not 200:
         logger.error("[submit_story_proxy_tasks]: Failed to post Generate Lowres Task for story '{}'.".format(story_id))
         return False
@@ -256,8 +407,439 @@ def prepare_proxy_url(lowres_path=None, thumbnail_path=None):
     if thumbnail_path:
         proxy_url['thumbnail_url'] = utils.generate_proxy_url(thumbnail_path)
     return proxy_url
+
+
+# ------------------ Batched story enrichment ------------------
+
+async def find_documents_by_ids(collection, ids, projection=None, doc_cache=None):
+    """
+    Retrieves documents of given ids from collection with a single '$in' query
+    :param collection: motor collection to search in
+    :param ids: ids of the documents to be retrieved
+    :param projection: fields to be retrieved
+    :param doc_cache: reference data cache of the collection. Only ids missing in cache are queried.
+    :return: dict of documents mapped by their '_id'
+    """
+    docs = {}
+    missing_ids = []
+    for _id in set(ids):
+        doc = doc_cache.get(_id) if doc_cache is not None else None
+        if doc is None:
+            missing_ids.append(_id)
+        else:
+            docs[_id] = doc
+    if not missing_ids:
+        return docs
+    async for doc in collection.find({"_id": {"$in": missing_ids}}, projection):
+        docs[doc["_id"]] = doc
+        if doc_cache is not None:
+            doc_cache.set(doc["_id"], doc)
+    return docs
+
+
+async def get_tag_names(db, tag_ids):
+    """
+    Resolves names of given tags. Tag names are stored in story document so that stories can be searched by them.
+    """
+    tags = await find_documents_by_ids(db.tags, tag_ids, doc_cache=cache.tags)
+    return [tags[tag_id]["name"] for tag_id in tag_ids if tag_id in tags]
+
+
+async def backfill_story_tag_names(db, batch_size=500):
+    """
+    Stores tag names in stories saved before tag names were maintained.
+    """
+    count = 0
+    while True:
+        stories = await db.stories.find({"tag_names": {"$exists": False}}, {"tags": 1})\
+            .limit(batch_size).to_list(None)
+        if not stories:
+            break
+        tag_ids = [tag_id for story in stories for tag_id in story.get("tags", [])]
+        tags = await find_documents_by_ids(db.tags, tag_ids, doc_cache=cache.tags)
+        requests = []
+        for story in stories:
+            tag_names = [tags[tag_id]["name"] for tag_id in story.get("tags", []) if tag_id in tags]
+            requests.append(pymongo.UpdateOne({"_id": story["_id"]}, {"$set": {"tag_names": tag_names}}))
+        await db.stories.bulk_write(requests, ordered=False)
+        count += len(requests)
+    if count:
+        logger.info("[backfill_story_tag_names]: Tag names stored in '{}' stories.".format(count))
+    return True
+
+
+def get_search_terms(text_search):
+    """
+    Extracts words of a '$text' search string. Negated words are skipped.
+    """
+    return [term for term in re.findall(r"-?\w+", text_search) if not term.startswith("-")]
+
+
+def get_text_highlights(story, terms):
+    """
+    Locates search terms in story title and description. Text index matches stemmed words hence every word starting
+    with a search term is highlighted.
+    :return: dict of [start, end] offsets of matched words mapped by field name
+    """
+    highlights = {}
+    if not terms:
+        return highlights
+    pattern = re.compile(r"\b(?:{})\w*".format("|".join(re.escape(term) for term in terms)), re.IGNORECASE)
+    for field in ["story_title", "description"]:
+        highlights[field] = [[match.start(), match.end()] for match in pattern.finditer(story.get(field) or "")]
+    return highlights
+
+
+def get_version_snapshot(version_data, version_time, version_count=None):
+    """
+    Prepares the recent version fields which are embedded in story document
+    """
+    snapshot = {vkey: version_data[vkey] for vkey in consts.VERSIONING_KEYS if vkey in version_data}
+    snapshot["version_time"] = version_time
+    if version_count is not None:
+        snapshot["version_count"] = version_count
+    return snapshot
+
+
+async def save_story_version(db, story_id, version_data):
+    """
+    Saves a new version of the story to 'story_versions' and updates the recent version snapshot and version count
+    embedded in the story document with a single update. Version is delta encoded against the previous version
+    read atomically from the story document, and is numbered with the version count read along with it.
+    :return: saved version information
+    """
+    version_time = datetime.datetime.now().strftime(consts.VERSION_TIME_FORMAT)
+    snapshot = get_version_snapshot(version_data, version_time)
+    projection = dict.fromkeys(consts.VERSIONING_KEYS + ["version_count"], 1)
+    storyinfo = await db.stories.find_one_and_update({"_id": story_id},
+                                                     {"$set": snapshot, "$inc": {"version_count": 1}},
+                                                     projection=projection)
+
+    # story is created after its first version hence story may not exist yet
+    previous_data = None
+    version_count = 0
+    if storyinfo and storyinfo.get("version_count"):
+        previous_data = {vkey: storyinfo[vkey] for vkey in consts.VERSIONING_KEYS if vkey in storyinfo}
+        version_count = storyinfo["version_count"]
+
+    current_data = dict(previous_data or {}, **version_data)
+    version_info = versions.prepare_version_document(story_id, version_time, current_data, previous_data,
+                                                     version_count)
+    await db.story_versions.insert_one(version_info)
+    return version_info
+
+
+async def backfill_version_counts(db, batch_size=500):
+    """
+    Numbers versions saved before versions were numbered with version count, in order of their version time.
+    """
+    count = 0
+    while True:
+        story_ids = [group["_id"] async for group in db.story_versions.aggregate([
+            {"$match": {"version_count": {"$exists": False}}},
+            {"$group": {"_id": "$story_id"}},
+            {"$limit": batch_size}])]
+        if not story_ids:
+            break
+        requests = []
+        for story_id in story_ids:
+            # versions without version count precede numbered versions
+            story_versions = await db.story_versions.find({"story_id": story_id}, {"version_count": 1}) \
+                .sort([("version_count", pymongo.ASCENDING), ("version_time", pymongo.ASCENDING)]).to_list(None)
+            for version_count, version_info in enumerate(story_versions):
+                if "version_count" not in version_info:
+                    requests.append(pymongo.UpdateOne({"_id": version_info["_id"]},
+                                                      {"$set": {"version_count": version_count}}))
+        await db.story_versions.bulk_write(requests, ordered=False)
+        count += len(requests)
+    if count:
+        logger.info("[backfill_version_counts]: Version count stored in '{}' versions.".format(count))
+    return True
+
+
+async def backfill_story_version_snapshots(db, batch_size=500):
+    """
+    Embeds recent version snapshot into stories saved before the snapshot was maintained.
+    """
+    count = 0
+    while True:
+        story_ids = [story["_id"] async for story in
+                     db.stories.find({"version_count": {"$exists": False}}, {"_id": 1}).limit(batch_size)]
+        if not story_ids:
+            break
+        recent_versions = await find_recent_versions(db, story_ids)
+        requests = []
+        for story_id in story_ids:
+            version_info = recent_versions.get(story_id)
+            if version_info and version_info.get("version_data"):
+                snapshot = get_version_snapshot(version_info["version_data"], version_info["version_time"],
+                                                version_info["version_count"])
+            else:
+                snapshot = {"version_count": 0}
+            requests.append(pymongo.UpdateOne({"_id": story_id}, {"$set": snapshot}))
+        await db.stories.bulk_write(requests, ordered=False)
+        count += len(requests)
+    if count:
+        logger.info("[backfill_story_version_snapshots]: Recent version embedded in '{}' stories.".format(count))
+    return True
+
+
+async def find_recent_versions(db, story_ids):
+    """
+    Retrieves recent version of all given stories with a single aggregation on 'story_versions'.
+    Only used for stories saved before version snapshot was embedded, whose versions are not delta encoded.
+    :param db: database instance
+    :param story_ids: ids of the stories
+    :return: dict of recent version mapped by story id
+    """
+    story_ids = list(set(story_ids))
+    if not story_ids:
+        return {}
+    pipeline = [
+        {"$match": {"story_id": {"$in": story_ids}}},
+        {"$sort": {"version_count": pymongo.DESCENDING}},
+        {"$group": {"_id": "$story_id",
+                    "version_time": {"$first": "$version_time"},
+                    "version_data": {"$first": "$version_data"},
+                    "version_count": {"$sum": 1}}}
+    ]
+    recent_versions = {}
+    async for version in db.story_versions.aggregate(pipeline):
+        recent_versions[version["_id"]] = version
+    return recent_versions
+
+
+def assemble_story(story, categories, tags, users, assets, with_proxy_urls=False):
+    """
+    Replaces ids referenced by a story with the referenced documents
+    :param categories, tags, users, assets: referenced documents mapped to their ids
+    :param with_proxy_urls: adds lowres and thumbnail urls to ready attachments
+    """
+    # updating category info
+    story["category_info"] = categories.get(story.pop("category_id", None))
+
+    # updating tags info
+    story["tags_info_list"] = [tags.get(tag_id) for tag_id in story.pop("tags", [])]
+    story.pop("tag_names", None)
+
+    # updating user info
+    user_id = story.pop("user_id", None)
+    story["user_info"] = users.get(user_id, {"_id": user_id, "display_name": None})
+
+    # updating reviewer info
+    reviewer_id = story["review_status"]["reviewed_by"]
+    if reviewer_id is not None:
+        story["review_status"]["reviewer_info"] = users.get(reviewer_id,
+                                                            {"_id": reviewer_id, "display_name": None})
+
+    attachments = []
+    for asset_id in story["attachments"]:
+        assetinfo = assets.get(asset_id)
+        if not assetinfo:
+            assetinfo = dict(state=consts.FILE_STATE_PENDING)
+            assetinfo["file_name"] = asset_id.split(story["_id"]+"__", 1)[-1]
+        else:
+            assetinfo = dict(assetinfo, state=consts.FILE_STATE_READY)
+            if with_proxy_urls:
+                assetinfo.update(prepare_proxy_url(assetinfo.get("lowres_path"), assetinfo.get("thumbnail_path")))
+        assetinfo["asset_id"] = asset_id
+        attachments.append(assetinfo)
+    story["attachments"] = attachments
+    return story
+
+
+def get_story_details_pipeline(story_id, with_versions=False):
+    """
+    Prepares aggregation pipeline which joins a story with all documents shown in its detail view, so the
+    detail view is assembled in one database round trip irrespective of the number of attachments.
+    Joined documents are returned in 'lookup_*' fields and are trimmed to the fields shown.
+    :param with_versions: joins recent 'story_versions' documents, enough to reconstruct the first page of history
+    """
+    asset_fields = {field: "$$asset." + field for field in DETAIL_ASSET_FIELDS}
+    pipeline = [
+        {"$match": {"_id": story_id}},
+        {"$lookup": {"from": "categories", "localField": "category_id", "foreignField": "_id",
+                     "as": "lookup_categories"}},
+        {"$lookup": {"from": "tags", "localField": "tags", "foreignField": "_id", "as": "lookup_tags"}},
+        {"$lookup": {"from": "users", "localField": "user_id", "foreignField": "_id", "as": "lookup_users"}},
+        {"$lookup": {"from": "users", "localField": "review_status.reviewed_by", "foreignField": "_id",
+                     "as": "lookup_reviewers"}},
+        {"$lookup": {"from": "assets", "localField": "attachments", "foreignField": "_id", "as": "lookup_assets"}},
+        {"$addFields": {
+            "lookup_users": {"$map": {"input": {"$concatArrays": ["$lookup_users", "$lookup_reviewers"]},
+                                      "as": "user", "in": {"_id": "$$user._id",
+                                                           "display_name": "$$user.display_name"}}},
+            "lookup_assets": {"$map": {"input": "$lookup_assets", "as": "asset",
+                                       "in": dict(asset_fields, _id="$$asset._id")}},
+        }},
+        {"$project": {"lookup_reviewers": 0}},
+    ]
+    if with_versions:
+        # a snapshot is stored every VERSION_SNAPSHOT_INTERVAL versions hence these many extra versions are joined
+        # to reconstruct the deltas of the oldest versions of the page
+        pipeline.append({"$lookup": {"from": "story_versions", "pipeline": [
+            {"$match": {"story_id": story_id}},
+            {"$sort": {"version_count": pymongo.DESCENDING}},
+            {"$limit": consts.VERSIONS_PER_PAGE + versions.VERSION_SNAPSHOT_INTERVAL},
+            {"$project": {"_id": 0, "story_id": 0}},
+        ], "as": "lookup_versions"}})
+    return pipeline
+
+
+async def load_story_details(db, story_id, with_versions=False):
+    """
+    Prepares detail view of a story with one aggregation
+    :param with_versions: adds previous versions of the story
+    :return: story details or None if story does not exist
+    """
+    stories = await db.stories.aggregate(get_story_details_pipeline(story_id, with_versions)).to_list(length=1)
+    storyinfo = stories[0] if stories else None
+    if storyinfo:
+        categories = {category["_id"]: category for category in storyinfo.pop("lookup_categories")}
+        tags = {tag["_id"]: tag for tag in storyinfo.pop("lookup_tags")}
+        users = {user["_id"]: user for user in storyinfo.pop("lookup_users")}
+        assets = {asset["_id"]: asset for asset in storyinfo.pop("lookup_assets")}
+        version_documents = storyinfo.pop("lookup_versions", None)
+
+        # stories saved before version snapshot was embedded in story document
+        if "version_count" not in storyinfo:
+            version_info = (await find_recent_versions(db, [story_id])).get(story_id)
+            if version_info and version_info.get("version_data"):
+                storyinfo.update(get_version_snapshot(version_info["version_data"], version_info["version_time"],
+                                                      version_info["version_count"]))
+        assemble_story(storyinfo, categories, tags, users, assets, with_proxy_urls=True)
+
+        # Adding the previous versions to the story info only when requested
+        if with_versions:
+            recent_versions = versions.reconstruct_versions(story_id, list(reversed(version_documents)))
+            storyinfo["versions"] = list(reversed(recent_versions[-consts.VERSIONS_PER_PAGE:]))[1:]
+    return storyinfo
+
+
+async def publish_story_feed(request, message, story, coalesce=False):
+    """
+    Publishes a story on feed server of this request server. Story document is enriched the same way as story
+    details, so clients receive what 'GET /stories/{story_id}' returns without another request.
+    :param story: story document as saved in 'stories' collection. It is enriched in place.
+    :param coalesce: merges with other feeds of same message and story published shortly
+    """
+    await enrich_stories(request.app["db"], [story], asset_projection={field: 1 for field in DETAIL_ASSET_FIELDS},
+                         with_proxy_urls=True)
+    request.app["feed_server"].publish(message, story, feeds.get_story_topics(story),
+                                       key=feeds.get_topic(feeds.TOPIC_STORY, story["_id"]), coalesce=coalesce)
+
+
+def publish_created_stories(feed_server, stories):
+    """
+    Publishes stories created together as one 'stories-created' feed per agency. Clients which do not subscribe to
+    topics do not receive opt-in feeds, hence every story is also published to them alone as 'story-created' feed.
+    :param stories: enriched story documents
+    """
+    agency_stories = {}
+    for story in stories:
+        agency_stories.setdefault(utils.get_agency_key(story.get("agency_id")), []).append(story)
+        feed_server.publish("story-created", story, key=feeds.get_topic(feeds.TOPIC_STORY, story["_id"]))
+    for agency_key, created in agency_stories.items():
+        feed_server.publish("stories-created", {"stories": created},
+                            [feeds.get_topic(feeds.TOPIC_AGENCY, agency_key)])
+
+
+async def enrich_stories(db, stories, asset_projection=None, with_proxy_urls=False):
+    """
+    Updates category, recent version, tags, user, reviewer and attachments information of given stories.
+    All ids of a kind are collected first and resolved with one query per collection, so the number of
+    database round trips does not grow with the number of stories.
+    :param db: database instance
+    :param stories: story documents retrieved from 'stories' collection
+    :param asset_projection: fields of attached assets to be retrieved. All fields if None.
+    :param with_proxy_urls: adds lowres and thumbnail urls to ready attachments
+    :return: list of enriched stories
+    """
+    if not stories:
+        return stories
+
+    # stories saved before version snapshot was embedded in story document
+    recent_versions = await find_recent_versions(db, [story["_id"] for story in stories
+                                                      if "version_count" not in story])
+    for story in stories:
+        version_info = recent_versions.get(story["_id"])
+        if version_info and version_info.get("version_data"):
+            story.update(get_version_snapshot(version_info["version_data"], version_info["version_time"],
+                                              version_info["version_count"]))
+
+    # collecting ids of all referenced documents
+    category_ids, tag_ids, user_ids, asset_ids = [], [], [], []
+    for story in stories:
+        if story.get("category_id"):
+            category_ids.append(story["category_id"])
+        tag_ids.extend(story.get("tags", []))
+        if story.get("user_id"):
+            user_ids.append(story["user_id"])
+        if story["review_status"]["reviewed_by"] is not None:
+            user_ids.append(story["review_status"]["reviewed_by"])
+        asset_ids.extend(story.get("attachments", []))
+
+    # resolving all ids of a kind at once
+    categories = await find_documents_by_ids(db.categories, category_ids, doc_cache=cache.categories)
+    tags = await find_documents_by_ids(db.tags, tag_ids, doc_cache=cache.tags)
+    users = await find_documents_by_ids(db.users, user_ids, doc_cache=cache.users)
+    users = {_id: {"_id": _id, "display_name": user.get("display_name")} for _id, user in users.items()}
+    assets = await find_documents_by_ids(db.assets, asset_ids, asset_projection)
+
+    for story in stories:
+        assemble_story(story, categories, tags, users, assets, with_proxy_urls)
+    return stories
+
+# ------------------ Indexes ------------------
+
+indexes = {
+    "stories": [
+        pymongo.IndexModel([("agency_key", pymongo.ASCENDING), ("created_datetime", pymongo.DESCENDING),
+                            ("_id", pymongo.DESCENDING)], name="agency_created_datetime"),
+        pymongo.IndexModel([("created_datetime", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)],
+                           name="created_datetime"),
+        pymongo.IndexModel([("created_date", pymongo.ASCENDING)], name="created_date"),
+        pymongo.IndexModel([("tags", pymongo.ASCENDING)], name="tags"),
+        # stories are always searched within an agency hence agency key prefixes the text index
+        pymongo.IndexModel([("agency_key", pymongo.ASCENDING), ("story_title", pymongo.TEXT),
+                            ("description", pymongo.TEXT), ("tag_names", pymongo.TEXT)],
+                           weights={"story_title": 10, "description": 5, "tag_names": 3}, name="story_text")
+    ],
+    "story_versions": [
+        pymongo.IndexModel([("story_id", pymongo.ASCENDING), ("version_count", pymongo.DESCENDING)],
+                           name="story_version_count")
+    ],
+    "assets": [
+        pymongo.IndexModel([("story_id", pymongo.ASCENDING)], name="story_id")
+    ],
+    "story_counters": [
+        pymongo.IndexModel([("agency", pymongo.ASCENDING), ("field", pymongo.ASCENDING)], name="agency_field")
+    ]
+}
+
 # ------------------ Web Routes ------------------
 
+async def initial_setup(app):
+    db = app["db"]
+    # building story counters for stories saved before counters were maintained
+    if not await db.story_counters.find_one() and await db.stories.find_one():
+        await counters.rebuild_story_counters(db)
+
+    # normalizing agency id of stories saved before agency key was maintained
+    await utils.backfill_agency_keys(db.stories, "agency_id")
+
+    # numbering versions saved before versions were numbered. Recent versions are found by number hence this
+    # precedes embedding of recent version.
+    await backfill_version_counts(db)
+
+    # embedding recent version in stories saved before version snapshot was maintained
+    await backfill_story_version_snapshots(db)
+
+    # storing tag names in stories saved before tag names were maintained
+    await backfill_story_tag_names(db)
+    return True
+
+
 routes = aioweb.RouteTableDef()
 
 # ----------------- story resource ----------------------
@@ -267,11 +849,6 @@ async def create_new_story(request):
     db = request.app["db"]
     data = await request.json()
 
-    # new story data
-    story = {}
-    # Version Data
-    # Version contains story_title, user_id, description
-    version_data = {}
     # validating story
 
     # story_title - must
@@ -280,8 +857,6 @@ async def create_new_story(request):
         logger.error("[/stories] [POST]: invalid story title '{}' provided.".format(story_title))
         return utils.get_http_error("Story title must be provided")
 
-    version_data["story_title"] = story_title
-
     # user_id - must
     user_id = data.get("user_id")
     if not user_id or not await get_user_info(user_id):
@@ -289,8 +864,6 @@ async def create_new_story(request):
                      .format(user_id, story_title))
         return utils.get_http_error("User not found. Please re-login and retry.")
 
-    version_data["user_id"] = user_id
-
     #
     # NOTE: Story id is used to identify a story uniquely. According to current logic story id is generated using
     #   alphanumeric characters from story_title, user_id, today's date. This means for one day two stories with same
@@ -304,45 +877,16 @@ async def create_new_story(request):
 
     # category_id
     category_id = data.get("category_id")
-    if category_id:
-        if not await get_category_info(category_id):
-            logger.error("[/stories] [POST] [{}]: category_id '{}' not found in db.".format(story_id, category_id))
-            return utils.get_http_error("Selected category not found. Please re-login and retry.")
-        story["category_id"] = category_id
-
-    # agency_id
-    story["agency_id"] = data.get("agency_id", consts.JOURNO_AGENCY_ID)
-
-    # story timestamp
-    story["created_datetime"] = data.get("created_datetime", today_date_time.strftime(consts.DATETIME_FORMAT))
-    created_datetime_obj = datetime.datetime.strptime(story["created_datetime"], consts.DATETIME_FORMAT)
-    story["created_date"] = created_datetime_obj.strftime(consts.DATE_FORMAT)
-    story["updated_datetime"] = today_date_time.strftime(consts.DATETIME_FORMAT)
-
-    if data.get("incident_date", None):
-        try:
-            datetime.datetime.strptime(data["incident_date"], consts.DATE_FORMAT)
-            story["incident_date"] = data["incident_date"]
-        except ValueError:
-            logger.error("[/stories] [POST] [{}]: invalid incident date format provided.".format(story_id))
-            return utils.get_http_error("Invalid incident date format found")
-
-    if data.get("incident_time", None):
-        try:
-            datetime.datetime.strptime(data["incident_time"], consts.TIME_FORMAT)
-            story["incident_time"] = data["incident_time"]
-        except ValueError:
-            logger.error("[/stories] [POST] [{}]: invalid incident time format provided.".format(story_id))
-            return utils.get_http_error("Invalid incident time format found")
-
-    # description 
-    version_data["description"] = data.get("description", "")
-
-    # tags
-    story["tags"] = data.get("tags", [])
+    if category_id and not await get_category_info(category_id):
+        logger.error("[/stories] [POST] [{}]: category_id '{}' not found in db.".format(story_id, category_id))
+        return utils.get_http_error("Selected category not found. Please re-login and retry.")
 
-    # link
-    story["link"] = data.get("link", None)
+    # new story data and version data. Version contains story_title, user_id, description
+    try:
+        story, version_data, attachments = prepare_new_story(data, story_id, today_date_time)
+    except ValueError as ex:
+        logger.error("[/stories] [POST] [{}]: {}".format(story_id, ex))
+        return utils.get_http_error("{}".format(ex))
 
     # new tags
     if AUTOMATICALLY_CREATE_TAGS:
@@ -353,26 +897,7 @@ async def create_new_story(request):
                              .format(story_id, tagname))
                 continue
             story["tags"].append(resp["_id"])
-    else:
-        story["new_tags"] = data.get("new_tags")
-
-    # attached assets
-    attachments = []
-    story["attachments"] = []
-    for file_name in data.get("attachments", []):
-        asset_id = consts.ASSET_ID_FORMAT.format(story_id=story_id, filename=file_name)
-        story["attachments"].append(asset_id)
-        # preparing asset details for response
-        attachments.append({
-            "asset_id": asset_id,
-            "file_name": file_name,
-            "state": consts.FILE_STATE_PENDING
-        })
-
-    # story status
-    story["review_status"] = dict(reviewed=False, reviewed_by=None)
-    story["sent_to_editors"] = False
-    story["archived"] = False
+    story["tag_names"] = await get_tag_names(db, story["tags"])
 
     # creating an version entry before the actual story entry is created
     version_resp = await create_version(story_id, version_data)
@@ -380,6 +905,9 @@ async def create_new_story(request):
         logger.error("[/stories] [POST] [{}]: Could not create version.".format(story_id))
         return utils.get_http_error("Version Could not be created")
 
+    # embedding recent version snapshot
+    story.update(get_version_snapshot(version_data, version_resp["version_time"], 1))
+
     # saving to db
     res = await db.stories.update_one({"_id": story_id}, {"$setOnInsert": story}, upsert=True)
     # parsing motor response
@@ -391,12 +919,173 @@ async def create_new_story(request):
         logger.error("[/stories] [POST] [{}]: Failed to save to db.".format(story_id))
         return utils.get_http_error("Server ran into database error", httperror=aioweb.HTTPInternalServerError)
 
-    await utils.push_feed(msg='story-created', data=await get_specific_story(story_id))
+    await counters.update_story_counters(db, new_story=story)
+    await publish_story_feed(request, "story-created", dict(story, _id=story_id))
     logger.info("[/stories] [POST] [{}]: Story '{}' saved successfully.".format(story_id, story))
     return aioweb.json_response({"story_id": story_id, "attachments": attachments, "ok": True})
 
 
+@routes.post("/stories/batch")
+async def create_new_stories(request):
+    """
+    Creates many stories at once. Request data is '{"stories": [story, ...]}' where every story is same as of
+    'POST /stories'. References of whole batch are validated together and stories and their initial versions are
+    written with one bulk insert each.
+    :return: result of every story in order of request
+    """
+    db = request.app["db"]
+    data = await request.json()
+
+    stories_data = data.get("stories")
+    if not stories_data or not isinstance(stories_data, list):
+        logger.error("[/stories/batch] [POST]: stories not provided.")
+        return utils.get_http_error("Stories must be provided")
+
+    if len(stories_data) > MAX_BATCH_STORIES:
+        logger.error("[/stories/batch] [POST]: '{}' stories provided which exceeds batch limit."
+                     .format(len(stories_data)))
+        return utils.get_http_error("Maximum '{}' stories can be created at once".format(MAX_BATCH_STORIES))
+
+    # resolving references of whole batch at once
+    stories_data = [story_data if isinstance(story_data, dict) else {} for story_data in stories_data]
+    users = await find_documents_by_ids(db.users, [story_data.get("user_id") for story_data in stories_data
+                                                   if story_data.get("user_id")], doc_cache=cache.users)
+    category_ids = [story_data.get("category_id") for story_data in stories_data if story_data.get("category_id")]
+    categories = await find_documents_by_ids(db.categories, category_ids, doc_cache=cache.categories)
+    tags = await find_documents_by_ids(db.tags, [tag_id for story_data in stories_data
+                                                 for tag_id in story_data.get("tags") or []], doc_cache=cache.tags)
+
+    today_date_time = datetime.datetime.now()
+    version_time = today_date_time.strftime(consts.VERSION_TIME_FORMAT)
+    results = []
+    new_stories = {}
+    for index, story_data in enumerate(stories_data):
+        result = {"index": index, "ok": False}
+        results.append(result)
+
+        story_title = story_data.get("story_title")
+        if not story_title:
+            result["message"] = "Story title must be provided"
+            continue
+
+        user_id = story_data.get("user_id")
+        if user_id not in users:
+            result["message"] = "User not found. Please re-login and retry."
+            continue
+
+        story_id = generate_story_id(story_title, user_id, today_date_time.strftime(consts.DATE_FORMAT))
+        result["story_id"] = story_id
+        if story_id in new_stories:
+            result["message"] = "Story with same title already provided in this batch."
+            continue
+
+        if story_data.get("category_id") and story_data["category_id"] not in categories:
+            result["message"] = "Selected category not found. Please re-login and retry."
+            continue
+
+        try:
+            story, version_data, attachments = prepare_new_story(story_data, story_id, today_date_time)
+        except ValueError as ex:
+            result["message"] = "{}".format(ex)
+            continue
+
+        story["_id"] = story_id
+        story["tag_names"] = [tags[tag_id]["name"] for tag_id in story["tags"] if tag_id in tags]
+        story.update(get_version_snapshot(version_data, version_time, 1))
+        result["attachments"] = attachments
+        new_stories[story_id] = (result, story, version_data)
+
+    # stories which already exist
+    existing = await find_documents_by_ids(db.stories, list(new_stories.keys()), {"_id": 1})
+    for story_id in existing:
+        result, _, _ = new_stories.pop(story_id)
+        result["message"] = "Story with same title already created. Please choose different story title."
+
+    # saving to db
+    # error code of every story which failed to save mapped by story id
+    failed_ids = {}
+    if new_stories:
+        new_story_docs = [story for _, story, _ in new_stories.values()]
+        try:
+            await db.stories.insert_many(new_story_docs, ordered=False)
+        except pymongo.errors.BulkWriteError as ex:
+            for error in ex.details.get("writeErrors", []):
+                failed_ids[new_story_docs[error["index"]]["_id"]] = error.get("code")
+            failed_indexes = [new_stories[story_id][0]["index"] for story_id in failed_ids]
+            logger.error("[/stories/batch] [POST]: Failed to save '{}' stories to db. Failed indexes: '{}'. "
+                         "Error: '{}'".format(len(failed_ids), failed_indexes, ex))
+
+    created = []
+    new_versions = []
+    for story_id, (result, story, version_data) in new_stories.items():
+        if story_id in failed_ids:
+            # 11000 is duplicate key error. Story with same id got created after existing stories were checked.
+            if failed_ids[story_id] == 11000:
+                result["message"] = "Story already exists"
+            else:
+                result["message"] = "Server ran into database error"
+            continue
+        result["ok"] = True
+        result.pop("message", None)
+        created.append(story)
+        new_versions.append(versions.prepare_version_document(story_id, version_time, version_data))
+
+    if created:
+        await db.story_versions.insert_many(new_versions, ordered=False)
+        await counters.add_stories_to_counters(db, created)
+
+        await enrich_stories(db, created)
+        publish_created_stories(request.app["feed_server"], created)
+
+    logger.info("[/stories/batch] [POST]: '{}' of '{}' stories saved successfully."
+                .format(len(created), len(stories_data)))
+    return aioweb.json_response({"ok": bool(created), "created": len(created), "results": results})
+
+
+@routes.get("/stories/facets")
+@dispatch.local
+async def get_story_facets(request):
+    """
+    Reports number of stories per agency and, for the requested agency, per category, tag, review status, archive
+    status and created date. Counts are served from story counters hence no stories are counted.
+    """
+    db = request.app["db"]
+
+    agency_id = request.rel_url.query.get("agency_id", consts.JOURNO_AGENCY_ID)
+    facets = await counters.get_story_facets(db, agency_id)
+    fields = facets["fields"]
+
+    # resolving names of categories and tags
+    categories = await find_documents_by_ids(db.categories, [value for value, _ in fields["category_id"]],
+                                             doc_cache=cache.categories)
+    tags = await find_documents_by_ids(db.tags, [value for value, _ in fields["tags"]], doc_cache=cache.tags)
+
+    def get_counts(field, names=None):
+        counts = [{"value": value, "count": count} for value, count in fields[field]]
+        if names is not None:
+            for entry in counts:
+                entry["name"] = names.get(entry["value"], {}).get("name")
+        return sorted(counts, key=lambda entry: entry["count"], reverse=True)
+
+    agency_key = utils.get_agency_key(agency_id)
+    agencies = sorted([{"agency_key": agency, "count": count} for agency, count in facets["agencies"]],
+                      key=lambda entry: entry["count"], reverse=True)
+    created_dates = sorted(get_counts("created_date"), key=lambda entry: entry["value"], reverse=True)
+
+    return aioweb.json_response({
+        "agency_id": agency_id,
+        "total": next((entry["count"] for entry in agencies if entry["agency_key"] == agency_key), 0),
+        "agencies": agencies,
+        "category_id": get_counts("category_id", categories),
+        "tag_ids": get_counts("tags", tags),
+        "reviewed": get_counts("review_status.reviewed"),
+        "archived": get_counts("archived"),
+        "created_date": created_dates[:FACET_CREATED_DATES]
+    })
+
+
 @routes.get("/stories/{story_id}")
+@dispatch.local
 async def get_story_details(request):
     db = request.app["db"]
 
@@ -405,72 +1094,19 @@ async def get_story_details(request):
         logger.error("[/stories] [GET]: story_id not provided.")
         return utils.get_http_error("Story id not provided")
 
-    storyinfo = await db.stories.find_one({"_id": story_id})
-    if storyinfo:
-        # updating category info
-        storyinfo["category_info"] = await get_category_info(storyinfo["category_id"])
-        del storyinfo["category_id"]
+    with_versions = request.rel_url.query.get("versions") == "true"
 
-        version_info = await get_recent_version(story_id)
-        if version_info and version_info.get("version_data"):
-            storyinfo["version_time"] = version_info["version_time"]
-            for vkey in consts.VERSIONING_KEYS:
-                storyinfo[vkey] = version_info['version_data'].get(vkey)
-
-        # Adding the previous versions to the story info
-        storyinfo['versions'] = []
-        version_history = await get_version_history(story_id)
-        if version_history and version_history.get("version_history", []):
-            if len(version_history['version_history']) > 1:
-                storyinfo["versions"] = version_history['version_history'][1:]
-
-        # updating tags info
-        tags_info_list = []
-        for tag_id in storyinfo.get("tags", []):
-            tags_info_list.append(await get_tag_info(tag_id))
-
-        storyinfo["tags_info_list"] = tags_info_list
-        if "tags" in storyinfo:
-            del storyinfo["tags"]
-        logger.info("Storyinfo is : {}".format(storyinfo))
-        # updating user info
-        _user_info = await get_user_info(storyinfo["user_id"])
-        storyinfo["user_info"] = {"_id": _user_info["_id"], "display_name": _user_info["display_name"]}
-        del storyinfo["user_id"]
-
-        # updating reviewer info
-        if storyinfo["review_status"]["reviewed_by"] is not None:
-            _reviewer_info = await get_user_info(storyinfo["review_status"]["reviewed_by"])
-            storyinfo["review_status"]["reviewer_info"] = {"_id": _reviewer_info["_id"],
-                                                           "display_name": _reviewer_info["display_name"]}
-
-        attachments = []
-        for asset_id in storyinfo["attachments"]:
-            assetinfo = await db.assets.find_one(
-                {"_id": asset_id},
-                {"file_name": 1,
-                 "file_size": 1,
-                "type": 1,
-                "path": 1,
-                "created_date": 1,
-                "thumbnail_path": 1, "lowres_path": 1}
-            )
-
-            if not assetinfo:
-                assetinfo = dict(state=consts.FILE_STATE_PENDING)
-                assetinfo["file_name"] = asset_id.split(storyinfo["_id"]+"__", 1)[-1]
-            else:
-                assetinfo["state"] = consts.FILE_STATE_READY
-                proxy_url = prepare_proxy_url(assetinfo.get("lowres_path"), assetinfo.get("thumbnail_path"))
-                assetinfo.update(proxy_url)
-            assetinfo["asset_id"] = asset_id
-            attachments.append(assetinfo)
-        storyinfo["attachments"] = attachments
-    return aioweb.json_response(storyinfo if storyinfo else None)
+    async def load_story_json():
+        return json.dumps(await load_story_details(db, story_id, with_versions))
+
+    # concurrent reads of a story share one computation of its details
+    story_json = await cache.story_details.do((story_id, with_versions), load_story_json)
+    return aioweb.json_response(text=story_json)
 
 
 
 @routes.get("/stories")
+@dispatch.local
 async def get_all_stories(request):
     # db instance
     db = request.app["db"]
@@ -494,6 +1130,21 @@ async def get_all_stories(request):
             logger.error("[/stories] [GET]: invalid page_number type. page_number must be of int type hence "
                          "skipping pagination.")
 
+    # page cursors. When provided, stories are paged using (created_datetime, _id) instead of page_number.
+    after = before = None
+    for key in ["after", "before"]:
+        if not search_filter.get(key):
+            continue
+        page_cursor = utils.decode_page_cursor(search_filter[key])
+        if not page_cursor or len(page_cursor) != 2:
+            logger.error("[/stories] [GET]: invalid '{}' cursor '{}' provided.".format(key, search_filter[key]))
+            return utils.get_http_error("Invalid page cursor provided")
+        if key == "after":
+            after = page_cursor
+        else:
+            before = page_cursor
+        break
+
     # Getting search parameters
     # story_id
     if search_filter.get("story_id", None):
@@ -507,9 +1158,9 @@ async def get_all_stories(request):
             return utils.get_http_error("User not identified")
         query["user_id"] = user_id
 
-    # agency id
-    query["agency_id"] = {"$regex" : "^{}$".format(search_filter.get("agency_id", consts.JOURNO_AGENCY_ID )),
-                          "$options": '-i' }
+    # agency id. Stories are matched on normalized agency key so that the filter is an exact index lookup.
+    agency_id = search_filter.get("agency_id", consts.JOURNO_AGENCY_ID)
+    query["agency_key"] = utils.get_agency_key(agency_id)
 
     # created_date
     date_str = search_filter.get("created_date", None)
@@ -574,14 +1225,19 @@ async def get_all_stories(request):
         if value is not None:
             query["archived"] = value
 
-    # text search -- only for title and description
+    # text search over title, description and tag names using 'story_text' index
     # For more details on $text search refer link: https://docs.mongodb.com/v3.6/text-search/
-    # TODO: Stories 'title' and 'description' field should be programmatically added to 'stories' table text indexes.
-    # if search_filter.get("text_search") and TEXT_INDEX_ENABLED:
-    #    query["$text"] = {"$search": search_filter["text_search"]}
+    text_search = search_filter.get("text_search")
+    if isinstance(text_search, str) and text_search.strip():
+        query["$text"] = {"$search": text_search.strip()}
+
+        # text search results are ordered by relevance which page cursors can not resume from
+        if after or before:
+            logger.error("[/stories] [GET]: page cursors can not be combined with text_search.")
+            return utils.get_http_error("Page cursors can not be combined with text search. Use page_number instead")
 
     # calculating pagination information
-    total_stories_count = await db.stories.count_documents(query)
+    total_stories_count = await counters.get_story_count(db, agency_id, query)
     total_pages = math.ceil(total_stories_count / STORIES_PAGE_SIZE)
 
     skip_first_n = STORIES_PAGE_SIZE * (page_number - 1)
@@ -589,60 +1245,56 @@ async def get_all_stories(request):
     # retrieving stories
     stories = []
     if "$text" in query:
+        # most relevant stories first. Stories with same relevance are ordered by recency.
         stories_cursor = db.stories.find(query, {"score": {"$meta": "textScore"}})\
-            .sort([("score", {"$meta": "textScore"})])
+            .sort([("score", {"$meta": "textScore"}), ("created_datetime", pymongo.DESCENDING)])\
+            .skip(skip_first_n).limit(STORIES_PAGE_SIZE)
+
+    elif after or before:
+        # keyset pagination: stories older than 'after' or newer than 'before' cursor
+        created_datetime, _id = after or before
+        operator, direction = ("$lt", pymongo.DESCENDING) if after else ("$gt", pymongo.ASCENDING)
+        query["$or"] = [{"created_datetime": {operator: created_datetime}},
+                        {"created_datetime": created_datetime, "_id": {operator: _id}}]
+        stories_cursor = db.stories.find(query).sort([("created_datetime", direction), ("_id", direction)])\
+            .limit(STORIES_PAGE_SIZE + 1)
+
     else:
-        stories_cursor = db.stories.find(query).sort([("created_datetime", pymongo.DESCENDING)])
+        stories_cursor = db.stories.find(query)\
+            .sort([("created_datetime", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)])\
+            .skip(skip_first_n).limit(STORIES_PAGE_SIZE + 1)
 
     logger.info("[/stories] [GET]: search query: {}".format(query))
 
-    async for story in stories_cursor.skip(skip_first_n).limit(STORIES_PAGE_SIZE):
-        # updating category info
-        story["category_info"] = await get_category_info(story["category_id"])
-        del story["category_id"]
-
-        version_info = await get_recent_version(story['_id'])
-        if version_info and version_info.get('version_data'):
-            story['version_time'] = version_info['version_time']
-            for vkey in consts.VERSIONING_KEYS:
-                story[vkey] = version_info['version_data'].get(vkey)
-
-        # updating tags info
-        tags_info_list = []
-        for tag_id in story.get("tags", []):
-            tags_info_list.append(await get_tag_info(tag_id))
-
-        story["tags_info_list"] = tags_info_list
-        if "tags" in story:
-            del story["tags"]
-
-        # updating user info
-        _user_info = await get_user_info(story["user_id"])
-        story["user_info"] = {"_id": _user_info["_id"], "display_name": _user_info["display_name"]}
-        del story["user_id"]
-
-        # updating reviewer info
-        if story["review_status"]["reviewed_by"] is not None:
-            _reviewer_info = await get_user_info(story["review_status"]["reviewed_by"])
-            story["review_status"]["reviewer_info"] = {"_id": _reviewer_info["_id"],
-                                                       "display_name": _reviewer_info["display_name"]}
-
-        attachments = []
-        for asset_id in story["attachments"]:
-            assetinfo = await db.assets.find_one({"_id": asset_id})
-
-            if not assetinfo:
-                assetinfo = dict(state=consts.FILE_STATE_PENDING)
-                assetinfo["file_name"] = asset_id.split(story["_id"]+"__", 1)[-1]
-            else:
-                assetinfo["state"] = consts.FILE_STATE_READY
-
-            assetinfo["asset_id"] = asset_id
-            attachments.append(assetinfo)
-        story["attachments"] = attachments
+    async for story in stories_cursor:
         stories.append(story)
 
-    return aioweb.json_response({"stories": stories, "page_number": page_number, "total_pages": total_pages})
+    # preparing cursors to fetch next (older) and previous (newer) pages
+    next_cursor = prev_cursor = None
+    if "$text" not in query:
+        has_more = len(stories) > STORIES_PAGE_SIZE
+        stories = stories[:STORIES_PAGE_SIZE]
+        if before:
+            stories.reverse()
+
+        if stories:
+            first_story, last_story = stories[0], stories[-1]
+            if has_more or before:
+                next_cursor = utils.encode_page_cursor(last_story["created_datetime"], last_story["_id"])
+            if (has_more and before) or after or (not before and page_number > 1):
+                prev_cursor = utils.encode_page_cursor(first_story["created_datetime"], first_story["_id"])
+
+    # resolving referenced information of whole page at once
+    await enrich_stories(db, stories)
+
+    # locating search terms in matched stories
+    if "$text" in query:
+        terms = get_search_terms(query["$text"]["$search"])
+        for story in stories:
+            story["highlights"] = get_text_highlights(story, terms)
+
+    return aioweb.json_response({"stories": stories, "page_number": page_number, "total_pages": total_pages,
+                                 "next_cursor": next_cursor, "prev_cursor": prev_cursor})
 
 
 @routes.put("/stories/{story_id}")
@@ -669,7 +1321,10 @@ async def update_story_entry(request):
         logger.error("[/stories] [PUT] [{}]: Story not found in db.".format(story_id))
         return utils.get_http_error("Requested story not found")
 
-    recent_version = await get_recent_version(story_id)
+    if "version_count" in storyinfo:
+        recent_version = {"version_data": {vkey: storyinfo.get(vkey) for vkey in consts.VERSIONING_KEYS}}
+    else:
+        recent_version = await get_recent_version(story_id)
     logger.info("[/stories] [PUT]:Recent version of data is : {}".format(recent_version))
     new_version_data = dict()
 
@@ -701,14 +1356,12 @@ async def update_story_entry(request):
     if data.get("description"):
         new_version_data["description"] = data["description"]
 
-    # tags
+    # tags. Tags are updated only if all given tags exist.
     if "tags" in data and isinstance(data["tags"], list):
-        data["tags"] = list()
-        for tag in data["tags"]:
-            if not await get_tag_info(tag):
-                del data["tags"]
-                break
-            story["tags"].append(tag)
+        tag_names = await get_tag_names(db, data["tags"])
+        if len(tag_names) == len(data["tags"]):
+            story["tags"] = data["tags"]
+            story["tag_names"] = tag_names
 
     # incident date
     if data.get("incident_date"):
@@ -765,6 +1418,10 @@ async def update_story_entry(request):
             logger.error("[/stories] [PUT] [{}]: Could not create version.".format(story_id))
             return utils.get_http_error("Version Could not be created")
         if not story:
+            # versioned fields are not counted, hence only the feed is published
+            updated_story = await db.stories.find_one({"_id": story_id})
+            if updated_story:
+                await publish_story_feed(request, "story-updated", updated_story, coalesce=True)
             resp_data = dict(ok=True, story_id=story_id)
             if attachments:
                 resp_data["attachments"] = attachments
@@ -775,17 +1432,14 @@ async def update_story_entry(request):
         return utils.get_http_error("Cannot update story no changes")
 
     # saving to db
-    res = await db.stories.update_one({"_id": story_id}, {"$set": story})
-
-    # parsing motor response
-    if not res.raw_result["updatedExisting"]:
-        if res.matched_count == 0:
-            logger.error("[/stories] [PUT] [{}]: Requested story not found.".format(story_id))
-            return utils.get_http_error("Requested story not found")
+    updated_story = await db.stories.find_one_and_update({"_id": story_id}, {"$set": story},
+                                                         return_document=pymongo.ReturnDocument.AFTER)
+    if not updated_story:
+        logger.error("[/stories] [PUT] [{}]: Requested story not found.".format(story_id))
+        return utils.get_http_error("Requested story not found")
 
-        logger.error("[/stories] [PUT] [{}]: Failed to save to db.".format(story_id))
-        return utils.get_http_error("Server ran into database error", httperror=aioweb.HTTPInternalServerError)
-    await utils.push_feed(msg="story-updated", data=await get_specific_story(story_id))
+    await counters.update_story_counters(db, storyinfo, updated_story)
+    await publish_story_feed(request, "story-updated", updated_story, coalesce=True)
     logger.info("[/stories] [PUT] [{}]: Story '{}' saved successfully.".format(story_id, story))
     resp_data = dict(ok=True, story_id=story_id)
     if attachments:
@@ -854,45 +1508,15 @@ async def save_story_file_details(request):
 
     # parsing user input and preparing data
     logger.info("[stories-assets] Post data recieved is : {}".format(data))
-    assetinfo = {}
     story_id = data.get("story_id")
     if not story_id or not await db.stories.find_one({"_id": story_id}):
         logger.error("[/stories-assets] [POST]: story_id not provided.")
         return utils.get_http_error("Requested story not found")
-    assetinfo["story_id"] = story_id
-
-    if not data.get("asset_id"):
-        logger.error("[/stories-assets] [POST] [{}]: asset_id not provided.".format(story_id))
-        return utils.get_http_error("File information not provided.")
-    assetinfo["asset_id"] = data["asset_id"]
-
-    if not data.get("share_id"):
-        logger.error("[/stories-assets] [POST] [{}]: share_id not provided.".format(story_id))
-        return utils.get_http_error("Share information not provided.")
-    assetinfo["share_id"] = data["share_id"]
 
-    if not data.get("path"):
-        logger.error("[/stories-assets] [POST] [{}]: path not provided.".format(story_id))
-        return utils.get_http_error("Uploaded path information not provided.")
-    assetinfo["path"] = data["path"]
-
-    if not data.get("file_name"):
-        logger.error("[/stories-assets] [POST] [{}]: file_name not provided.".format(story_id))
-        return utils.get_http_error("File name not provided.")
-    assetinfo["file_name"] = data["file_name"]
-
-    if not data.get("file_size"):
-        logger.error("[/stories-assets] [POST] [{}]: file_size not provided.".format(story_id))
-        return utils.get_http_error("File size not provided.")
-    # TODO: get file size from file system
-    assetinfo["file_size"] = data["file_size"]
-
-    # updating type
-    assetinfo["type"] = data.get("type")
-    today_date_timestamp = datetime.datetime.now()
-    assetinfo["created_date"] = today_date_timestamp.strftime(consts.DATE_FORMAT)
-    assetinfo["created_datetime"] = today_date_timestamp.strftime(consts.DATETIME_FORMAT)
-    assetinfo["special_flags"] = {}
+    assetinfo, err_msg = prepare_assetinfo(data, story_id, datetime.datetime.now())
+    if err_msg:
+        logger.error("[/stories-assets] [POST] [{}]: {}".format(story_id, err_msg))
+        return utils.get_http_error(err_msg)
 
     # TODO: verify file is uploaded
 
@@ -917,6 +1541,68 @@ async def save_story_file_details(request):
     return aioweb.json_response({"ok": True})
 
 
+@routes.post("/stories-assets/batch")
+async def save_story_files_details(request):
+    """
+    Registers many uploaded files of a story at once. Request data is '{"story_id": ..., "assets": [file, ...]}'
+    where every file is same as of 'POST /stories-assets'. Assets are saved with one bulk write and their thumbnail
+    tasks are submitted with one batch request.
+    :return: result of every file in order of request
+    """
+    db = request.app["db"]
+
+    data = await request.json()
+
+    story_id = data.get("story_id")
+    if not story_id or not await db.stories.find_one({"_id": story_id}, {"_id": 1}):
+        logger.error("[/stories-assets/batch] [POST]: story_id not provided.")
+        return utils.get_http_error("Requested story not found")
+
+    if not isinstance(data.get("assets"), list) or not data["assets"]:
+        logger.error("[/stories-assets/batch] [POST] [{}]: assets not provided.".format(story_id))
+        return utils.get_http_error("File information not provided.")
+
+    today_date_timestamp = datetime.datetime.now()
+    results = []
+    assetinfos = []
+    for file_data in data["assets"]:
+        assetinfo, err_msg = prepare_assetinfo(file_data if isinstance(file_data, dict) else {}, story_id,
+                                               today_date_timestamp)
+        result = {"asset_id": assetinfo["asset_id"] if assetinfo else None, "ok": False}
+        results.append(result)
+        if err_msg:
+            result["message"] = err_msg
+            continue
+        assetinfos.append(assetinfo)
+
+    if not assetinfos:
+        logger.error("[/stories-assets/batch] [POST] [{}]: No valid file information provided.".format(story_id))
+        return aioweb.json_response({"ok": False, "results": results})
+
+    # saving to db
+    requests = [pymongo.UpdateOne({"_id": assetinfo["asset_id"]}, {"$setOnInsert": assetinfo}, upsert=True)
+                for assetinfo in assetinfos]
+    res = await db.assets.bulk_write(requests, ordered=False)
+    created_indexes = set(res.upserted_ids.keys())
+    created = [assetinfo for index, assetinfo in enumerate(assetinfos) if index in created_indexes]
+    created_ids = {assetinfo["asset_id"] for assetinfo in created}
+    for result in results:
+        if result["asset_id"] in created_ids:
+            result["ok"] = True
+        elif "message" not in result:
+            result["message"] = "Asset already exists"
+
+    logger.info("[/stories-assets/batch] [POST] [{}]: '{}' new files information saved to database."
+                .format(story_id, len(created)))
+
+    # posting proxy tasks
+    if created:
+        task_results = await submit_story_thumbnail_tasks(created, story_id)
+        if task_results is None:
+            logger.error("[/stories-assets/batch] [POST] [{}]: Failed to create thumbnail tasks.".format(story_id))
+    return aioweb.json_response({"ok": bool(created), "results": results})
+
+
 @routes.post("/stories-proxy")
 async def request_story_proxy_creation(request):
     db = request.app["db"]
@@ -944,6 +1630,7 @@ async def request_story_proxy_creation(request):
 
 
 @routes.put("/stories-assets/{asset_id}")
+@dispatch.local
 async def update_story_file_details(request):
     db = request.app["db"]
     '''
@@ -971,19 +1658,27 @@ async def update_story_file_details(request):
         return aioweb.json_response({"ok": False})
 
     # saving to db
-    res = await db.assets.update_one(query, {"$set": assetinfo})
+    updated_asset = await db.assets.find_one_and_update(query, {"$set": assetinfo},
+                                                        projection={"story_id": 1, "lowres_path": 1,
+                                                                    "thumbnail_path": 1},
+                                                        return_document=pymongo.ReturnDocument.AFTER)
 
     # parsing motor response
-    if not res.raw_result["updatedExisting"]:
-        if res.matched_count == 0:
-            logger.error("[/stories] [PUT] [{}]: Requested asset not found.".format(asset_id))
-            return utils.get_http_error("Requested asset not found")
-
-        logger.error("[/stories] [PUT] [{}]: Failed to save to db.".format(asset_id))
-        return utils.get_http_error("Server ran into database error", httperror=aioweb.HTTPInternalServerError)
+    if not updated_asset:
+        logger.error("[/stories] [PUT] [{}]: Requested asset not found.".format(asset_id))
+        return utils.get_http_error("Requested asset not found")
 
     logger.info("[/stories-assets] [PUT] [{}]: Asset information '{}' updated to database."
                 .format(asset_id, assetinfo))
+
+    # asset proxies are published with all proxies ready so far, hence coalesced feeds lose nothing
+    story_id = updated_asset.get("story_id") or utils.get_story_id_of_asset(asset_id)
+    if story_id:
+        asset_ready = dict(asset_id=asset_id, story_id=story_id, state=consts.FILE_STATE_READY,
+                           **prepare_proxy_url(updated_asset.get("lowres_path"), updated_asset.get("thumbnail_path")))
+        request.app["feed_server"].publish("asset-ready", asset_ready,
+                                           [feeds.get_topic(feeds.TOPIC_STORY, story_id)],
+                                           key="asset:{}".format(asset_id), coalesce=True)
     return aioweb.json_response({"ok": True})
 
 
@@ -996,13 +1691,11 @@ async def get_story_all_assets(request):
         logger.error("[/stories-assets] [GET]: story_id not provided.")
         return utils.get_http_error("Story_id not provided")
 
-    assets = []
-    async for asset in db.assets.find({"story_id": story_id}):
-        assets.append(asset)
-    return aioweb.json_response({"assets": assets})
+    return await utils.stream_json_response(request, "assets", db.assets.find({"story_id": story_id}))
 
 
 @routes.get("/version/recent/{story_id}")
+@dispatch.local
 async def get_recent_version_of_story(request):
     """
     Get the recent version of the story
@@ -1010,29 +1703,45 @@ async def get_recent_version_of_story(request):
     :return: The latest story version
     """
     db = request.app['db']
-    # Get the version data from db
     story_id = request.match_info["story_id"]
-    version_info_cursor = db.story_versions.find({"story_id": story_id}, projection={"_id": False}).sort('version_time',-1)
-    # Prepare the version data
     logger.info("Version requested for  : {}".format(story_id))
+
+    # recent version is embedded in story document
+    projection = dict.fromkeys(consts.VERSIONING_KEYS + ["version_time", "version_count"], 1)
+    storyinfo = await db.stories.find_one({"_id": story_id}, projection)
     version_data = dict()
+    if storyinfo and storyinfo.get("version_count"):
+        version_data['total_version_count'] = storyinfo["version_count"]
+        version_data['recent_version'] = {
+            "story_id": story_id,
+            "version_time": storyinfo.get("version_time"),
+            "version_data": {vkey: storyinfo.get(vkey) for vkey in consts.VERSIONING_KEYS}
+        }
+        return aioweb.json_response(version_data)
+
+    # Get the version data from db
+    recent = await db.story_versions.find_one({"story_id": story_id}, {"version_count": 1},
+                                              sort=[("version_count", pymongo.DESCENDING)])
+    # Prepare the version data
     version_data['total_version_count'] = await db.story_versions.count_documents({"story_id": story_id})
-    if version_data['total_version_count']:
-        for v in await version_info_cursor.to_list(length=1):
-            res = v
-        version_data['recent_version'] = res
-    else:
-        version_data['recent_version'] = None
+    version_data['recent_version'] = None
+    if recent:
+        recent_versions = await versions.load_story_versions(db, story_id, recent["version_count"],
+                                                             recent["version_count"])
+        version_data['recent_version'] = recent_versions[-1] if recent_versions else None
     # Return the version data prepared
     logger.info("Version info returning is : {}".format(version_data))
     return aioweb.json_response(version_data)
 
 
 @routes.get("/version/history/{story_id}/{skip_interval}")
+@dispatch.local
 async def get_version_history_of_story(request):
     """
     Get the version history of the story,
-    This is to basically serve you the versions of the story
+    This is to basically serve you the versions of the story, most recent first.
+    Pages are fetched using 'before' cursor returned as 'next_cursor' of previous page. 'skip_interval' is only used
+    when cursor is not provided.
     story_id: The story id being requested for
     :param skip_interval: The no of versions to skip over
     :return: the list of the versions
@@ -1040,31 +1749,50 @@ async def get_version_history_of_story(request):
     db = request.app["db"]
     # Get the version data from db
     story_id = request.match_info["story_id"]
-    skip_interval = int(request.match_info['skip_interval'])
+    try:
+        skip_interval = int(request.match_info['skip_interval'])
+    except ValueError:
+        logger.error("[/version/history] [GET] [{}]: invalid skip interval provided.".format(story_id))
+        return utils.get_http_error("Invalid skip interval provided")
 
     # Prepare the query to fetch details from database
+    query = {"story_id": story_id}
+    if request.rel_url.query.get("before"):
+        page_cursor = utils.decode_page_cursor(request.rel_url.query["before"])
+        if not page_cursor or len(page_cursor) != 1 or not isinstance(page_cursor[0], int):
+            logger.error("[/version/history] [GET] [{}]: invalid page cursor provided.".format(story_id))
+            return utils.get_http_error("Invalid page cursor provided")
+        query["version_count"] = {"$lt": page_cursor[0]}
+        skip_interval = 0
+
+    # version counts of the page
+    counts_cursor = db.story_versions.find(query, {"_id": 0, "version_count": 1})\
+        .sort("version_count", pymongo.DESCENDING)
     if skip_interval:
-        version_info = db.story_versions.find({"story_id": story_id},projection={"_id": False}).\
-                                               sort("version_time", -1).\
-                                               skip(skip_interval)
-    else:
-        version_info = db.story_versions.find({"story_id": story_id},{"_id": 0}). \
-                                               sort("version_time", -1)
+        counts_cursor = counts_cursor.skip(skip_interval)
+    version_counts = [version["version_count"] for version in
+                      await counts_cursor.limit(consts.VERSIONS_PER_PAGE).to_list(length=consts.VERSIONS_PER_PAGE)]
 
     # Prepare the version data to be sent
     version_data = {}
-    if version_info:
-        version_data['total_version_count'] = await db.story_versions.count_documents({"story_id": story_id})
-        version_data['skip'] = skip_interval
-        version_data['version_history'] = [ item for item in await version_info.limit(consts.VERSIONS_PER_PAGE).to_list(length=consts.VERSIONS_PER_PAGE)]
+    storyinfo = await db.stories.find_one({"_id": story_id}, {"version_count": 1})
+    if storyinfo and "version_count" in storyinfo:
+        version_data['total_version_count'] = storyinfo["version_count"]
     else:
-        version_data['total_version_count'] = 0
-        version_data['skip'] = skip_interval
-        version_data['version_history'] = []
+        version_data['total_version_count'] = await db.story_versions.count_documents({"story_id": story_id})
+    version_data['skip'] = skip_interval
+    version_data['version_history'] = []
+    version_data['next_cursor'] = None
+    if version_counts:
+        story_versions = await versions.load_story_versions(db, story_id, version_counts[-1], version_counts[0])
+        version_data['version_history'] = list(reversed(story_versions))
+        if len(version_counts) == consts.VERSIONS_PER_PAGE:
+            version_data['next_cursor'] = utils.encode_page_cursor(version_counts[-1])
     return aioweb.json_response(version_data)
 
 
 @routes.post("/version")
+@dispatch.local
 async def create_new_version_of_story(request):
     """
     When the user updates the story, create an new version with that story_id
@@ -1081,11 +1809,8 @@ async def create_new_version_of_story(request):
         logger.error("[/version] [POST] version_data not provided")
         return utils.get_http_error("Version data not found")
 
-    # Preparing the data to be inserted into story_versions
-    version_info = {}
-    version_info['story_id'] = data["story_id"]
-    version_info["version_time"] = datetime.datetime.now().strftime(consts.VERSION_TIME_FORMAT)
-    version_info['version_data'] = data["version_data"]
-    resp = await db.story_versions.insert_one(version_info)
-    logger.info("[/version] [POST] Version inserted is : {}".format(resp))
-    return aioweb.json_response({"ok": True})
+    # saving version and updating recent version snapshot of story
+    version_info = await save_story_version(db, data["story_id"], data["version_data"])
+    logger.info("[/version] [POST] Version inserted is : {}".format(version_info))
+    return aioweb.json_response({"ok": True, "story_id": version_info["story_id"],
+                                 "version_time": version_info["version_time"]})
@@ -11,13 +11,21 @@
 """
 import os
 import datetime
+import pymongo
 from aiohttp import web as aioweb
 import server.commons.utils as utils
+import server.request.dispatch as dispatch
+import server.request.feeds as feeds
 from server.request import logger
 # shares all rest api routes are added to this table
 
 routes = aioweb.RouteTableDef()
 
+indexes = {
+    "streams": [pymongo.IndexModel([("name", pymongo.ASCENDING), ("status", pymongo.ASCENDING)],
+                                   name="name_status")]
+}
+
 
 def move_stream_to_recordings(stream_name, recording_path):
     """
@@ -72,6 +80,7 @@ def prepare_stream(stream_prefix_url=None,
 
 
 @routes.get("/streams")
+@dispatch.local
 async def get_streams(request):
     """
     Returns the details of the streams live and available
@@ -154,7 +163,8 @@ async def create_stream(request):
         logger.error("[/streams] [POST] [{}]: Failed to save to db.".format(stream_name))
         return utils.get_http_error("Server ran into database error")
 
-    await utils.push_feed(msg='stream-started', data=stream)
+    request.app['feed_server'].publish('stream-started', stream,
+                                       [feeds.get_topic(feeds.TOPIC_STREAM, stream_name)])
     logger.info("[/streams] POST : Stream entry created successfully. {}".format(stream_name))
     return aioweb.json_response({"stream_name": stream_name, "ok": True})
 
@@ -198,5 +208,5 @@ async def delete_stream(request):
 
     stream = prepare_stream(stream_prefix_url=request.app["stream_url_prefix"], 
                             name=stream_name)
-    await utils.push_feed(msg='stream-ended', data=stream)
+    request.app['feed_server'].publish('stream-ended', stream, [feeds.get_topic(feeds.TOPIC_STREAM, stream_name)])
     return aioweb.json_response({"stream_name": stream_name, "ok": True})
@@ -4,6 +4,7 @@ This module is responsible for all task related operations
 
 import json
 import datetime
+import pymongo
 from aiohttp import web as aioweb
 
 # importing logger
@@ -12,11 +13,34 @@ from server.commons import session
 
 import server.commons.constants as consts
 import server.commons.utils as utils
+import server.request.dispatch as dispatch
+import server.request.feeds as feeds
+
+
+def publish_task_progress(app, task_id, taskinfo):
+    """
+    Publishes progress of a task on topic of its story and on topic of user who uploads, whichever are known.
+    Progress of a task is coalesced, so clients receive at most one progress feed of a task per coalesce window.
+    """
+    data = taskinfo.get("data") or {}
+    story_id = data.get("story_id") or utils.get_story_id_of_asset(data.get("asset_id"))
+    topics = []
+    if story_id:
+        topics.append(feeds.get_topic(feeds.TOPIC_STORY, story_id))
+    if data.get("user_id"):
+        topics.append(feeds.get_topic(feeds.TOPIC_USER, data["user_id"]))
+    if not topics:
+        return
+
+    progress = {"task_id": task_id, "task_name": taskinfo.get("task_name"), "story_id": story_id,
+                "asset_id": data.get("asset_id"), "status": taskinfo.get("status"),
+                "progress": taskinfo.get("progress"), "bandwidth": taskinfo.get("bandwidth")}
+    app["feed_server"].publish("task-progress", progress, topics, key="task:{}".format(task_id), coalesce=True)
 
 
 async def get_story_info(story_id):
     url = utils.get_request_server_url("stories/{}".format(story_id))
-    resp = await session.get(url)
+    resp = await dispatch.client.get(url)
     return await resp.json() if resp.status is 200 else None
 
 
@@ -26,17 +50,94 @@ async def send_command_to_taskserver(taskinfo):
     return await resp.json() if resp.status is 200 else None
 
 
+async def send_commands_to_taskserver(tasks):
+    url = utils.get_task_server_url("tasks/batch")
+    resp = await session.post(url, data=json.dumps({"tasks": tasks}))
+    return await resp.json() if resp.status is 200 else None
+
+
+def prepare_proxy_taskinfo(data, task_id):
+    """
+    Validates lowres or thumbnail task information
+    :return: tuple of task information and error message. Task information is None if data is invalid.
+    """
+    task_name = data.get("task_name")
+    taskinfo = {}
+    if not data.get("asset_id"):
+        return None, "asset id not provided"
+    taskinfo["asset_id"] = data["asset_id"]
+
+    # share_id
+    if not data.get("share_id"):
+        return None, "share_id not provided"
+    taskinfo["share_id"] = data["share_id"]
+
+    # proxy_share_id
+    if not data.get("proxy_share_id"):
+        return None, "proxy_share_id not provided"
+    taskinfo["proxy_share_id"] = data["proxy_share_id"]
+
+    # media_path
+    if not data.get("path"):
+        return None, "media path not provided"
+    taskinfo["media_path"] = data["path"]
+
+    # proxy file path
+    if task_name == consts.TASK_GENERATE_LOWRES:
+        if not data.get("lowres_path"):
+            return None, "Lowres path not provided"
+        taskinfo["lowres_path"] = data["lowres_path"]
+
+    elif task_name == consts.TASK_GENERATE_THUMBNAIL:
+        if not data.get("thumbnail_path"):
+            return None, "Thumbnail path not provided"
+        taskinfo["thumbnail_path"] = data["thumbnail_path"]
+
+    else:
+        return None, "Invalid proxy task name provided"
+
+    taskinfo["task_id"] = task_id
+    taskinfo["task_name"] = task_name
+    return taskinfo, None
+
+
+def prepare_task_document(task_id, task_name, taskinfo):
+    dt_ = datetime.datetime.now()
+    return {
+        "_id": task_id,
+        "task_name": task_name,
+        "status": consts.STATE_NEW,
+        "progress": 0,
+        "bandwidth": 0,
+        "created_datetime": dt_.strftime(consts.DATETIME_FORMAT),
+        "created_date": dt_.strftime(consts.DATE_FORMAT),
+        "updated_datetime": dt_.strftime(consts.DATETIME_FORMAT),
+        "data": taskinfo
+    }
+
+
 async def send_proxy_path_to_reqserver(asset_id, proxyinfo):
     url = utils.get_request_server_url("stories-assets/{}".format(asset_id))
-    resp = await session.put(url, data=json.dumps(proxyinfo))
+    resp = await dispatch.client.put(url, data=json.dumps(proxyinfo))
     return await resp.json() if resp.status is 200 else None
 
+# ------------------ Indexes ------------------
+
+indexes = {
+    "tasks": [
+        pymongo.IndexModel([("status", pymongo.ASCENDING)], name="status"),
+        pymongo.IndexModel([("created_date", pymongo.ASCENDING)], name="created_date"),
+        pymongo.IndexModel([("data.story_id", pymongo.ASCENDING)], name="story_id")
+    ]
+}
+
 # ------------------ API's to manage tasks ------------------
 
 routes = aioweb.RouteTableDef()
 
 
 @routes.post("/tasks")
+@dispatch.local
 async def create_new_task(request):
     db = request.app["db"]
     data = await request.json()
@@ -56,6 +157,9 @@ async def create_new_task(request):
         # story_id
         taskinfo["story_id"] = story_id
 
+        # user who transfers the file, progress of the task is published to this user
+        taskinfo["user_id"] = data.get("user_id") or (storyinfo.get("user_info") or {}).get("_id")
+
         # file_name
         if not data.get("file_name"):
             logger.error("[/tasks] [POST] [story_id({})]: file_name not provided.".format(story_id))
@@ -92,48 +196,10 @@ async def create_new_task(request):
 
     elif task_name in [consts.TASK_GENERATE_LOWRES, consts.TASK_GENERATE_THUMBNAIL]:
         asset_id = data.get("asset_id")
-        if not asset_id:
-            logger.error("[/tasks] [POST]: asset_id not provided.")
-            return utils.get_http_error("asset id not provided")
-        taskinfo["asset_id"] = asset_id
-
-        # share_id
-        if not data.get("share_id"):
-            logger.error("[/tasks] [POST] [asset_id({})]: share_id not provided.".format(asset_id))
-            return utils.get_http_error("share_id not provided")
-        taskinfo["share_id"] = data["share_id"]
-
-        # proxy_share_id
-        if not data.get("proxy_share_id"):
-            logger.error("[/tasks] [POST] [asset_id({})]: proxy_share_id not provided.".format(asset_id))
-            return utils.get_http_error("proxy_share_id not provided")
-        taskinfo["proxy_share_id"] = data["proxy_share_id"]
-
-        # media_path
-        if not data.get("path"):
-            logger.error("[/tasks] [POST] [asset_id({})]: media path not provided.".format(asset_id))
-            return utils.get_http_error("media path not provided")
-        taskinfo["media_path"] = data["path"]
-
-        # task_id and proxy file path
-        if task_name == consts.TASK_GENERATE_LOWRES:
-            if not data.get("lowres_path"):
-                logger.error("[/tasks] [POST] [asset_id({})]: lowres_path not provided.".format(asset_id))
-                return utils.get_http_error("Lowres path not provided")
-            taskinfo["lowres_path"] = data["lowres_path"]
-
-            #task_id = utils.generate_hex_id(asset_id, task_name, data["lowres_path"])
-
-        elif task_name == consts.TASK_GENERATE_THUMBNAIL:
-            if not data.get("thumbnail_path"):
-                logger.error("[/tasks] [POST] [asset_id({})]: thumbnail_path not provided.".format(asset_id))
-                return utils.get_http_error("Thumbnail path not provided")
-            taskinfo["thumbnail_path"] = data["thumbnail_path"]
-
-            #task_id = utils.generate_hex_id(asset_id, task_name, data["thumbnail_path"])
-
-        taskinfo["task_id"] = task_id
-        taskinfo["task_name"] = task_name
+        taskinfo, err_msg = prepare_proxy_taskinfo(data, task_id)
+        if err_msg:
+            logger.error("[/tasks] [POST] [asset_id({})]: {}.".format(asset_id, err_msg))
+            return utils.get_http_error(err_msg)
 
         # sending proxy command to taskserver
         resp = await send_command_to_taskserver(taskinfo)
@@ -143,18 +209,7 @@ async def create_new_task(request):
 
     if taskinfo and task_id and task_name:
 
-        dt_ = datetime.datetime.now()
-        task = {
-            "_id": task_id,
-            "task_name": task_name,
-            "status": consts.STATE_NEW,
-            "progress": 0,
-            "bandwidth": 0,
-            "created_datetime": dt_.strftime(consts.DATETIME_FORMAT),
-            "created_date": dt_.strftime(consts.DATE_FORMAT),
-            "updated_datetime": dt_.strftime(consts.DATETIME_FORMAT),
-            "data": taskinfo
-        }
+        task = prepare_task_document(task_id, task_name, taskinfo)
 
         # saving to db
         res = await db.tasks.update_one({"_id": task_id}, {"$setOnInsert": task}, upsert=True)
@@ -175,6 +230,55 @@ async def create_new_task(request):
     return utils.get_http_error("Not enough parameters provided to create task")
 
 
+@routes.post("/tasks/batch")
+@dispatch.local
+async def create_new_proxy_tasks(request):
+    """
+    Creates many lowres or thumbnail tasks at once. Request data is '{"tasks": [task, ...]}' where every task is same
+    as of 'POST /tasks'. Tasks are saved with one bulk insert and submitted to TaskServer with one batch request.
+    :return: result of every task in order of request
+    """
+    db = request.app["db"]
+    data = await request.json()
+
+    if not isinstance(data.get("tasks"), list) or not data["tasks"]:
+        logger.error("[/tasks/batch] [POST]: tasks not provided.")
+        return utils.get_http_error("Tasks not provided")
+
+    results = []
+    tasks = []
+    for task_data in data["tasks"]:
+        task_id = utils.generate_random_id()
+        taskinfo, err_msg = prepare_proxy_taskinfo(task_data if isinstance(task_data, dict) else {}, task_id)
+        if err_msg:
+            logger.error("[/tasks/batch] [POST]: {}.".format(err_msg))
+            results.append({"ok": False, "message": err_msg})
+            continue
+        results.append({"ok": True, "task_id": task_id})
+        tasks.append(prepare_task_document(task_id, taskinfo["task_name"], taskinfo))
+
+    if not tasks:
+        return aioweb.json_response({"ok": False, "results": results})
+
+    # saving tasks before submitting so that TaskServer status updates always find their task
+    await db.tasks.insert_many(tasks, ordered=False)
+
+    # sending proxy commands to taskserver
+    resp = await send_commands_to_taskserver([task["data"] for task in tasks])
+    submitted = {result["task_id"] for result in (resp or {}).get("results", []) if result.get("ok")}
+    failed_ids = [task["_id"] for task in tasks if task["_id"] not in submitted]
+    if failed_ids:
+        logger.error("[/tasks/batch] [POST]: Failed to post '{}' proxy tasks to TaskServer.".format(len(failed_ids)))
+        await db.tasks.update_many({"_id": {"$in": failed_ids}}, {"$set": {"status": consts.STATE_FAILED}})
+        for result in results:
+            if result.get("task_id") in failed_ids:
+                result["ok"] = False
+                result["message"] = "failed to submit proxy task to TaskServer"
+
+    logger.info("[/tasks/batch] [POST]: '{}' proxy tasks created successfully.".format(len(tasks) - len(failed_ids)))
+    return aioweb.json_response({"ok": len(failed_ids) < len(tasks), "results": results})
+
+
 @routes.put("/tasks-status/{task_id}")
 async def update_task_status(request):
     db = request.app["db"]
@@ -236,11 +340,16 @@ async def update_task_status(request):
     # updating status to db
     if updateinfo:
         # updating status to db
-        res = await db.tasks.update_one(query, {"$set": updateinfo})
+        taskinfo = await db.tasks.find_one_and_update(query, {"$set": updateinfo},
+                                                      projection={"task_name": 1, "status": 1, "progress": 1,
+                                                                  "bandwidth": 1, "data.story_id": 1,
+                                                                  "data.asset_id": 1, "data.user_id": 1},
+                                                      return_document=pymongo.ReturnDocument.AFTER)
 
         # parsing motor response
-        if res.raw_result["updatedExisting"]:
+        if taskinfo:
             logger.debug("[/tasks-status] [PUT] [{}]: Task status '{}' updated to db successfully.".format(task_id, updateinfo))
+            publish_task_progress(request.app, task_id, taskinfo)
             return aioweb.json_response({"ok": True})
 
     logger.error("[/tasks-status] [PUT] [{}]: Failed update task status '{}' to db.".format(task_id, updateinfo))
@@ -305,11 +414,8 @@ async def get_all_tasks(request):
     if search_filter.get("file_name"):
         query["data.file_name"] = {"$regex": ".*{}.*".format(search_filter["file_name"]), "$options": "i"}
 
-    # retrieving tasks
-    tasks = []
-    async for task in db.tasks.find(query):
-        tasks.append(task)
-    return aioweb.json_response({"tasks": tasks})
+    # streaming tasks
+    return await utils.stream_json_response(request, "tasks", db.tasks.find(query))
 
 
 @routes.delete("/tasks/{task_id}")
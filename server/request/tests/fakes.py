@@ -0,0 +1,64 @@
+"""
+Collections standing in for motor collections in tests. Writes are recorded as they are requested, so that tests
+assert on the public arguments of requests instead of applying them.
+"""
+
+
+class RecordingCollection:
+    """
+    Records write calls and answers 'find_one' and 'find_one_and_update' by '_id' from given documents. Index creation fails with 'error' if
+    given.
+    """
+    def __init__(self, documents=None, indexes=None, error=None):
+        self.documents = documents or {}
+        self.indexes = indexes or {}
+        self.error = error
+        self.calls = []
+
+    async def bulk_write(self, requests, ordered=True):
+        self.calls.append(("bulk_write", list(requests)))
+
+    async def insert_one(self, document):
+        self.calls.append(("insert_one", document))
+
+    async def update_one(self, query, update, upsert=False):
+        self.calls.append(("update_one", query, update, upsert))
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        """
+        Records the update and answers the document stored for '_id', which is the document after update in tests
+        """
+        self.calls.append(("find_one_and_update", query, update, upsert))
+        return await self.find_one(query)
+
+    async def index_information(self):
+        return dict(self.indexes)
+
+    async def create_indexes(self, models):
+        self.calls.append(("create_indexes", [model.document["name"] for model in models]))
+        if self.error is not None:
+            raise self.error
+
+    async def drop_index(self, name):
+        self.calls.append(("drop_index", name))
+
+    async def find_one(self, query, *args, **kwargs):
+        document = self.documents.get(query.get("_id"))
+        return dict(document) if document is not None else None
+
+    async def count_documents(self, query):
+        self.calls.append(("count_documents", query))
+        return 0
+
+
+class RecordingDb(dict):
+    """
+    Database of recording collections which are created on first access
+    """
+    def __getitem__(self, name):
+        if name not in self:
+            self[name] = RecordingCollection()
+        return super().__getitem__(name)
+
+    def __getattr__(self, name):
+        return self[name]
@@ -0,0 +1,41 @@
+#!/usr/bin/python3.6
+import sys
+import json
+import asyncio
+if "../../.." not in sys.path:
+    sys.path.append("../../..")
+
+import server.commons.cache as cache
+from server.request import admin, dispatch
+
+
+def get_cache_stats():
+    response = asyncio.get_event_loop().run_until_complete(admin.get_cache_stats(None))
+    assert response.status == 200
+    return {stats["name"]: stats for stats in json.loads(response.text)["caches"]}
+
+
+def test_cache_stats_route():
+    before = get_cache_stats()
+    assert {"categories", "tags", "users", "shares", "story_details"} <= set(before.keys())
+
+    cache.tags.set("sports", {"_id": "sports"})
+    cache.tags.get("sports")
+    cache.tags.get("politics")
+    after = get_cache_stats()
+    assert after["tags"]["hits"] == before["tags"]["hits"] + 1
+    assert after["tags"]["misses"] == before["tags"]["misses"] + 1
+    cache.tags.invalidate()
+
+
+def test_dispatch_stats_route():
+    dispatch.client.local_calls += 1
+    response = asyncio.get_event_loop().run_until_complete(admin.get_dispatch_stats(None))
+    assert json.loads(response.text) == dispatch.client.stats()
+    assert json.loads(response.text)["local_calls"] >= 1
+
+
+if __name__ == "__main__":
+    test_cache_stats_route()
+    test_dispatch_stats_route()
+    print("test_admin PASSED.")
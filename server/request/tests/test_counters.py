@@ -0,0 +1,74 @@
+#!/usr/bin/python3.6
+import sys
+import asyncio
+if "../../.." not in sys.path:
+    sys.path.append("../../..")
+
+import pymongo
+
+from server.request import counters
+import fakes
+
+
+def get_story(tags, archived=False):
+    return {"agency_id": "PTI", "agency_key": "pti", "category_id": "sports", "created_date": "2019-01-02",
+            "tags": tags, "review_status": {"reviewed": False}, "archived": archived}
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def test_counter_entries():
+    assert counters.get_counter_id("pti") == "pti"
+    assert counters.get_counter_id("pti", "tags", "cricket") == "pti|tags|cricket"
+    assert set(counters.get_story_counter_entries(get_story(["cricket", "cricket"]))) == {
+        ("pti", None, None), ("pti", "category_id", "sports"), ("pti", "created_date", "2019-01-02"),
+        ("pti", "tags", "cricket"), ("pti", "review_status.reviewed", False), ("pti", "archived", False)}
+    assert counters.get_story_counter_entries(None) == []
+
+
+def test_counter_steps():
+    story = get_story(["cricket"])
+    created = counters.get_counter_steps(new_story=story)
+    assert created[("pti", None, None)] == 1 and set(created.values()) == {1}
+    deleted = counters.get_counter_steps(old_story=story)
+    assert deleted == {entry: -1 for entry in created}
+
+    # update moves story between counters of changed fields only
+    updated = counters.get_counter_steps(story, get_story(["football"], archived=True))
+    assert updated == {("pti", "tags", "cricket"): -1, ("pti", "tags", "football"): 1,
+                       ("pti", "archived", False): -1, ("pti", "archived", True): 1}
+
+
+def test_counter_writes():
+    db = fakes.RecordingDb()
+    run(counters.write_counter_steps(db, {("pti", "tags", "cricket"): -1}))
+    run(counters.write_counter_steps(db, {}))
+    assert db.story_counters.calls == [("bulk_write", [pymongo.UpdateOne(
+        {"_id": "pti|tags|cricket"},
+        {"$inc": {"count": -1}, "$setOnInsert": {"agency": "pti", "field": "tags", "value": "cricket"}},
+        upsert=True)])]
+
+
+def test_story_count_uses_counters():
+    db = fakes.RecordingDb(story_counters=fakes.RecordingCollection({"pti": {"count": 2},
+                                                                     "pti|tags|cricket": {"count": 1}}))
+    query = {"agency_key": "pti", "tags": {"$in": ["cricket"]}}
+    assert run(counters.get_story_count(db, "PTI", query)) == 1
+    assert run(counters.get_story_count(db, "PTI", {"agency_key": "pti"})) == 2
+    assert run(counters.get_story_count(db, "AFP", {"agency_key": "afp"})) == 0
+    assert db.stories.calls == []
+
+    # queries on more than one counted field are counted
+    query = {"agency_key": "pti", "tags": {"$in": ["cricket"]}, "archived": False}
+    run(counters.get_story_count(db, "PTI", query))
+    assert db.stories.calls == [("count_documents", query)]
+
+
+if __name__ == "__main__":
+    test_counter_entries()
+    test_counter_steps()
+    test_counter_writes()
+    test_story_count_uses_counters()
+    print("test_counters PASSED.")
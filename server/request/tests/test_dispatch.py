@@ -0,0 +1,107 @@
+#!/usr/bin/python3.6
+import sys
+import json
+import asyncio
+import types
+if "../../.." not in sys.path:
+    sys.path.append("../../..")
+
+from aiohttp import web as aioweb
+from yarl import URL
+
+import server.commons.utils as utils
+from server.request import dispatch
+
+routes = aioweb.RouteTableDef()
+
+
+@routes.get("/items/search")
+@dispatch.local
+async def search_items(request):
+    return aioweb.json_response({"route": "search", "query": dict(request.rel_url.query)})
+
+
+@routes.get("/items/{item_id}")
+@dispatch.local
+async def get_item(request):
+    return aioweb.json_response({"route": "get", "item_id": request.match_info["item_id"],
+                                 "app": request.app["name"]})
+
+
+@routes.put("/items/{item_id}")
+@dispatch.local
+async def update_item(request):
+    data = await request.json()
+    return aioweb.json_response({"route": "put", "item_id": request.match_info["item_id"], "data": data})
+
+
+@routes.delete("/items/{item_id}")
+@dispatch.local
+async def delete_item(request):
+    raise utils.get_http_error("Item not found", httperror=aioweb.HTTPNotFound)
+
+
+@routes.post("/items/{item_id}/fail")
+@dispatch.local
+async def fail_item(request):
+    raise KeyError("item_id")
+
+
+@routes.get("/items-stream")
+async def stream_items(request):
+    return aioweb.json_response([])
+
+
+def get_client():
+    client = dispatch.DispatchClient()
+    client.attach({"name": "test"}, [types.SimpleNamespace(routes=routes)])
+    return client
+
+
+def get_url(path):
+    return URL(utils.get_request_server_url(path))
+
+
+def test_resolve():
+    client = get_client()
+    handler, match_info, route_path = client.resolve("GET", get_url("items/42"))
+    assert handler is get_item and match_info == {"item_id": "42"} and route_path == "/items/{item_id}"
+    # routes are matched in order of registration
+    assert client.resolve("GET", get_url("items/search"))[0] is search_items
+    assert client.resolve("PUT", get_url("items/42"))[0] is update_item
+    # handlers which are not local, unknown methods and paths and other servers are served over HTTP
+    assert client.resolve("GET", get_url("items-stream")) is None
+    assert client.resolve("POST", get_url("items/42")) is None
+    assert client.resolve("GET", get_url("items/42/other")) is None
+    assert client.resolve("GET", URL(utils.get_task_server_url("items/42"))) is None
+    assert dispatch.DispatchClient().resolve("GET", get_url("items/42")) is None
+
+
+def test_local_requests():
+    client = get_client()
+    loop = asyncio.get_event_loop()
+
+    response = loop.run_until_complete(client.get(get_url("items/42"), params={"unused": "1"}))
+    assert response.status == 200
+    assert loop.run_until_complete(response.json()) == {"route": "get", "item_id": "42", "app": "test"}
+
+    response = loop.run_until_complete(client.get(get_url("items/search"), params={"text": "a b", "page": "2"}))
+    assert loop.run_until_complete(response.json())["query"] == {"text": "a b", "page": "2"}
+
+    response = loop.run_until_complete(client.put(get_url("items/42"), data=json.dumps({"name": "item"})))
+    assert loop.run_until_complete(response.json())["data"] == {"name": "item"}
+
+    response = loop.run_until_complete(client.delete(get_url("items/42")))
+    assert response.status == 404
+    assert loop.run_until_complete(response.json())["message"] == "Item not found"
+
+    # unhandled errors are answered with 500 same as over HTTP
+    response = loop.run_until_complete(client.post(get_url("items/42/fail")))
+    assert response.status == 500
+    assert client.stats() == {"local_calls": 5, "http_calls": 0}
+
+
+if __name__ == "__main__":
+    test_resolve()
+    test_local_requests()
+    print("test_dispatch PASSED.")
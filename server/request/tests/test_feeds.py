@@ -0,0 +1,326 @@
+#!/usr/bin/python3.6
+import sys
+import json
+import asyncio
+if "../../.." not in sys.path:
+    sys.path.append("../../..")
+
+from server.request import feeds
+from server.request import stories
+
+import fakes
+
+
+class FeedApp(dict):
+    def __init__(self):
+        super().__init__()
+        self.on_startup = []
+        self.on_cleanup = []
+
+
+class FeedSocket:
+    def __init__(self):
+        self.closed = False
+        self.sent = []
+
+    async def send_str(self, data):
+        self.sent.append(json.loads(data))
+
+    async def close(self):
+        self.closed = True
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def get_feed(message, seq, data=None):
+    return json.dumps({"message": message, "data": data or {}, "seq": seq})
+
+
+def stop(server):
+    for clients in list(server.websockets.values()):
+        for client in list(clients.values()):
+            server.unregister(client.user_id, client.ws)
+    run(flush())
+
+
+async def flush():
+    # lets writer tasks of clients send queued feeds
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_opt_in_feeds():
+    server = feeds.FeedServer(FeedApp())
+    legacy_ws, story_ws = FeedSocket(), FeedSocket()
+    server.register("user", legacy_ws)
+    server.register("user", story_ws, ["story:story"])
+
+    for seq, message in enumerate(["story-updated", "asset-ready", "task-progress"], start=1):
+        topics = feeds.get_feed_topics({"message": message}, ["story:story"])
+        server.deliver(seq, topics, get_feed(message, seq))
+    run(flush())
+    assert [feed["message"] for feed in legacy_ws.sent] == ["story-updated"]
+    assert [feed["message"] for feed in story_ws.sent] == ["story-updated", "asset-ready", "task-progress"]
+    stop(server)
+
+
+def test_batch_created_stories():
+    server = feeds.FeedServer(FeedApp())
+    legacy_ws, agency_ws = FeedSocket(), FeedSocket()
+    server.register("user", legacy_ws)
+    server.register("user", agency_ws, ["agency:AP"])
+
+    stories.publish_created_stories(server, [{"_id": "a", "agency_id": "AP"}, {"_id": "b", "agency_id": "ap"}])
+    seq = 0
+    while not server.feeds.empty():
+        feed, topics, key = server.feeds.get_nowait()
+        seq += 1
+        server.deliver(seq, feeds.get_feed_topics(feed, topics), json.dumps(dict(feed, seq=seq)))
+    run(flush())
+    # clients which do not subscribe to topics still receive every story, and only once
+    assert [(feed["message"], feed["data"]["_id"]) for feed in legacy_ws.sent] == \
+        [("story-created", "a"), ("story-created", "b")]
+    assert [feed["message"] for feed in agency_ws.sent] == ["stories-created"]
+    assert [story["_id"] for story in agency_ws.sent[0]["data"]["stories"]] == ["a", "b"]
+    stop(server)
+
+
+def deliver_story_feeds(server, first_seq, last_seq):
+    for seq in range(first_seq, last_seq + 1):
+        story_id = "a" if seq % 2 else "b"
+        server.deliver(seq, ["story:" + story_id, feeds.ALL_TOPICS], get_feed("story-updated", seq, {"_id": story_id}))
+
+
+def test_replay_since():
+    server = feeds.FeedServer(FeedApp())
+    deliver_story_feeds(server, 1, 6)
+
+    all_ws, story_ws, current_ws = FeedSocket(), FeedSocket(), FeedSocket()
+    server.register("user", all_ws, since=2)
+    server.register("user", story_ws, ["story:a"], since=2)
+    server.register("user", current_ws, since=6)
+    deliver_story_feeds(server, 7, 7)
+    run(flush())
+    # missed feeds of subscribed topics are sent before live feeds
+    assert [feed["seq"] for feed in all_ws.sent] == [3, 4, 5, 6, 7]
+    assert [feed["seq"] for feed in story_ws.sent] == [3, 5, 7]
+    assert [feed["seq"] for feed in current_ws.sent] == [7]
+    stop(server)
+
+
+def test_replay_unavailable():
+    server = feeds.FeedServer(FeedApp())
+    deliver_story_feeds(server, 1, feeds.FEED_REPLAY_SIZE + 10)
+    latest = feeds.FEED_REPLAY_SIZE + 10
+
+    old_ws, oldest_ws, future_ws = FeedSocket(), FeedSocket(), FeedSocket()
+    # feeds after 5 are partly dropped from replay buffer
+    server.register("user", old_ws, since=5)
+    # all feeds after 10 are still buffered
+    server.register("user", oldest_ws, since=10)
+    # sequence not yet published
+    server.register("user", future_ws, since=latest + 1)
+    run(flush())
+    assert old_ws.sent == [{"message": "replay-unavailable", "data": {"seq": latest}}]
+    assert future_ws.sent == [{"message": "replay-unavailable", "data": {"seq": latest}}]
+    assert len(oldest_ws.sent) == feeds.FEED_REPLAY_SIZE and oldest_ws.sent[0]["seq"] == 11
+    stop(server)
+
+
+class EventCursor:
+    """
+    Tailable cursor which dies after returning the events written so far
+    """
+    def __init__(self, events):
+        self.events = events
+        self.alive = True
+
+    def __aiter__(self):
+        return self.iterate().__aiter__()
+
+    async def iterate(self):
+        for event in self.events:
+            yield event
+        self.alive = False
+
+
+class EventCollection:
+    """
+    Capped collection returning events in order they were written
+    """
+    def __init__(self):
+        self.events = []
+
+    def write(self, seq, message):
+        self.events.append({"seq": seq, "topics": [feeds.ALL_TOPICS], "feed": get_feed(message, seq)})
+
+    def find(self, query, cursor_type=None):
+        return EventCursor([event for event in self.events if event["seq"] > query["seq"]["$gt"]])
+
+
+def test_interleaved_writes():
+    events = EventCollection()
+    server = feeds.FeedServer(FeedApp())
+    server.db = {feeds.FEED_EVENTS_COLLECTION: events}
+    live_ws = FeedSocket()
+    server.register("user", live_ws)
+
+    async def tail_interleaved_writes():
+        feeds.FEED_TAIL_RETRY_INTERVAL = 0
+        tail_task = asyncio.ensure_future(server.tail_feeds())
+        # sequence 2 is taken by one process and 3 by another, which writes its feed first
+        events.write(1, "story-created")
+        events.write(3, "story-updated")
+        await flush()
+        events.write(2, "stream-started")
+        await flush()
+        tail_task.cancel()
+        await asyncio.gather(tail_task, return_exceptions=True)
+
+    retry_interval = feeds.FEED_TAIL_RETRY_INTERVAL
+    try:
+        run(tail_interleaved_writes())
+    finally:
+        feeds.FEED_TAIL_RETRY_INTERVAL = retry_interval
+    # feeds are delivered once each in order they were written
+    assert [feed["seq"] for feed in live_ws.sent] == [1, 3, 2]
+    assert server.sequence == 2
+
+    # replay resumes from position of feed 'since' in order of delivery
+    replay_ws, latest_ws = FeedSocket(), FeedSocket()
+    server.register("user", replay_ws, since=3)
+    server.register("user", latest_ws, since=2)
+    run(flush())
+    assert [feed["seq"] for feed in replay_ws.sent] == [2]
+    assert latest_ws.sent == []
+    stop(server)
+
+
+def apply_json_patch(document, operations):
+    for operation in operations:
+        keys = [key.replace("~1", "/").replace("~0", "~") for key in operation["path"].split("/")[1:]]
+        if not keys:
+            document = operation["value"]
+            continue
+        parent = document
+        for key in keys[:-1]:
+            parent = parent[key]
+        if operation["op"] == "remove":
+            del parent[keys[-1]]
+        else:
+            parent[keys[-1]] = operation["value"]
+    return document
+
+
+def test_json_patch():
+    old = {"title": "old", "tags": ["a", "b"], "status": {"reviewed": False, "by": "user"}, "a/b": 1, "count": 1}
+    new = {"title": "new", "tags": ["a"], "status": {"reviewed": True}, "a/b": 2, "count": True, "asset": {"id": 1}}
+    operations = feeds.get_json_patch(old, new)
+    assert sorted(operations, key=lambda operation: operation["path"]) == [
+        {"op": "add", "path": "/asset", "value": {"id": 1}},
+        {"op": "replace", "path": "/a~1b", "value": 2},
+        {"op": "replace", "path": "/count", "value": True},
+        {"op": "remove", "path": "/status/by"},
+        {"op": "replace", "path": "/status/reviewed", "value": True},
+        {"op": "replace", "path": "/tags", "value": ["a"]},
+        {"op": "replace", "path": "/title", "value": "new"}]
+    assert apply_json_patch(json.loads(json.dumps(old)), operations) == new
+
+    assert feeds.get_json_patch(old, json.loads(json.dumps(old))) == []
+    assert feeds.get_json_patch({"a": 1}, [1]) == [{"op": "replace", "path": "", "value": [1]}]
+
+
+def get_entity_feed(seq, title):
+    return json.dumps({"message": "story-updated", "data": {"title": title}, "key": "story:a", "seq": seq})
+
+
+def test_patch_feeds():
+    server = feeds.FeedServer(FeedApp())
+    first_ws, late_ws, full_ws = FeedSocket(), FeedSocket(), FeedSocket()
+    server.register("user", first_ws, ["story:a"], patches=True)
+    server.register("user", full_ws, ["story:a"])
+
+    server.deliver(1, ["story:a"], get_entity_feed(1, "old"), "story:a")
+    server.register("user", late_ws, ["story:a"], patches=True)
+    server.deliver(2, ["story:a"], get_entity_feed(2, "new"), "story:a")
+    server.deliver(3, ["story:a"], get_entity_feed(3, "newer"), "story:a")
+    run(flush())
+
+    patch = [{"op": "replace", "path": "/title", "value": "new"}]
+    assert first_ws.sent[0] == json.loads(get_entity_feed(1, "old"))
+    assert first_ws.sent[1] == {"message": "story-updated", "key": "story:a", "base_seq": 1, "seq": 2,
+                                "data": {"patch": patch}}
+    # patches are sent only to clients which were sent the feed they are based on
+    assert late_ws.sent[0] == json.loads(get_entity_feed(2, "new"))
+    assert [feed.get("base_seq") for feed in late_ws.sent] == [None, 2]
+    assert [feed.get("base_seq") for feed in first_ws.sent] == [None, 1, 2]
+    assert [feed["data"] for feed in full_ws.sent] == [{"title": "old"}, {"title": "new"}, {"title": "newer"}]
+
+    # first missed feed of entity is replayed in full
+    replay_ws = FeedSocket()
+    server.register("user", replay_ws, ["story:a"], since=1, patches=True)
+    run(flush())
+    assert [feed.get("base_seq") for feed in replay_ws.sent] == [None, 2]
+    stop(server)
+
+
+def test_entity_feeds_carry_key():
+    db = fakes.RecordingDb(sequences=fakes.RecordingCollection({feeds.FEED_SEQUENCE_ID: {"seq": 7}}))
+    server = feeds.FeedServer(FeedApp())
+    server.db = db
+    server.publish("story-updated", {"title": "new"}, ["story:a"], key="story:a")
+    server.publish("stream-started", {"stream": "live"}, ["stream:live"])
+    server.feeds.put_nowait(None)
+    run(server.process_feeds())
+
+    written = [call[1] for call in db[feeds.FEED_EVENTS_COLLECTION].calls if call[0] == "insert_one"]
+    assert [event.get("key") for event in written] == ["story:a", None]
+    assert json.loads(written[0]["feed"]) == {"message": "story-updated", "data": {"title": "new"},
+                                              "key": "story:a", "seq": 7}
+    assert "key" not in json.loads(written[1]["feed"])
+
+
+def test_coalescing_window():
+    server = feeds.FeedServer(FeedApp())
+
+    async def publish_updates():
+        for index in range(3):
+            server.publish("story-updated", {"version": index}, ["story:a"], key="story:a", coalesce=True)
+        server.publish("story-updated", {"version": 0}, ["story:b"], key="story:b", coalesce=True)
+        server.publish("stream-started", {"stream": "live"}, ["stream:live"])
+        # only feeds which are not coalesced are published within the window
+        assert server.feeds.qsize() == 1
+        await asyncio.sleep(feeds.FEED_COALESCE_WINDOW * 2)
+        # later feed of entity opens a new window
+        server.publish("story-updated", {"version": 3}, ["story:a"], key="story:a", coalesce=True)
+        await asyncio.sleep(feeds.FEED_COALESCE_WINDOW * 2)
+
+    coalesce_window = feeds.FEED_COALESCE_WINDOW
+    feeds.FEED_COALESCE_WINDOW = 0.05
+    try:
+        run(publish_updates())
+    finally:
+        feeds.FEED_COALESCE_WINDOW = coalesce_window
+    published = []
+    while not server.feeds.empty():
+        feed, topics, key = server.feeds.get_nowait()
+        published.append((feed["message"], feed["data"], key))
+    assert published == [("stream-started", {"stream": "live"}, None),
+                         ("story-updated", {"version": 2}, "story:a"),
+                         ("story-updated", {"version": 0}, "story:b"),
+                         ("story-updated", {"version": 3}, "story:a")]
+
+
+if __name__ == "__main__":
+    test_opt_in_feeds()
+    test_batch_created_stories()
+    test_replay_since()
+    test_replay_unavailable()
+    test_interleaved_writes()
+    test_json_patch()
+    test_patch_feeds()
+    test_entity_feeds_carry_key()
+    test_coalescing_window()
+    print("test_feeds PASSED.")
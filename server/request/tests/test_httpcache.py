@@ -0,0 +1,84 @@
+#!/usr/bin/python3.6
+import sys
+import asyncio
+if "../../.." not in sys.path:
+    sys.path.append("../../..")
+
+import server.commons.cache as cache
+from server.request import httpcache
+
+import fakes
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def get_counters(version, tags=0, nrcs=0, epoch="epoch"):
+    return {"_id": httpcache.CHANGES_ID, "epoch": epoch, "created": 100, "version": version,
+            "counters": {"tags": tags, "nrcs": nrcs}, "modified": {"tags": 100 + tags, "nrcs": 100 + nrcs}}
+
+
+def test_touch_requests_change():
+    collection = fakes.RecordingCollection({httpcache.CHANGES_ID: get_counters(1, tags=1)})
+    db = fakes.RecordingDb({httpcache.CHANGES_COLLECTION: collection})
+    tracker = httpcache.ChangeTracker()
+
+    counters = run(tracker.touch(db, ["tags", "stories"]))
+    (operation, query, update, upsert), = collection.calls
+    assert (operation, query, upsert) == ("find_one_and_update", {"_id": httpcache.CHANGES_ID}, True)
+    assert update["$inc"] == {"version": 1, "counters.tags": 1, "counters.stories": 1}
+    assert set(update["$max"]) == {"modified.tags", "modified.stories"}
+    # counters of this process are taken from the update itself, without waiting for the next poll
+    assert tracker.counters is counters and counters["counters"]["tags"] == 1
+
+
+def test_changes_shared_between_processes():
+    # tracker of a request server process which polls counters changed by another process
+    tracker = httpcache.ChangeTracker()
+    collections = httpcache.CACHED_ROUTES["/tags"]
+    tracker.update(get_counters(1))
+    etag = tracker.get_etag(tracker.counters, collections, "/tags")
+    nrcs_etag = tracker.get_etag(tracker.counters, httpcache.CACHED_ROUTES["/nrcs"], "/nrcs")
+    cache.tags.set("sports", {"_id": "sports"})
+
+    # change of tags made through another process invalidates validators and caches of tags only
+    counters = tracker.update(get_counters(2, tags=1))
+    assert tracker.get_etag(counters, collections, "/tags") != etag
+    assert cache.tags.get("sports") is None
+    assert tracker.get_etag(counters, httpcache.CACHED_ROUTES["/nrcs"], "/nrcs") == nrcs_etag
+
+
+def test_older_counters_ignored():
+    tracker = httpcache.ChangeTracker()
+    tracker.update(get_counters(3, tags=2))
+    cache.tags.set("sports", {"_id": "sports"})
+
+    # a poll which read counters before a change of this process completed
+    counters = tracker.update(get_counters(2, tags=1))
+    assert counters["version"] == 3 and counters["counters"]["tags"] == 2
+    assert cache.tags.get("sports") == {"_id": "sports"}
+
+    # counters which were lost and recreated are always taken
+    counters = tracker.update(get_counters(1, epoch="other"))
+    assert counters["epoch"] == "other"
+    assert cache.tags.get("sports") is None
+
+
+def test_refresh_reads_counters():
+    collection = fakes.RecordingCollection({httpcache.CHANGES_ID: get_counters(1, tags=1)})
+    db = fakes.RecordingDb({httpcache.CHANGES_COLLECTION: collection})
+    tracker = httpcache.ChangeTracker()
+
+    counters = run(tracker.refresh(db))
+    assert counters["counters"]["tags"] == 1 and tracker.counters is counters
+    # existing counters are read without any change
+    assert collection.calls == []
+
+
+if __name__ == "__main__":
+    test_touch_requests_change()
+    test_changes_shared_between_processes()
+    test_older_counters_ignored()
+    test_refresh_reads_counters()
+    print("test_httpcache PASSED.")
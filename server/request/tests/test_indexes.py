@@ -0,0 +1,40 @@
+#!/usr/bin/python3.6
+import sys
+import asyncio
+if "../../.." not in sys.path:
+    sys.path.append("../../..")
+
+import pymongo
+
+from server.request import indexes
+import fakes
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def get_registry():
+    return {"users": [pymongo.IndexModel([("uid", pymongo.ASCENDING)], name="uid", unique=True),
+                      pymongo.IndexModel([("email", pymongo.ASCENDING)], name="email", unique=True)]}
+
+
+def test_reconcile_indexes():
+    db = fakes.RecordingDb(users=fakes.RecordingCollection(indexes={"uid": {"key": [("uid", 1)], "unique": True}}))
+    assert run(indexes.reconcile_indexes(db, get_registry()))
+    assert db.users.calls == [("create_indexes", ["email"])]
+
+
+def test_reconcile_indexes_failure():
+    # unique index over existing duplicates can not be created
+    error = pymongo.errors.OperationFailure("E11000 duplicate key error", code=11000)
+    db = fakes.RecordingDb(users=fakes.RecordingCollection(error=error))
+    assert not run(indexes.reconcile_indexes(db, get_registry()))
+    # remaining indexes are still attempted
+    assert db.users.calls == [("create_indexes", ["uid"]), ("create_indexes", ["email"])]
+
+
+if __name__ == "__main__":
+    test_reconcile_indexes()
+    test_reconcile_indexes_failure()
+    print("test_indexes PASSED.")
@@ -22,6 +22,15 @@ async def get_all_stories():
     return stories if stories else None
 
 
+async def is_stories_not_modified():
+    reqsrv_url = utils.get_request_server_url("stories")
+    resp = await session.get(reqsrv_url)
+    etag = resp.headers.get("ETag")
+    resp = await session.get(reqsrv_url, headers={"If-None-Match": etag})
+    print("is_stories_not_modified(): etag: ", etag, "status: ", resp.status)
+    return etag is not None and resp.status == 304
+
+
 async def main(loop):
     # retrieving all stories
     stories = await get_all_stories()
@@ -30,6 +39,12 @@ async def main(loop):
         return False
     print("/stories GET PASSED")
 
+    # revalidating stories
+    if not await is_stories_not_modified():
+        print("/stories conditional GET FAILED.")
+        return False
+    print("/stories conditional GET PASSED")
+
     # retrieving single story info
     story_id = None
     if stories and stories.get("stories"):
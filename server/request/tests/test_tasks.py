@@ -0,0 +1,28 @@
+#!/usr/bin/python3.6
+import sys
+if "../../.." not in sys.path:
+    sys.path.append("../../..")
+
+from server.request import tasks
+
+
+class FeedServer:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, message, data, topics=None, key=None, coalesce=False):
+        self.published.append((message, topics))
+
+
+def test_task_progress_topics():
+    app = {"feed_server": FeedServer()}
+    tasks.publish_task_progress(app, "1", {"data": {"asset_id": "story__clip.mp4", "user_id": "user"}})
+    tasks.publish_task_progress(app, "2", {"data": {"asset_id": "clip.mp4", "user_id": "user"}})
+    tasks.publish_task_progress(app, "3", {"data": {"asset_id": "clip.mp4"}})
+    assert app["feed_server"].published == [("task-progress", ["story:story", "user:user"]),
+                                            ("task-progress", ["user:user"])]
+
+
+if __name__ == "__main__":
+    test_task_progress_topics()
+    print("test_tasks PASSED.")
@@ -0,0 +1,178 @@
+#!/usr/bin/python3.6
+import sys
+import time
+import random
+import asyncio
+if "../../.." not in sys.path:
+    sys.path.append("../../..")
+
+import pymongo
+
+from server.request import stories
+from server.request import versions
+
+
+def get_random_text(line_count, seed):
+    generator = random.Random(seed)
+    words = ["journo", "story", "the", "a", "police", "city", "report", "<p>", "</p>"]
+    return "".join(" ".join(generator.choice(words) for _ in range(generator.randint(0, 12))) + "\n"
+                   for _ in range(line_count))
+
+
+def test_text_edits_round_trip():
+    cases = [("", ""), ("", "new"), ("old", ""), ("same", "same"), ("abc", "abXc"), ("line 1\nline 2\n", "line 2\n"),
+             ("a\nb\nc\nd\n", "a\nB\nc\nd\ne\n"), ("<p>one long line</p>", "<p>one longer line</p>")]
+    cases += [(get_random_text(50, seed), get_random_text(50, seed + 1)) for seed in range(10)]
+    for old_text, new_text in cases:
+        edits = versions.get_text_edits(old_text, new_text)
+        assert versions.apply_text_edits(old_text, edits) == new_text
+
+
+def test_large_text_edits_are_fast():
+    old_text = get_random_text(3000, 1)
+    edited_text = old_text[:25000] + "inserted sentence.\n" + old_text[25000:]
+    for new_text in [edited_text, get_random_text(3000, 2), "\n" * 3000, "a\n" * 1500]:
+        start = time.monotonic()
+        edits = versions.get_text_edits(old_text, new_text)
+        assert time.monotonic() - start < 1
+        assert versions.apply_text_edits(old_text, edits) == new_text
+    assert versions.get_text_edits(old_text, edited_text) == [[25000, 25000, "inserted sentence.\n"]]
+
+
+def test_versions_round_trip():
+    story_versions = [{"user_id": "user", "story_title": "title", "description": "short"}]
+    for index in range(1, 25):
+        version_data = dict(story_versions[-1])
+        version_data["description"] = get_random_text(40, index)
+        if index % 7 == 0:
+            version_data["story_title"] = "title {}".format(index)
+        story_versions.append(version_data)
+
+    documents = []
+    for index, version_data in enumerate(story_versions):
+        previous_data = story_versions[index - 1] if index else None
+        documents.append(versions.prepare_version_document("story", "{:04d}".format(index), version_data,
+                                                           previous_data, index))
+    assert "delta" in documents[1] and "delta" not in documents[versions.VERSION_SNAPSHOT_INTERVAL]
+    assert any("compressed" in document for document in documents)
+
+    reconstructed = versions.reconstruct_versions("story", documents)
+    assert [version["version_data"] for version in reconstructed] == story_versions
+    # deltas before first available snapshot are skipped
+    reconstructed = versions.reconstruct_versions("story", documents[5:])
+    assert [version["version_data"] for version in reconstructed] == story_versions[versions.VERSION_SNAPSHOT_INTERVAL:]
+
+
+class VersionCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction):
+        self.documents = sorted(self.documents, key=lambda document: document[key],
+                                reverse=direction == pymongo.DESCENDING)
+        return self
+
+    async def to_list(self, length=None):
+        return self.documents
+
+    def __aiter__(self):
+        return self.iterate().__aiter__()
+
+    async def iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class VersionCollection:
+    """
+    Serves 'story_versions' documents of a single story
+    """
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def find_one(self, query, projection=None, sort=None):
+        snapshots = [document for document in self.documents if "delta" not in document and
+                     document["version_count"] <= query["version_count"]["$lte"]]
+        return max(snapshots, key=lambda document: document["version_count"]) if snapshots else None
+
+    def find(self, query, projection=None):
+        count_range = query["version_count"]
+        return VersionCursor([document for document in self.documents
+                              if count_range["$gte"] <= document["version_count"] <= count_range["$lte"]])
+
+    async def insert_one(self, document):
+        self.documents.append(document)
+
+
+class StoryCollection:
+    """
+    Applies version updates to a single story. First update waits until 'released' is set.
+    """
+    def __init__(self, story):
+        self.story = story
+        self.released = asyncio.Event()
+        self.updates = 0
+
+    async def find_one_and_update(self, query, update, projection=None):
+        self.updates += 1
+        if self.updates == 1:
+            await self.released.wait()
+        previous = dict(self.story)
+        self.story.update(update["$set"])
+        for field, value in update["$inc"].items():
+            self.story[field] = self.story.get(field, 0) + value
+        return previous
+
+
+class VersionDb:
+    def __init__(self, documents, story=None):
+        self.story_versions = VersionCollection(documents)
+        self.stories = StoryCollection(story or {})
+
+
+def test_iterate_versions():
+    story_versions = [{"story_title": "title", "description": "version {}".format(index)} for index in range(15)]
+    documents = [versions.prepare_version_document("story", "{:04d}".format(index), version_data,
+                                                   story_versions[index - 1] if index else None, index)
+                 for index, version_data in enumerate(story_versions)]
+
+    async def export(first_index):
+        cursor = VersionCursor(documents[first_index:])
+        return [version async for version in versions.iterate_versions(VersionDb(documents), cursor)]
+
+    loop = asyncio.get_event_loop()
+    for first_index in [0, 3, versions.VERSION_SNAPSHOT_INTERVAL]:
+        exported = loop.run_until_complete(export(first_index))
+        assert [version["version_data"] for version in exported] == story_versions[first_index:]
+        assert [version["version_time"] for version in exported] == [document["version_time"]
+                                                                     for document in documents[first_index:]]
+
+
+def test_interleaved_saves():
+    first_data = {"story_title": "title", "description": "first"}
+    db = VersionDb([versions.prepare_version_document("story", "0000", first_data)],
+                   dict(first_data, _id="story", version_count=1))
+
+    async def save_concurrently():
+        # first save takes its version time first but updates story after the second save
+        slow = asyncio.ensure_future(stories.save_story_version(db, "story", {"description": "slow"}))
+        await asyncio.sleep(0.01)
+        await stories.save_story_version(db, "story", {"description": "fast"})
+        db.stories.released.set()
+        await slow
+        return await versions.load_story_versions(db, "story", 0, 2)
+
+    loaded = asyncio.get_event_loop().run_until_complete(save_concurrently())
+    assert [version["version_data"]["description"] for version in loaded] == ["first", "fast", "slow"]
+    # version times are out of order, still the recent version is the one embedded in story
+    assert loaded[2]["version_time"] < loaded[1]["version_time"]
+    assert loaded[-1]["version_data"] == {vkey: db.stories.story[vkey] for vkey in first_data}
+
+
+if __name__ == "__main__":
+    test_text_edits_round_trip()
+    test_large_text_edits_are_fast()
+    test_versions_round_trip()
+    test_iterate_versions()
+    test_interleaved_saves()
+    print("test_versions PASSED.")
@@ -6,10 +6,20 @@
 """
 
 from aiohttp import web as aioweb
+import pymongo
 
 from server.request import logger
 
 import server.commons.utils as utils
+import server.commons.cache as cache
+import server.request.dispatch as dispatch
+
+indexes = {
+    "users": [
+        pymongo.IndexModel([("username", pymongo.ASCENDING)], unique=True, name="username"),
+        pymongo.IndexModel([("email", pymongo.ASCENDING)], unique=True, name="email")
+    ]
+}
 
 routes = aioweb.RouteTableDef()
 
@@ -68,6 +78,7 @@ async def save_user_info(request):
         logger.error("[/users] [POST] [{}]: Failed to save to db.".format(userinfo["_id"]))
         return utils.get_http_error("Server ran into database error", httperror=aioweb.HTTPInternalServerError)
 
+    cache.users.invalidate()
     logger.info("[/users] [POST]: New user '{}' created successfully.".format(userinfo))
     return aioweb.json_response({"ok": True})
 
@@ -123,6 +134,7 @@ async def update_user_info(request):
         logger.error("[/users] [PUT] [{}]: Failed to save to db.".format(user_id))
         return utils.get_http_error("Server ran into database error", httperror=aioweb.HTTPInternalServerError)
 
+    cache.users.invalidate()
     if userinfo.get("password"):
         del userinfo["password"]
     logger.info("[/users] [PUT] [{}]: User info '{}' updated successfully.".format(user_id, userinfo))
@@ -133,13 +145,11 @@ async def update_user_info(request):
 async def get_all_users(request):
     db = request.app["db"]
 
-    users = []
-    async for user in db.users.find():
-        users.append(user)
-    return aioweb.json_response({"users": users})
+    return await utils.stream_json_response(request, "users", db.users.find())
 
 
 @routes.get("/users/{user_id}")
+@dispatch.local
 async def get_user_info(request):
     db = request.app["db"]
 
@@ -160,6 +170,7 @@ async def delete_user_info(request):
         res = await db.users.delete_one({"_id": user_id})
         # parsing motor response
         if res.deleted_count > 0:
+            cache.users.invalidate()
             logger.info("[/users] [DELETE]: User '{}' deleted.".format(user_id))
             return aioweb.json_response({"ok": True})
 
@@ -0,0 +1,202 @@
+"""
+This module encodes story versions compactly. Every VERSION_SNAPSHOT_INTERVAL-th version of a story is stored as a
+full snapshot in 'version_data'; versions in between store only a 'delta' of the versioned fields that changed since
+the previous version. Text fields of a delta are stored as edit operations against their previous value and large
+descriptions of snapshots are zlib compressed. Versions are reconstructed on read by applying deltas on the nearest
+preceding snapshot.
+Versions of a story are ordered by 'version_count', the number of versions saved before, which is assigned atomically
+with the story update. 'version_time' is only displayed, as versions saved concurrently may get times out of order.
+NOTE: Versions saved before delta encoding store full 'version_data' hence they are read as snapshots.
+"""
+import difflib
+import zlib
+
+import pymongo
+
+import server.commons.constants as consts
+
+# number of versions after which a full snapshot is stored
+VERSION_SNAPSHOT_INTERVAL = 10
+
+# descriptions larger than this many characters are compressed in snapshots
+VERSION_COMPRESS_MIN_SIZE = 1024
+
+# changed parts of text fields with more lines than this are not diffed line by line
+VERSION_DIFF_MAX_LINES = 2000
+
+
+def get_common_prefix_length(text_a, text_b):
+    length = min(len(text_a), len(text_b))
+    for index in range(length):
+        if text_a[index] != text_b[index]:
+            return index
+    return length
+
+
+def get_text_edits(old_text, new_text):
+    """
+    Prepares edit operations which convert old_text to new_text. Common prefix and suffix are skipped and the rest
+    is compared line by line, so that diff of a large description stays fast. If too many lines differ, the changed
+    part is replaced as a whole.
+    :return: list of [start, end, replacement] applicable to old_text
+    """
+    prefix = get_common_prefix_length(old_text, new_text)
+    suffix = get_common_prefix_length(old_text[prefix:][::-1], new_text[prefix:][::-1])
+    old_part, new_part = old_text[prefix:len(old_text) - suffix], new_text[prefix:len(new_text) - suffix]
+    if not old_part and not new_part:
+        return []
+
+    old_lines, new_lines = old_part.splitlines(keepends=True), new_part.splitlines(keepends=True)
+    if len(old_lines) + len(new_lines) > VERSION_DIFF_MAX_LINES:
+        return [[prefix, prefix + len(old_part), new_part]]
+
+    # character offsets of line boundaries in old_text and new_part
+    old_offsets, new_offsets = [prefix], [0]
+    for line in old_lines:
+        old_offsets.append(old_offsets[-1] + len(line))
+    for line in new_lines:
+        new_offsets.append(new_offsets[-1] + len(line))
+
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
+    return [[old_offsets[i1], old_offsets[i2], new_part[new_offsets[j1]:new_offsets[j2]]]
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+
+
+def apply_text_edits(old_text, edits):
+    # edits are applied from the end so that offsets of remaining edits stay valid
+    text = old_text
+    for start, end, replacement in reversed(edits):
+        text = text[:start] + replacement + text[end:]
+    return text
+
+
+def get_version_delta(previous_data, version_data):
+    """
+    Prepares delta of versioned fields changed from previous_data to version_data
+    """
+    delta = {}
+    for vkey in consts.VERSIONING_KEYS:
+        if vkey not in version_data or version_data[vkey] == previous_data.get(vkey):
+            continue
+        old_value, new_value = previous_data.get(vkey), version_data[vkey]
+        if isinstance(old_value, str) and isinstance(new_value, str):
+            edits = get_text_edits(old_value, new_value)
+            if sum(len(edit[2]) for edit in edits) < len(new_value):
+                delta[vkey] = {"edits": edits}
+                continue
+        delta[vkey] = {"value": new_value}
+    return delta
+
+
+def apply_version_delta(previous_data, delta):
+    version_data = dict(previous_data)
+    for vkey, change in delta.items():
+        if "edits" in change:
+            version_data[vkey] = apply_text_edits(previous_data.get(vkey) or "", change["edits"])
+        else:
+            version_data[vkey] = change["value"]
+    return version_data
+
+
+def prepare_version_document(story_id, version_time, version_data, previous_data=None, version_count=0):
+    """
+    Prepares 'story_versions' document for a new version of story
+    :param version_data: complete versioned fields of the new version
+    :param previous_data: complete versioned fields of the previous version. None if this is the first version.
+    :param version_count: number of versions saved before this version. Versions of a story are ordered by it.
+    """
+    version_info = {"story_id": story_id, "version_time": version_time, "version_count": version_count}
+    if previous_data is not None and version_count % VERSION_SNAPSHOT_INTERVAL != 0:
+        version_info["delta"] = get_version_delta(previous_data, version_data)
+        return version_info
+
+    snapshot = dict(version_data)
+    description = snapshot.get("description")
+    if isinstance(description, str) and len(description) >= VERSION_COMPRESS_MIN_SIZE:
+        snapshot["description"] = zlib.compress(description.encode(consts.APP_ENCODING))
+        version_info["compressed"] = ["description"]
+    version_info["version_data"] = snapshot
+    return version_info
+
+
+def apply_version_document(previous_data, version_info):
+    """
+    Reconstructs versioned fields of a version from versioned fields of its previous version
+    """
+    if "delta" in version_info:
+        return apply_version_delta(previous_data or {}, version_info["delta"])
+
+    version_data = dict(version_info.get("version_data") or {})
+    for vkey in version_info.get("compressed", []):
+        version_data[vkey] = zlib.decompress(version_data[vkey]).decode(consts.APP_ENCODING)
+    # versions saved before delta encoding may contain only the changed fields
+    return dict(previous_data or {}, **version_data)
+
+
+async def load_story_versions(db, story_id, oldest_count, newest_count):
+    """
+    Reconstructs versions of a story from version 'oldest_count' to version 'newest_count' (both inclusive)
+    :return: list of versions in ascending order
+    """
+    base = await db.story_versions.find_one({"story_id": story_id, "version_count": {"$lte": oldest_count},
+                                             "delta": {"$exists": False}},
+                                            {"version_count": 1}, sort=[("version_count", pymongo.DESCENDING)])
+    start_count = base["version_count"] if base else oldest_count
+
+    cursor = db.story_versions.find({"story_id": story_id,
+                                     "version_count": {"$gte": start_count, "$lte": newest_count}},
+                                    {"_id": 0}).sort("version_count", pymongo.ASCENDING)
+    return [version for version_info, version in
+            reconstruct_version_documents(story_id, await cursor.to_list(length=None))
+            if version_info["version_count"] >= oldest_count]
+
+
+def reconstruct_versions(story_id, version_documents):
+    """
+    Reconstructs versions from 'story_versions' documents of a story
+    :param version_documents: documents in ascending order of version count. Deltas preceding the first snapshot are
+        skipped as they can not be reconstructed.
+    :return: list of versions in ascending order
+    """
+    return [version for _, version in reconstruct_version_documents(story_id, version_documents)]
+
+
+def reconstruct_version_documents(story_id, version_documents):
+    """
+    :return: iterator of 'story_versions' document and version reconstructed from it
+    """
+    version_data = None
+    for version_info in version_documents:
+        if version_data is None and "delta" in version_info:
+            continue
+        version_data = apply_version_document(version_data, version_info)
+        yield version_info, {"story_id": story_id, "version_time": version_info["version_time"],
+                             "version_data": version_data}
+
+
+async def iterate_versions(db, cursor):
+    """
+    Reconstructs versions from 'story_versions' documents read from cursor
+    :param cursor: documents grouped by story and in ascending order of version count within a story
+    :return: async iterator of versions
+    """
+    story_id, version_documents = None, []
+    async for version_info in cursor:
+        if version_info["story_id"] != story_id:
+            for version in await reconstruct_story_versions(db, story_id, version_documents):
+                yield version
+            story_id, version_documents = version_info["story_id"], []
+        version_documents.append(version_info)
+
+    for version in await reconstruct_story_versions(db, story_id, version_documents):
+        yield version
+
+
+async def reconstruct_story_versions(db, story_id, version_documents):
+    if not version_documents:
+        return []
+    # deltas need versions preceding them which are loaded from the nearest preceding snapshot
+    if "delta" in version_documents[0]:
+        return await load_story_versions(db, story_id, version_documents[0]["version_count"],
+                                         version_documents[-1]["version_count"])
+    return reconstruct_versions(story_id, version_documents)
@@ -15,6 +15,9 @@ client = MongoClient()
 db = client[consts.DB_NAME]
 table = db.rss_feeds
 
+# maximum number of stories posted in one batch request
+STORIES_BATCH_SIZE = 500
+
 class FeedParser:
     '''Fetches rss feed url details'''
     def __init__(self, feed_url):
@@ -89,7 +92,8 @@ class ThirdPartyFeed:
             print("No updated feed")
 
     def postStories(self, storiesFeed):
-        """post stories API"""
+        """post stories API. All stories are created with one batch request"""
+        stories = []
         for feed in storiesFeed:
             date_time_obj = datetime.strptime(feed["publish"], '%a, %d %b %Y %H:%M:%S %Z')
             story = {
@@ -102,9 +106,22 @@ class ThirdPartyFeed:
                      "incident_time": date_time_obj.strftime("%H:%M:%S"),
                     "link": feed["link"],
                     "agency_id": feed["agency_id"]}
-            req = requests.post(util.get_request_server_url("stories"), data=json.dumps(story))
-            response = req.json()
-            if not response.get("ok"):
+            stories.append(story)
+
+        created = set()
+        for start in range(0, len(stories), STORIES_BATCH_SIZE):
+            try:
+                req = requests.post(util.get_request_server_url("stories/batch"),
+                                    data=json.dumps({"stories": stories[start:start + STORIES_BATCH_SIZE]}))
+                results = req.json().get("results") or []
+            except Exception as ex:
+                print("Failed to post stories ", str(ex))
+                continue
+            created.update(start + result["index"] for result in results if result.get("ok"))
+
+        # removing feeds of stories which could not be created so that they are retried
+        for index, feed in enumerate(storiesFeed):
+            if index not in created:
                 table.remove({'title': feed["title"], "agency_id": feed["agency_id"]})
 
     def post_is_in_db(self, title, agency_id):
@@ -18,33 +18,44 @@ from server.task.engine import TaskEngine
 # all path exposed by service
 routes = aioweb.RouteTableDef()
 
-# api's to interact with server
-@routes.post("/tasks")
-async def create_new_task(request):
-    engine = request.app["engine"]
-    task = {}
-    priority = TaskEngine.PRIORITY_DEFAULT
+# maximum number of tasks accepted by one batch request
+MAX_BATCH_TASKS = 500
 
-    data = await request.json()
+
+async def prepare_task(data):
+    """
+    Prepares task from task information
+    :return: tuple of task, priority and error message. Task is None if it could not be prepared.
+    """
+    priority = TaskEngine.PRIORITY_DEFAULT
 
     if not data or not all([bool(data.get(key)) for key in ["task_name", "task_id"]]):
-        logger.error("[/tasks] [POST]: invalid task information provided.")
-        return utils.get_http_error("invalid task information provided")
+        return None, priority, "invalid task information provided"
 
     if data["task_name"] == consts.TASK_GENERATE_THUMBNAIL:
         # preparing thumbnail task
         task, err_msg = await tasks.prepare_thumbnail_task(data)
-        if not task:
-            logger.error("[/tasks] [POST]: {}".format(err_msg))
-            return utils.get_http_error(err_msg)
-        priority -= 1
+        return task, priority - 1, err_msg
 
     elif data["task_name"] == consts.TASK_GENERATE_LOWRES:
         # preparing lowres task
         task, err_msg = await tasks.prepare_lowres_task(data)
-        if not task:
-            logger.error("[/tasks] [POST: {}".format(err_msg))
-            return utils.get_http_error(err_msg)
+        return task, priority, err_msg
+
+    return None, priority, None
+
+
+# api's to interact with server
+@routes.post("/tasks")
+async def create_new_task(request):
+    engine = request.app["engine"]
+
+    data = await request.json()
+
+    task, priority, err_msg = await prepare_task(data)
+    if err_msg:
+        logger.error("[/tasks] [POST]: {}".format(err_msg))
+        return utils.get_http_error(err_msg)
 
     if task:
         logger.info("[/tasks] [POST]: Submitting task '{}' to TaskEngine.".format(task))
@@ -54,6 +65,35 @@ async def create_new_task(request):
     return aioweb.json_response({"ok": False})
 
 
+@routes.post("/tasks/batch")
+async def create_new_tasks(request):
+    """
+    Submits many tasks at once. Request data is '{"tasks": [task, ...]}' where every task is same as of 'POST /tasks'.
+    :return: result of every task in order of request
+    """
+    engine = request.app["engine"]
+
+    data = await request.json()
+    if not data or not isinstance(data.get("tasks"), list) or len(data["tasks"]) > MAX_BATCH_TASKS:
+        logger.error("[/tasks/batch] [POST]: invalid tasks information provided.")
+        return utils.get_http_error("invalid tasks information provided")
+
+    results = []
+    for taskinfo in data["tasks"]:
+        task, priority, err_msg = await prepare_task(taskinfo if isinstance(taskinfo, dict) else None)
+        result = {"task_id": taskinfo.get("task_id") if isinstance(taskinfo, dict) else None, "ok": bool(task)}
+        if task:
+            await engine.submit(task, priority)
+        else:
+            logger.error("[/tasks/batch] [POST]: {}".format(err_msg))
+            result["message"] = err_msg
+        results.append(result)
+
+    logger.info("[/tasks/batch] [POST]: '{}' tasks submitted to TaskEngine."
+                .format(len([result for result in results if result["ok"]])))
+    return aioweb.json_response({"ok": any(result["ok"] for result in results), "results": results})
+
+
 async def setup_app(app):
     logger.info("Setting up application")
     return True
@@ -3,6 +3,11 @@ import json
 from server.task import logger
 from server.commons import session
 import server.commons.utils as utils
+from server.commons.cache import RefDataCache
+
+# TaskServer is not notified about share changes hence shares are cached only for a short time
+SHARE_CACHE_TTL = 60
+share_cache = RefDataCache("shares", ttl=SHARE_CACHE_TTL)
 
 
 async def send_status_to_reqserver(task_id, status_data):
@@ -17,6 +22,8 @@ async def send_status_to_reqserver(task_id, status_data):
 
 
 async def get_share_details(share_id):
-    url = utils.get_request_server_url("shares/{}".format(share_id))
-    resp = await session.get(url)
-    return await resp.json() if resp.status is 200 else None
\ No newline at end of file
+    async def load():
+        url = utils.get_request_server_url("shares/{}".format(share_id))
+        resp = await session.get(url)
+        return await resp.json() if resp.status is 200 else None
+    return await share_cache.get_or_load(share_id, load)
\ No newline at end of file